@@ -22,6 +22,7 @@ interface AprendizadoApiResponseData {
   pergunta_feedback?: string;
   novo_exemplo_pratico?: string;
   proxima_acao_sugerida?: string;
+  id_sessao?: string;
   id_sessao_debug?: string; 
   ml_fator_aplicado_debug?: number | string;
 }
@@ -35,6 +36,9 @@ export default function Index() {
   const [faixaEtariaSelecionada, setFaixaEtariaSelecionada] = useState<string | null>(null);
 
   const scrollViewRef = useRef<ScrollView>(null);
+  // Um id por montagem da tela: a conversa tambem recomeca do zero ao montar,
+  // entao o estado da sessao no servidor acompanha a conversa exibida.
+  const idSessaoRef = useRef(`${Date.now()}${Math.random().toString(36).slice(2, 10)}`);
 
   useEffect(() => {
     adicionarMensagemBot("Olá! Bem-vindo ao Calcula Aí! Qual operação matemática você gostaria de aprender hoje? (Ex: soma, subtração, multiplicação, divisão)");
@@ -159,7 +163,7 @@ export default function Index() {
         }
 
         if (deveFazerChamadaAPI && dataParaEnviarNaRequisicao) { 
-            const respostaDoBackend = await api.post<AprendizadoApiResponseData>(API_ENDPOINT, dataParaEnviarNaRequisicao);
+            const respostaDoBackend = await api.post<AprendizadoApiResponseData>(API_ENDPOINT, { ...dataParaEnviarNaRequisicao, id_sessao: idSessaoRef.current });
             const aprendizadoData: AprendizadoApiResponseData | null = respostaDoBackend;
 
             if (aprendizadoData?.ml_fator_aplicado_debug) {
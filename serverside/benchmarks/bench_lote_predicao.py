@@ -0,0 +1,96 @@
+"""Compara latencia (p50/p99) e QPS da predicao de dificuldade com e sem lote.
+
+    python -m serverside.benchmarks.bench_lote_predicao --concorrencia 256 --requisicoes 20
+    python -m serverside.benchmarks.bench_lote_predicao --modelo modelo_fator_dificuldade.pkl
+
+Sem --modelo, treina um RandomForestRegressor sintetico. Por padrao o
+avaliador compilado fica desligado para medir o custo real de `predict`.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from serverside.servicos.inferencia import FEATURES_MODELO, PreditorDificuldade, gerar_amostras_features
+from serverside.servicos.lote_predicao import LOTE_MAX_ESPERA_US, LOTE_MAX_TAMANHO, LoteadorPredicoes
+
+
+def modelo_sintetico():
+    from sklearn.ensemble import RandomForestRegressor
+    amostras = gerar_amostras_features(2000, semente=1)
+    X = np.array([[f[n] for n in FEATURES_MODELO] for f in amostras])
+    y = 0.6 + 0.8 * X[:, 0] + 0.005 * X[:, 2]
+    return RandomForestRegressor(n_estimators=50, max_depth=8, random_state=0).fit(X, y)
+
+
+def percentil(latencias: list[float], p: float) -> float:
+    return float(np.percentile(latencias, p)) * 1000
+
+
+async def _cliente(prever, amostras: list[dict], latencias: list[float]) -> None:
+    for features in amostras:
+        inicio = time.perf_counter()
+        await prever(features)
+        latencias.append(time.perf_counter() - inicio)
+
+
+async def _rodar(prever, concorrencia: int, requisicoes: int) -> dict:
+    amostras = gerar_amostras_features(requisicoes, semente=2)
+    latencias: list[float] = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_cliente(prever, amostras, latencias) for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    return {
+        "requisicoes": len(latencias),
+        "qps": len(latencias) / duracao,
+        "p50_ms": percentil(latencias, 50),
+        "p99_ms": percentil(latencias, 99),
+    }
+
+
+def executar(modelo, concorrencia: int, requisicoes: int, max_lote: int, max_espera_us: int, compilado: bool) -> dict:
+    preditor = PreditorDificuldade(modelo)
+    if not compilado:
+        preditor.avaliador = None
+
+    async def sem_lote(features):
+        return preditor.prever(features)
+
+    loteador = LoteadorPredicoes(max_lote=max_lote, max_espera_us=max_espera_us)
+
+    async def com_lote(features):
+        return await loteador.prever(preditor, features)
+
+    resultados = {
+        "caminho_inferencia": preditor.caminho,
+        "concorrencia": concorrencia,
+        "sem_lote": asyncio.run(_rodar(sem_lote, concorrencia, requisicoes)),
+        "com_lote": asyncio.run(_rodar(com_lote, concorrencia, requisicoes)),
+    }
+    resultados["com_lote"]["lote_medio"] = loteador.contadores["predicoes"] / max(1, loteador.contadores["lotes"])
+    return resultados
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modelo", help="Caminho de um .pkl; sem ele usa um modelo sintetico.")
+    parser.add_argument("--concorrencia", type=int, default=128)
+    parser.add_argument("--requisicoes", type=int, default=20, help="Requisicoes por cliente.")
+    parser.add_argument("--max-lote", type=int, default=LOTE_MAX_TAMANHO)
+    parser.add_argument("--max-espera-us", type=int, default=LOTE_MAX_ESPERA_US)
+    parser.add_argument("--compilado", action="store_true", help="Mantem o avaliador compilado no caminho sem lote.")
+    args = parser.parse_args(argv)
+
+    if args.modelo:
+        import joblib
+        modelo = joblib.load(args.modelo)
+    else:
+        modelo = modelo_sintetico()
+    resultados = executar(modelo, args.concorrencia, args.requisicoes, args.max_lote, args.max_espera_us, args.compilado)
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Micro-benchmarks das funcoes do servidor e teste de carga da maquina de estados.
+
+    python -m serverside.benchmarks.bench_servidor micro --saida micro.json
+    python -m serverside.benchmarks.bench_servidor carga --concorrencia 64 --sessoes 20 --saida carga.json
+    python -m serverside.benchmarks.bench_servidor carga --comparar carga_anterior.json
+    python -m serverside.benchmarks.bench_servidor inicializacao --repeticoes 5 --saida inicializacao.json
+
+`carga` roda sessoes completas (iniciar_aprendizado -> enviar_resposta ->
+enviar_feedback_exemplo ate 3 vezes) contra o app FastAPI pelo transporte ASGI
+do httpx, sem rede. O log de aprendizado, o snapshot do seletor de estilos e os
+perfis de alunos vao para um diretorio temporario e as mensagens do servidor
+sao descartadas durante a medicao. Cada resultado JSON leva o commit atual
+para comparar execucoes entre commits.
+
+`inicializacao` mede, em processos Python novos, o tempo do import do app ate a
+primeira resposta de iniciar_aprendizado (import, lifespan de inicializacao e
+primeira requisicao; a carga do modelo corre em paralelo numa thread e a
+primeira requisicao nao espera por ela) e quais dependencias pesadas ja
+estavam importadas em cada etapa.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+
+import numpy as np
+
+FAIXAS = ["3-5", "6-8", "9-12", "13-15", "16-18", "19-22", "23-25"]
+OPERACOES = ["soma", "subtracao", "multiplicacao", "divisao"]
+PROB_ENTENDEU = 0.5
+MODULOS_PESADOS = ("pandas", "sklearn", "joblib", "pyarrow")
+
+# Roda em um processo novo. O httpx (so o cliente do benchmark) e importado antes do relogio comecar.
+CODIGO_INICIALIZACAO = """
+import asyncio, json, sys, time
+import httpx
+inicio = time.perf_counter()
+from serverside.routes import main
+importado = time.perf_counter()
+pesados_import = [m for m in MODULOS if m in sys.modules]
+
+async def primeira_resposta():
+    async with main.app.router.lifespan_context(main.app):
+        iniciado = time.perf_counter()
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            resposta = await cliente.post("/aprender_matematica", json={
+                "acao": "iniciar_aprendizado", "operacao": "soma", "faixa_etaria": "9-12", "id_sessao": "bench"})
+        respondido = time.perf_counter()
+    return iniciado, respondido, resposta.status_code
+
+iniciado, respondido, status = asyncio.run(primeira_resposta())
+print(json.dumps({
+    "import_s": importado - inicio,
+    "inicializacao_s": iniciado - importado,
+    "primeira_resposta_s": respondido - iniciado,
+    "total_s": respondido - inicio,
+    "status": status,
+    "pesados_apos_import": pesados_import,
+    "pesados_apos_resposta": [m for m in MODULOS if m in sys.modules],
+}))
+"""
+
+
+def _commit_atual() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _importar_servidor(diretorio: str):
+    """Importa o app com tudo o que ele grava redirecionado para `diretorio`.
+
+    Log de aprendizado, snapshot do seletor de estilos, perfis de alunos e
+    sessoes SQLite: o feedback e as respostas do benchmark sao falsos e nao
+    podem chegar ao estado real do servidor.
+    """
+    from serverside.routes import main
+    from serverside.servicos.log_aprendizado import CSV_HEADERS, EscritorLogCSV
+    from serverside.servicos.perfis import RegistroPerfis
+    from serverside.servicos.sessao import ArmazenamentoSessoes, BackendSQLite
+    main.escritor_log = EscritorLogCSV(os.path.join(diretorio, "aprendizado_log.csv"), CSV_HEADERS)
+    if main.seletor_estilos is not None:
+        main.seletor_estilos.caminho_snapshot = os.path.join(diretorio, "seletor_estilos.npz")
+    if main.perfis_alunos is not None:
+        main.perfis_alunos = RegistroPerfis(os.path.join(diretorio, "perfis_alunos.db"), main.catalogo.operacoes)
+    if isinstance(main.sessoes.backend, BackendSQLite):
+        main.sessoes = ArmazenamentoSessoes(BackendSQLite(os.path.join(diretorio, "sessoes.db")))
+    return main
+
+
+@contextlib.contextmanager
+def _servidor_silencioso():
+    """Descarta as mensagens do servidor durante a medicao (o logger `serverside` escreve no stderr)."""
+    # O import do app chama configurar_logging, que redefine o nivel; por isso ele vem antes.
+    import serverside.routes.main  # noqa: F401
+    logger = logging.getLogger("serverside")
+    nivel = logger.level
+    logger.setLevel(logging.CRITICAL + 1)
+    try:
+        yield
+    finally:
+        logger.setLevel(nivel)
+
+
+def _estado_com_historico(main, operacao: str, faixa: str, respostas: int = 8) -> dict:
+    estado = main.sessoes.obter_ou_criar("bench")
+    main.resetar_historico(estado)
+    estado["id_sessao"] = "bench"
+    estado["operacao_atual"] = operacao
+    estado["faixa_etaria_atual"] = faixa
+    for i in range(respostas):
+        main.registrar_resposta(estado, operacao, i % 3 != 0, [3, 4])
+    estado["pergunta_atual_texto"] = "Quanto é 3 + 4?"
+    estado["pergunta_atual_numeros"] = [3, 4]
+    estado["resposta_correta_pergunta"] = 7
+    return estado
+
+
+def _medir(funcao, repeticoes: int, numero: int) -> dict:
+    tempos = [t / numero for t in timeit.repeat(funcao, repeat=repeticoes, number=numero)]
+    return {"us_por_chamada_min": min(tempos) * 1e6, "us_por_chamada_mediana": float(np.median(tempos)) * 1e6, "chamadas": numero * repeticoes}
+
+
+def micro(numero: int = 2000, repeticoes: int = 5) -> dict:
+    with tempfile.TemporaryDirectory() as diretorio, _servidor_silencioso():
+        main = _importar_servidor(diretorio)
+        # Sem o lifespan nao ha aquecimento; o modelo e carregado aqui para medir o caminho com predicao.
+        main.registro_modelos.carregar()
+        resultados = {}
+        for operacao in OPERACOES:
+            estado = _estado_com_historico(main, operacao, "13-15")
+            resultados[f"gerar_numeros_pergunta[{operacao}]"] = _medir(
+                lambda: main.gerar_numeros_pergunta(operacao, "13-15", estado, 1.2), repeticoes, numero)
+            resultados[f"gerar_pergunta[{operacao}]"] = _medir(
+                lambda: main.gerar_pergunta(operacao, "13-15", estado, 1.2), repeticoes, numero)
+            resultado = {"soma": 16, "subtracao": 8, "multiplicacao": 48, "divisao": 3}[operacao]
+            resultados[f"gerar_exemplo_pratico[{operacao}]"] = _medir(
+                lambda: main.gerar_exemplo_pratico(operacao, "13-15", [12, 4], resultado, 1), repeticoes, numero)
+        estado = _estado_com_historico(main, "soma", "9-12", respostas=20)
+        resultados["extrair_features_aluno"] = _medir(lambda: main.extrair_features_aluno(estado), repeticoes, numero)
+
+        def salvar():
+            estado["log_interacao_atual"] = {"resposta_aluno": 7.0, "acertou_pergunta": True, "exemplo_fornecido_1": "exemplo", "entendeu_exemplo_1": True}
+            main.salvar_log_csv(estado)
+        resultados["salvar_log_csv"] = _medir(salvar, repeticoes, numero)
+        main.escritor_log.fechar()
+    return resultados
+
+
+async def _aluno(cliente, id_sessao: str, sessoes: int, rng: random.Random, latencias: dict, erros: list) -> None:
+    async def postar(corpo: dict) -> dict:
+        inicio = time.perf_counter()
+        resposta = await cliente.post("/aprender_matematica", json={**corpo, "id_sessao": id_sessao})
+        latencias[corpo["acao"]].append(time.perf_counter() - inicio)
+        dados = resposta.json()
+        if resposta.status_code != 200 or "erro" in dados:
+            erros.append({"acao": corpo["acao"], "status": resposta.status_code, "resposta": dados})
+        return dados
+
+    for _ in range(sessoes):
+        inicio = await postar({"acao": "iniciar_aprendizado", "operacao": rng.choice(OPERACOES), "faixa_etaria": rng.choice(FAIXAS)})
+        if "pergunta" not in inicio:
+            continue
+        # O cliente nao conhece a resposta; acertar ou errar so muda o historico da sessao.
+        await postar({"acao": "enviar_resposta", "resposta_aluno": str(rng.randint(0, 50))})
+        for _ in range(3):
+            entendeu = rng.random() < PROB_ENTENDEU
+            dados = await postar({"acao": "enviar_feedback_exemplo", "feedback_entendeu": entendeu})
+            if "proxima_acao_sugerida" in dados:
+                break
+
+
+async def _carga(main, concorrencia: int, sessoes: int, semente: int) -> dict:
+    import httpx
+
+    await main.iniciar_servicos()
+    latencias = {"iniciar_aprendizado": [], "enviar_resposta": [], "enviar_feedback_exemplo": []}
+    erros: list = []
+    transporte = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(
+            _aluno(cliente, f"bench-{i}", sessoes, random.Random(semente + i), latencias, erros)
+            for i in range(concorrencia)
+        ))
+        duracao = time.perf_counter() - inicio
+    await main.encerrar()
+
+    total = sum(len(v) for v in latencias.values())
+    por_acao = {}
+    for acao, valores in latencias.items():
+        if not valores:
+            continue
+        ms = np.asarray(valores) * 1000
+        por_acao[acao] = {
+            "requisicoes": len(valores),
+            "qps": len(valores) / duracao,
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)),
+        }
+    return {
+        "concorrencia": concorrencia,
+        "sessoes_por_aluno": sessoes,
+        "duracao_s": duracao,
+        "requisicoes": total,
+        "qps_total": total / duracao,
+        "erros": len(erros),
+        "exemplos_erros": erros[:5],
+        "por_acao": por_acao,
+        "log": main.escritor_log.estatisticas(),
+    }
+
+
+def carga(concorrencia: int = 32, sessoes: int = 20, semente: int = 0) -> dict:
+    with tempfile.TemporaryDirectory() as diretorio, _servidor_silencioso():
+        main = _importar_servidor(diretorio)
+        return asyncio.run(_carga(main, concorrencia, sessoes, semente))
+
+
+def inicializacao(repeticoes: int = 5) -> dict:
+    raiz = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    ambiente = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [raiz, os.environ.get("PYTHONPATH")])),
+                "CALCULA_NIVEL_LOG": "ERROR"}
+    codigo = CODIGO_INICIALIZACAO.replace("MODULOS", repr(MODULOS_PESADOS))
+    execucoes = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        processo = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, env=ambiente)
+        duracao = time.perf_counter() - inicio
+        if processo.returncode != 0:
+            raise RuntimeError(f"Processo de medicao falhou:\n{processo.stderr}")
+        execucoes.append({**json.loads(processo.stdout.strip().splitlines()[-1]), "processo_s": duracao})
+
+    resultados = {}
+    for chave in ("import_s", "inicializacao_s", "primeira_resposta_s", "total_s", "processo_s"):
+        valores = [e[chave] for e in execucoes]
+        resultados[chave.replace("_s", "_ms")] = {"min": min(valores) * 1000, "mediana": float(np.median(valores)) * 1000}
+    resultados["repeticoes"] = repeticoes
+    resultados["status"] = sorted({e["status"] for e in execucoes})
+    resultados["pesados_apos_import"] = execucoes[-1]["pesados_apos_import"]
+    resultados["pesados_apos_resposta"] = execucoes[-1]["pesados_apos_resposta"]
+    return resultados
+
+
+def comparar(atual: dict, anterior: dict, prefixo: str = "") -> list[str]:
+    """Lista as metricas numericas que mudaram entre dois resultados (razao atual/anterior)."""
+    linhas = []
+    for chave, valor in atual.items():
+        antigo = anterior.get(chave)
+        if isinstance(valor, dict) and isinstance(antigo, dict):
+            linhas.extend(comparar(valor, antigo, f"{prefixo}{chave}."))
+        elif isinstance(valor, (int, float)) and isinstance(antigo, (int, float)) and not isinstance(valor, bool) and antigo:
+            linhas.append(f"{prefixo}{chave}: {antigo:.3f} -> {valor:.3f} ({valor / antigo:.2f}x)")
+    return linhas
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_micro = sub.add_parser("micro", help="Micro-benchmarks das funcoes do caminho quente.")
+    p_micro.add_argument("--numero", type=int, default=2000, help="Chamadas por repeticao.")
+    p_micro.add_argument("--repeticoes", type=int, default=5)
+    p_carga = sub.add_parser("carga", help="Sessoes completas concorrentes via ASGI.")
+    p_carga.add_argument("--concorrencia", type=int, default=32, help="Alunos simultaneos.")
+    p_carga.add_argument("--sessoes", type=int, default=20, help="Sessoes por aluno.")
+    p_carga.add_argument("--semente", type=int, default=0)
+    p_inicio = sub.add_parser("inicializacao", help="Tempo do import ate a primeira resposta, em processos novos.")
+    p_inicio.add_argument("--repeticoes", type=int, default=5)
+    for p in (p_micro, p_carga, p_inicio):
+        p.add_argument("--saida", help="Arquivo JSON para salvar o resultado.")
+        p.add_argument("--comparar", help="Resultado JSON anterior para comparar.")
+    args = parser.parse_args(argv)
+
+    if args.comando == "micro":
+        resultados = micro(args.numero, args.repeticoes)
+    elif args.comando == "inicializacao":
+        resultados = inicializacao(args.repeticoes)
+    else:
+        resultados = carga(args.concorrencia, args.sessoes, args.semente)
+    saida = {
+        "comando": args.comando,
+        "commit": _commit_atual(),
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "resultados": resultados,
+    }
+    print(json.dumps(saida, indent=2, ensure_ascii=False))
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        print("\n".join(comparar(saida["resultados"], anterior["resultados"])))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(saida, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
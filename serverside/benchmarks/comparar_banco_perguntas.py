@@ -0,0 +1,87 @@
+"""Compara as distribuicoes do banco de perguntas com o gerador original.
+
+    python -m serverside.benchmarks.comparar_banco_perguntas --amostras 20000
+
+Para cada operacao x faixa etaria x fator, sorteia `amostras` pares com
+`gerar_numeros_pergunta` e com `gerar_numeros_vetorizado` e aplica o teste de
+Kolmogorov-Smirnov de duas amostras em n1, n2 e na resposta. Tambem confere as
+invariantes (divisao exata, subtracao nao negativa). Sai com codigo 1 se algum
+teste rejeitar a igualdade ao nivel `--alfa`.
+"""
+import argparse
+import math
+import random
+import sys
+
+import numpy as np
+
+from serverside.servicos.banco_perguntas import calcular_respostas, gerar_numeros_vetorizado
+from serverside.servicos.sessao import novo_estado_sessao
+
+FATORES = [0.5, 0.75, 1.0, 1.25, 1.5]
+
+
+def estatistica_ks(a: np.ndarray, b: np.ndarray) -> float:
+    valores = np.union1d(a, b)
+    cdf_a = np.searchsorted(np.sort(a), valores, side="right") / len(a)
+    cdf_b = np.searchsorted(np.sort(b), valores, side="right") / len(b)
+    return float(np.max(np.abs(cdf_a - cdf_b)))
+
+
+def amostrar_original(operacao: str, faixa: str, fator: float, n: int) -> tuple[np.ndarray, np.ndarray]:
+    from serverside.routes.main import gerar_numeros_pergunta
+    estado = novo_estado_sessao()
+    pares = np.array([gerar_numeros_pergunta(operacao, faixa, estado, fator) for _ in range(n)], dtype=np.int64)
+    return pares[:, 0], pares[:, 1]
+
+
+def comparar(amostras: int, alfa: float, semente: int, operacoes=None, faixas=None, fatores=FATORES) -> list[dict]:
+    """Sem `operacoes`/`faixas`, percorre todas as suportadas pelo servidor."""
+    from serverside.routes.main import OBJETOS_POR_FAIXA, OPERACOES_SUPORTADAS
+    random.seed(semente)
+    rng = np.random.default_rng(semente)
+    critico = math.sqrt(-math.log(alfa / 2) / 2) * math.sqrt(2 / amostras)
+    resultados = []
+    for operacao in operacoes or OPERACOES_SUPORTADAS:
+        for faixa in faixas or [f for f in OBJETOS_POR_FAIXA if f != "padrao"]:
+            for fator in fatores:
+                o1, o2 = amostrar_original(operacao, faixa, fator, amostras)
+                v1, v2 = gerar_numeros_vetorizado(operacao, faixa, fator, amostras, rng)
+                ks = {
+                    "n1": estatistica_ks(o1, v1),
+                    "n2": estatistica_ks(o2, v2),
+                    "resposta": estatistica_ks(calcular_respostas(operacao, o1, o2), calcular_respostas(operacao, v1, v2)),
+                }
+                invariantes = bool(np.all(v1 >= 0) and np.all(v2 >= 0))
+                if operacao == "subtracao":
+                    invariantes &= bool(np.all(v1 - v2 >= 0))
+                if operacao == "divisao":
+                    invariantes &= bool(np.all(v2 >= 1) and np.all(v1 % v2 == 0))
+                resultados.append({
+                    "operacao": operacao, "faixa_etaria": faixa, "fator": fator,
+                    "ks": ks, "critico": critico, "invariantes": invariantes,
+                    "aprovado": invariantes and max(ks.values()) <= critico,
+                })
+    return resultados
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--amostras", type=int, default=20000)
+    parser.add_argument("--alfa", type=float, default=1e-4)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    resultados = comparar(args.amostras, args.alfa, args.semente)
+    reprovados = [r for r in resultados if not r["aprovado"]]
+    pior = max(resultados, key=lambda r: max(r["ks"].values()))
+    print(f"{len(resultados)} combinações testadas, {len(reprovados)} reprovadas. "
+          f"Maior KS: {max(pior['ks'].values()):.4f} em {pior['operacao']}/{pior['faixa_etaria']}/{pior['fator']} "
+          f"(crítico {pior['critico']:.4f}).")
+    for r in reprovados:
+        print(f"  REPROVADO {r['operacao']}/{r['faixa_etaria']}/{r['fator']}: ks={r['ks']} invariantes={r['invariantes']}")
+    sys.exit(1 if reprovados else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Varredura exaustiva das garantias do gerador de numeros das perguntas.
+
+    python -m serverside.benchmarks.verificar_gerador_numeros
+    python -m serverside.benchmarks.verificar_gerador_numeros --amostras 5000 --passo 0.005 --saida gerador.json
+
+Percorre operacoes x faixas etarias x uma grade fina de fatores em
+[FATOR_MIN, FATOR_MAX] e sorteia `amostras` pares por combinacao com
+`gerar_numeros_pergunta` (original) e/ou `gerar_numeros_vetorizado` (banco de
+perguntas), em um pool de processos. Cada combinacao tem semente propria,
+entao o resultado nao depende da ordem de execucao nem do numero de processos.
+
+Invariantes conferidas em todos os pares:
+- n1 >= 1 e n2 >= 1;
+- n1 e n2 dentro das cotas derivadas das regras do gerador (`limites`),
+  incluindo os minimos das faixas adultas e o caso especial de 3-5;
+- subtracao sem resultado negativo;
+- divisao exata, com quociente em [1, teto de quociente da faixa].
+Tambem confere que o fator previsto pelo modelo e limitado a [0.5, 1.5].
+
+Sai com codigo 1 se alguma invariante falhar. Com os padroes (passo 0.01,
+400 amostras) sao cerca de 1,1 milhao de sorteios por gerador.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from serverside.servicos.banco_perguntas import (
+    FAIXAS_ADULTAS, FATOR_MAX, FATOR_MIN, QUOCIENTE_MAX_BASE, QUOCIENTE_MAX_BASE_PADRAO, RANGE_MAX_BASE,
+    RANGE_MAX_BASE_PADRAO, calcular_respostas, gerar_numeros_vetorizado,
+)
+
+OPERACOES = ("soma", "subtracao", "multiplicacao", "divisao")
+FAIXAS = ("3-5", "6-8", "9-12", "13-15", "16-18", "19-22", "23-25")
+GERADORES = ("original", "vetorizado")
+FATORES_RELATORIO = (0.5, 1.0, 1.5)
+
+
+def limites(operacao: str, faixa_etaria: str, fator: float) -> dict:
+    """Cotas superiores de n1, n2 (e do quociente, na divisao) para um fator fixo."""
+    f = fator
+    range_max_base = RANGE_MAX_BASE.get(faixa_etaria, RANGE_MAX_BASE_PADRAO)
+    range_max = max(5, int(range_max_base * f))
+    adulto = faixa_etaria in FAIXAS_ADULTAS and f >= 1
+    # Maiores minimos sorteaveis nas faixas adultas; fora delas o minimo e 1.
+    n1_min = max(1, int(20 * f)) if adulto else 1
+    n2_min = max(1, int(10 * f)) if adulto else 1
+
+    if operacao in ("soma", "subtracao"):
+        n1_max = max(range_max, n1_min + 1)
+        n2_max = max(range_max, n2_min + 1)
+        if operacao == "subtracao":
+            # Depois da troca n1 >= n2; empates somam ate max(1, range_max // 10 * f) em n1.
+            n2_max = max(n1_max, n2_max)
+            n1_max = n2_max + max(1, int(range_max // 10 * f))
+        return {"n1": n1_max, "n2": n2_max}
+
+    if faixa_etaria == "3-5":
+        n1_max = int(5 * f) if f > 0.8 else 5
+        n2_max = int(3 * f) if f > 0.8 else 3
+    else:
+        md_n1_base = range_max_base // 10 if range_max_base > 50 else range_max_base // 5
+        md_n2_base = 20 if faixa_etaria in FAIXAS_ADULTAS else 10
+        n1_max = max(n1_min + 1, int(md_n1_base * f))
+        n2_max = max(n2_min + 1, int(md_n2_base * f))
+    if operacao == "multiplicacao":
+        return {"n1": n1_max, "n2": n2_max}
+
+    if faixa_etaria not in ("3-5", "6-8") and range_max > 5:
+        n2_max = max(n2_max, 10)
+    quociente_max = max(1, int(QUOCIENTE_MAX_BASE.get(faixa_etaria, QUOCIENTE_MAX_BASE_PADRAO) * f))
+    return {"n1": n2_max * quociente_max, "n2": n2_max, "quociente": quociente_max}
+
+
+def verificar_pares(operacao: str, faixa_etaria: str, fator: float, n1: np.ndarray, n2: np.ndarray) -> dict[str, np.ndarray]:
+    """Mascara de violacao por invariante (True = par invalido)."""
+    cotas = limites(operacao, faixa_etaria, fator)
+    falhas = {
+        "n1_minimo": n1 < 1,
+        "n2_minimo": n2 < 1,
+        "n1_maximo": n1 > cotas["n1"],
+        "n2_maximo": n2 > cotas["n2"],
+    }
+    if operacao == "subtracao":
+        falhas["subtracao_negativa"] = n1 < n2
+    if operacao == "divisao":
+        divisor = np.maximum(n2, 1)
+        falhas["divisao_inexata"] = (n1 % divisor != 0) | (n2 < 1)
+        quociente = n1 // divisor
+        falhas["quociente_fora"] = (quociente < 1) | (quociente > cotas["quociente"])
+    return falhas
+
+
+def _semente(semente: int, gerador: str, operacao: str, faixa_etaria: str, fator: float) -> int:
+    return zlib.crc32(f"{semente}|{gerador}|{operacao}|{faixa_etaria}|{fator:.4f}".encode())
+
+
+def _sortear(gerador: str, operacao: str, faixa_etaria: str, fator: float, amostras: int, semente: int) -> tuple[np.ndarray, np.ndarray]:
+    if gerador == "vetorizado":
+        return gerar_numeros_vetorizado(operacao, faixa_etaria, fator, amostras, np.random.default_rng(semente))
+    from serverside.routes.main import gerar_numeros_pergunta
+    from serverside.servicos.sessao import novo_estado_sessao
+    random.seed(semente)
+    estado = novo_estado_sessao()
+    pares = np.array([gerar_numeros_pergunta(operacao, faixa_etaria, estado, fator) for _ in range(amostras)])
+    if pares.dtype.kind != "i":
+        raise TypeError(f"{operacao}/{faixa_etaria}/{fator}: gerador original devolveu valores nao inteiros ({pares.dtype}).")
+    return pares[:, 0], pares[:, 1]
+
+
+def _resumo(valores: np.ndarray) -> dict:
+    p01, p50, p99 = np.percentile(valores, (1, 50, 99))
+    return {"min": int(valores.min()), "p01": float(p01), "p50": float(p50), "p99": float(p99),
+            "max": int(valores.max()), "media": float(valores.mean())}
+
+
+def verificar_combinacao(tarefa: tuple) -> dict:
+    gerador, operacao, faixa_etaria, fator, amostras, semente = tarefa
+    n1, n2 = _sortear(gerador, operacao, faixa_etaria, fator, amostras, _semente(semente, gerador, operacao, faixa_etaria, fator))
+    n1, n2 = n1.astype(np.int64), n2.astype(np.int64)
+    falhas = {}
+    for nome, mascara in verificar_pares(operacao, faixa_etaria, fator, n1, n2).items():
+        if mascara.any():
+            i = int(np.argmax(mascara))
+            falhas[nome] = {"quantidade": int(mascara.sum()), "exemplo": [int(n1[i]), int(n2[i])]}
+    respostas = calcular_respostas(operacao, n1, np.maximum(n2, 1))
+    return {
+        "gerador": gerador, "operacao": operacao, "faixa_etaria": faixa_etaria, "fator": fator, "amostras": amostras,
+        "cotas": limites(operacao, faixa_etaria, fator), "falhas": falhas,
+        "n1": _resumo(n1), "n2": _resumo(n2), "resposta": _resumo(respostas),
+        "pares_distintos": int(len(np.unique(n1 * (int(n2.max()) + 1) + n2))),
+    }
+
+
+def verificar_limite_fator() -> list[float]:
+    """Previsoes do modelo fora de [0.5, 1.5] precisam ser limitadas antes de chegar ao gerador."""
+    from serverside.routes.main import _aplicar_predicao_fator
+    erradas = []
+    for previsto in np.round(np.arange(-2.0, 4.0001, 0.01), 4).tolist() + [float("inf"), float("-inf")]:
+        aplicado = _aplicar_predicao_fator({}, previsto)
+        esperado = min(max(previsto, 0.5), 1.5)
+        if not 0.5 <= aplicado <= 1.5 or aplicado != esperado:
+            erradas.append(previsto)
+    return erradas
+
+
+def grade_fatores(passo: float) -> list[float]:
+    quantidade = int(round((FATOR_MAX - FATOR_MIN) / passo))
+    return [round(FATOR_MIN + i * passo, 4) for i in range(quantidade + 1)]
+
+
+def executar(geradores, amostras: int, passo: float, semente: int, processos: int | None) -> list[dict]:
+    if "original" in geradores:
+        # Importado antes do pool: com fork, os processos herdam o app ja carregado.
+        import serverside.routes.main  # noqa: F401
+    tarefas = [(g, op, faixa, fator, amostras, semente)
+               for g in geradores for op in OPERACOES for faixa in FAIXAS for fator in grade_fatores(passo)]
+    processos = processos or os.cpu_count() or 1
+    if processos == 1:
+        return [verificar_combinacao(t) for t in tarefas]
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return list(executor.map(verificar_combinacao, tarefas, chunksize=max(1, len(tarefas) // (processos * 8))))
+
+
+def _relatorio(resultados: list[dict]) -> list[str]:
+    linhas = []
+    por_contexto: dict[tuple, dict[float, dict]] = {}
+    for r in resultados:
+        por_contexto.setdefault((r["gerador"], r["operacao"], r["faixa_etaria"]), {})[r["fator"]] = r
+    linhas.append("gerador     operacao       faixa  resposta p50 (f=" + "/".join(str(f) for f in FATORES_RELATORIO)
+                  + ")   resposta max   n1 max/cota   n2 max/cota")
+    for (gerador, operacao, faixa), por_fator in sorted(por_contexto.items()):
+        medianas = "/".join(f"{por_fator[f]['resposta']['p50']:g}" if f in por_fator else "-" for f in FATORES_RELATORIO)
+        maximo = max(r["resposta"]["max"] for r in por_fator.values())
+        n1 = max(por_fator.values(), key=lambda r: r["n1"]["max"])
+        n2 = max(por_fator.values(), key=lambda r: r["n2"]["max"])
+        linhas.append(f"{gerador:<11} {operacao:<14} {faixa:<6} {medianas:<28} {maximo:<14} "
+                      f"{n1['n1']['max']}/{n1['cotas']['n1']:<10} {n2['n2']['max']}/{n2['cotas']['n2']}")
+    return linhas
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gerador", choices=GERADORES + ("ambos",), default="ambos")
+    parser.add_argument("--amostras", type=int, default=400, help="Sorteios por combinacao operacao x faixa x fator.")
+    parser.add_argument("--passo", type=float, default=0.01, help="Passo da grade de fatores.")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--processos", type=int, default=None, help="Tamanho do pool (padrao: numero de CPUs).")
+    parser.add_argument("--saida", help="Arquivo JSON com as estatisticas de cada combinacao.")
+    parser.add_argument("--silencioso", action="store_true", help="Nao imprime a tabela de distribuicoes.")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("CALCULA_NIVEL_LOG", "ERROR")
+    geradores = GERADORES if args.gerador == "ambos" else (args.gerador,)
+    inicio = time.perf_counter()
+    resultados = executar(geradores, args.amostras, args.passo, args.semente, args.processos)
+    fatores_errados = verificar_limite_fator() if "original" in geradores else []
+    duracao = time.perf_counter() - inicio
+
+    reprovados = [r for r in resultados if r["falhas"]]
+    sorteios = sum(r["amostras"] for r in resultados)
+    if not args.silencioso:
+        print("\n".join(_relatorio(resultados)))
+    print(f"{len(resultados)} combinações, {sorteios} sorteios em {duracao:.1f}s; "
+          f"{len(reprovados)} combinações com falhas; {len(fatores_errados)} previsões com limite de fator incorreto.")
+    for r in reprovados:
+        print(f"  FALHA {r['gerador']} {r['operacao']}/{r['faixa_etaria']}/{r['fator']}: {r['falhas']} cotas={r['cotas']}")
+    if fatores_errados:
+        print(f"  FALHA limite do fator para previsões {fatores_errados[:10]}")
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump({"amostras": args.amostras, "passo": args.passo, "semente": args.semente, "resultados": resultados},
+                      arquivo, ensure_ascii=False, indent=2)
+    sys.exit(1 if reprovados or fatores_errados else 0)
+
+
+if __name__ == "__main__":
+    main()
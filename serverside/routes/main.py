@@ -1,73 +1,112 @@
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI, Header, Response
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
+import asyncio
+import gc
 import random
 import os
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-import joblib
+from serverside.servicos.analise_log import carregar_contagens_estilos, carregar_ordem_estilos
+from serverside.servicos.bandit_exemplos import SeletorEstilos
+from serverside.servicos.banco_perguntas import BancoPerguntas
+from serverside.servicos.catalogo import CACHE_CONTROL, Catalogo
+from serverside.servicos.exemplos import GeradorExemplos
+from serverside.servicos.inferencia import PreditorDificuldade
+from serverside.servicos.lote_predicao import LoteadorPredicoes
+from serverside.servicos.registro_modelos import RegistroModelos
+from serverside.servicos.log_aprendizado import CSV_HEADERS, EscritorLogCSV, caminho_shard
+from serverside.servicos.metricas import RegistroMetricas, configurar_logging
+from serverside.servicos.perfis import RegistroPerfis
+from serverside.servicos.sessao import (
+    ArmazenamentoSessoes, SessaoOcupada, criar_backend, extrair_features_aluno, gerar_id_sessao, id_sessao_valido, registrar_resposta,
+    resetar_historico, ID_SESSAO_MAX, ID_SESSAO_PADRAO, SESSAO_INTERVALO_EXPIRACAO_SEGUNDOS
+)
 
 MODELO_DIFICULDADE_PATH = "modelo_fator_dificuldade.pkl"
 PREPROCESSADOR_FEATURES_PATH = "preprocessador_features.pkl"
-
-modelo_dificuldade = None
-preprocessador_features = None
-
-try:
-    modelo_dificuldade = joblib.load(MODELO_DIFICULDADE_PATH)
-    print(f"INFO: Modelo de dificuldade '{MODELO_DIFICULDADE_PATH}' carregado com sucesso.")
-except FileNotFoundError:
-    print(f"AVISO: Arquivo do modelo de dificuldade '{MODELO_DIFICULDADE_PATH}' não encontrado. Usando lógica de dificuldade padrão.")
-except Exception as e:
-    print(f"ERRO: Não foi possível carregar o modelo de dificuldade: {e}. Usando lógica de dificuldade padrão.")
+MODELOS_DIR = os.environ.get("CALCULA_MODELOS_DIR", "modelos")
+MODELOS_INTERVALO_VERIFICACAO = float(os.environ.get("CALCULA_MODELOS_INTERVALO", "30"))
+LOTE_PREDICAO_ATIVO = os.environ.get("CALCULA_LOTE_PREDICAO", "0") == "1"
+BANCO_PERGUNTAS_ATIVO = os.environ.get("CALCULA_BANCO_PERGUNTAS", "1") == "1"
+ANALISE_EXEMPLOS_PATH = os.environ.get("CALCULA_ANALISE_EXEMPLOS", "analise_exemplos.json")
+SELETOR_ESTILOS = os.environ.get("CALCULA_SELETOR_ESTILOS", "bandit")
+SELETOR_SNAPSHOT_PATH = os.environ.get("CALCULA_SELETOR_SNAPSHOT", "seletor_estilos.npz")
+PERFIS_ATIVO = os.environ.get("CALCULA_PERFIS", "1") == "1"
+PERFIS_PATH = os.environ.get("CALCULA_PERFIS_PATH", "perfis_alunos.db")
+
+logger = configurar_logging()
+metricas = RegistroMetricas()
+metrica_requisicoes = metricas.contador("calcula_requisicoes_total", "Requisicoes em /aprender_matematica por acao e resultado.", ("acao", "resultado"))
+metrica_latencia = metricas.histograma("calcula_requisicao_segundos", "Latencia de /aprender_matematica por acao.", ("acao",))
+metrica_predicao = metricas.histograma("calcula_predicao_segundos", "Latencia da predicao do fator de dificuldade.")
+metrica_fator = metricas.histograma("calcula_fator_dificuldade", "Fator de dificuldade aplicado as perguntas geradas.",
+                                    limites=tuple(round(0.5 + 0.1 * i, 1) for i in range(11)))
+metrica_respostas = metricas.contador("calcula_respostas_total", "Respostas por operacao, faixa etaria e acerto.", ("operacao", "faixa_etaria", "acertou"))
+
+registro_modelos = RegistroModelos(MODELO_DIFICULDADE_PATH, PREPROCESSADOR_FEATURES_PATH, MODELOS_DIR, MODELOS_INTERVALO_VERIFICACAO)
+loteador_predicoes = LoteadorPredicoes() if LOTE_PREDICAO_ATIVO else None
+banco_perguntas = BancoPerguntas() if BANCO_PERGUNTAS_ATIVO else None
 
 
 class AlunoInput(BaseModel):
     acao: str
+    id_sessao: str = None
+    id_aluno: str = None
     operacao: str = None
     faixa_etaria: str = None
     resposta_aluno: str = None
     feedback_entendeu: bool = None
+    quantidade: int = None
+    respostas_lista: list[str | None] = None
 
-app = FastAPI()
+rotas = APIRouter()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+SESSAO_BACKEND = os.environ.get("CALCULA_SESSAO_BACKEND", "memoria")
+SESSAO_SQLITE_PATH = os.environ.get("CALCULA_SESSAO_SQLITE_PATH", "sessoes.db")
+SESSAO_INTERVALO_EXPIRACAO = float(os.environ.get("CALCULA_SESSAO_INTERVALO_EXPIRACAO", SESSAO_INTERVALO_EXPIRACAO_SEGUNDOS))
 
-estado_sessao = {
-    "id_sessao": None,
-    "operacao_atual": None,
-    "faixa_etaria_atual": None,
-    "pergunta_atual_texto": None,
-    "pergunta_atual_numeros": [],
-    "resposta_correta_pergunta": None,
-    "ultimo_exemplo_fornecido": None,
-    "tentativas_exemplo_atual": 0,
-    "log_interacao_atual": {},
-    "historico_respostas_sessao": [],
-    "perguntas_respondidas_total_sessao": 0,
-    "acertos_total_sessao": 0,
-    "ml_fator_dificuldade_aplicado": 1.0,
-    "ml_features_usadas": {}
-}
+sessoes = ArmazenamentoSessoes(criar_backend(SESSAO_BACKEND, caminho_sqlite=SESSAO_SQLITE_PATH),
+                               intervalo_expiracao=SESSAO_INTERVALO_EXPIRACAO)
 
 CSV_FILE = "aprendizado_log.csv"
-CSV_HEADERS = [
-    "timestamp", "id_sessao", "faixa_etaria", "operacao_solicitada",
-    "pergunta_gerada", "numeros_pergunta", "resposta_aluno", "resposta_correta", "acertou_pergunta",
-    "exemplo_fornecido_1", "entendeu_exemplo_1",
-    "exemplo_fornecido_2", "entendeu_exemplo_2",
-    "exemplo_fornecido_3", "entendeu_exemplo_3",
-
-    "ml_fator_dificuldade_aplicado",
-    "ml_taxa_acerto_recente",
-    "ml_perguntas_na_op_atual"
-]
+LOG_FORMATO = os.environ.get("CALCULA_LOG_FORMATO", "csv")
+LOG_PARQUET_DIR = os.environ.get("CALCULA_LOG_PARQUET_DIR", "log_parquet")
+
+if LOG_FORMATO == "parquet":
+    from serverside.servicos.log_parquet import EscritorLogParquet
+    escritor_log = EscritorLogParquet(LOG_PARQUET_DIR, CSV_HEADERS)
+else:
+    escritor_log = EscritorLogCSV(CSV_FILE, CSV_HEADERS)
+
+metricas.medidor("calcula_log_fila_pendentes", "Linhas do log de aprendizado aguardando gravacao.", lambda: escritor_log.pendentes())
+metricas.medidor("calcula_log_linhas_gravadas", "Linhas do log de aprendizado ja gravadas.", lambda: escritor_log.contadores["linhas_gravadas"])
+metricas.medidor("calcula_log_linhas_descartadas", "Linhas do log de aprendizado descartadas com a fila cheia.",
+                 lambda: escritor_log.contadores["linhas_descartadas"])
+metricas.medidor("calcula_sessoes_ativas", "Sessoes guardadas no backend de sessoes.", lambda: len(sessoes))
+
+
+async def iniciar_servicos():
+    asyncio.get_running_loop().create_task(registro_modelos.aquecer())
+    if banco_perguntas is not None:
+        asyncio.get_running_loop().run_in_executor(None, banco_perguntas.aquecer, catalogo.operacoes, catalogo.faixas_etarias)
+    registro_modelos.iniciar_observador()
+    sessoes.iniciar_expiracao()
+    if seletor_estilos is not None:
+        seletor_estilos.iniciar_snapshots()
+
+
+async def encerrar():
+    await registro_modelos.parar_observador()
+    await sessoes.parar_expiracao()
+    if seletor_estilos is not None:
+        await seletor_estilos.parar_snapshots()
+    if perfis_alunos is not None:
+        perfis_alunos.fechar()
+    escritor_log.fechar()
+
 
 OBJETOS_POR_FAIXA = {
     "3-5": ["maçã", "bola", "gatinho", "carrinho", "doce", "flor"],
@@ -80,75 +119,128 @@ OBJETOS_POR_FAIXA = {
     "padrao": ["item", "unidade", "ponto", "valor"]
 }
 OPERACOES_SUPORTADAS = ["soma", "subtracao", "multiplicacao", "divisao"]
+ACOES = ("iniciar_aprendizado", "enviar_resposta", "enviar_feedback_exemplo", "gerar_lista", "enviar_respostas_lista")
+LISTA_QUANTIDADE_PADRAO = 10
+LISTA_QUANTIDADE_MAX = 50
 NUM_EXEMPLO_VARIATIONS = 3
 MAX_TENTATIVAS_EXEMPLO = NUM_EXEMPLO_VARIATIONS
 
-def obter_objeto_aleatorio(faixa_etaria: str) -> str:
-    objetos = OBJETOS_POR_FAIXA.get(faixa_etaria, OBJETOS_POR_FAIXA["padrao"])
-    return random.choice(objetos)
-
-def pluralizar(palavra: str, quantidade: int) -> str:
-    if quantidade == 1: return palavra
-    if palavra.endswith('ão'): return palavra[:-2] + 'ões'
-    elif palavra.endswith('m'): return palavra[:-1] + 'ns'
-    elif palavra.endswith(('r', 's', 'z')): return palavra + 'es'
-    elif palavra.endswith(tuple('aeiouln')): return palavra + "s"
-    else: return palavra + 's'
-
-def extrair_features_aluno(estado_sessao_atual: dict) -> dict:
-    features = {
-        "taxa_acerto_geral_sessao": 0.0,
-        "taxa_acerto_recente_op_sessao": 0.0,
-        "perguntas_respondidas_op_sessao": 0,
-        "faixa_etaria_inicio_num": 0,
-    }
-
-    if estado_sessao_atual.get("perguntas_respondidas_total_sessao", 0) > 0:
-        features["taxa_acerto_geral_sessao"] = estado_sessao_atual.get("acertos_total_sessao", 0) / estado_sessao_atual["perguntas_respondidas_total_sessao"]
-
-    op_atual = estado_sessao_atual.get("operacao_atual")
-    hist_respostas = estado_sessao_atual.get("historico_respostas_sessao", [])
-    
-    respostas_op_atual = [r for r in hist_respostas if r.get("op") == op_atual]
-    features["perguntas_respondidas_op_sessao"] = len(respostas_op_atual)
-
-    if features["perguntas_respondidas_op_sessao"] > 0:
-        ultimas_n_respostas_op = respostas_op_atual[-5:]
-        acertos_recentes_op = sum(1 for r in ultimas_n_respostas_op if r.get("acertou"))
-        if ultimas_n_respostas_op:
-             features["taxa_acerto_recente_op_sessao"] = acertos_recentes_op / len(ultimas_n_respostas_op)
-
-    faixa_str = estado_sessao_atual.get("faixa_etaria_atual", "0-0")
+catalogo = Catalogo(
+    operacoes=tuple(OPERACOES_SUPORTADAS),
+    faixas_etarias=tuple(f for f in OBJETOS_POR_FAIXA if f != "padrao"),
+    acoes=ACOES,
+    variacoes_exemplo=NUM_EXEMPLO_VARIATIONS,
+)
+gerador_exemplos = GeradorExemplos(OBJETOS_POR_FAIXA)
+try:
+    ordem_estilos_exemplo = carregar_ordem_estilos(ANALISE_EXEMPLOS_PATH)
+except (OSError, ValueError) as e:
+    logger.warning("Não foi possível ler a análise de exemplos '%s': %s. Usando a ordem padrão de estilos.", ANALISE_EXEMPLOS_PATH, e)
+    ordem_estilos_exemplo = {}
+
+seletor_estilos = None
+if SELETOR_ESTILOS == "bandit":
+    seletor_estilos = SeletorEstilos(catalogo.operacoes, catalogo.faixas_etarias, NUM_EXEMPLO_VARIATIONS, SELETOR_SNAPSHOT_PATH)
     try:
-        features["faixa_etaria_inicio_num"] = int(faixa_str.split('-')[0])
-    except:
-        features["faixa_etaria_inicio_num"] = 0 
-
-    print(f"DEBUG: Features extraídas para ML: {features}")
-    return features
-
-def gerar_numeros_pergunta(operacao: str, faixa_etaria: str, estado_sessao_atual: dict) -> tuple[int, int]:
-    n1, n2 = 0, 0
-    fator_dificuldade_ml = 1.0
-    estado_sessao_atual["ml_fator_dificuldade_aplicado"] = fator_dificuldade_ml
+        if not seletor_estilos.carregar():
+            seletor_estilos.semear(carregar_contagens_estilos(ANALISE_EXEMPLOS_PATH))
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Não foi possível restaurar o seletor de estilos: %s. Começando com priors uniformes.", e)
+
+perfis_alunos = RegistroPerfis(PERFIS_PATH, catalogo.operacoes) if PERFIS_ATIVO else None
+if perfis_alunos is not None:
+    metricas.medidor("calcula_perfis_em_cache", "Perfis de alunos no cache LRU.", lambda: len(perfis_alunos))
+    metricas.medidor("calcula_perfis_gravacoes_pendentes", "Respostas aguardando gravacao nos perfis de alunos.",
+                     lambda: perfis_alunos.escritor.pendentes())
+
+
+def preparar_prefork() -> None:
+    """Prepara o processo pai do modo multiprocesso (serverside.servicos.multiprocesso) antes do fork.
+
+    O modelo e carregado aqui para que os workers o compartilhem por
+    copy-on-write; gc.freeze() tira esses objetos das coletas, que de outra
+    forma tocariam suas paginas e forcariam a copia em cada worker.
+    """
+    registro_modelos.carregar()
+    if seletor_estilos is not None:
+        seletor_estilos.compartilhar()
+    sessoes.reabrir()
+    if perfis_alunos is not None:
+        perfis_alunos.reabrir()
+    gc.collect()
+    gc.freeze()
+
+
+def configurar_worker(indice: int) -> None:
+    """Ajustes de cada worker logo apos o fork: sementes proprias, conexao propria e shard de log proprio."""
+    global escritor_log
+    random.seed()
+    sessoes.reabrir()
+    if perfis_alunos is not None:
+        perfis_alunos.reabrir()
+    if banco_perguntas is not None:
+        banco_perguntas.resemear()
+    if seletor_estilos is not None:
+        seletor_estilos.resemear()
+        if indice != 0:
+            # Os arrays sao compartilhados; basta um worker gravar o snapshot.
+            seletor_estilos.caminho_snapshot = None
+    if LOG_FORMATO != "parquet":
+        # Arquivos Parquet ja recebem nomes unicos; o CSV ganha um shard por worker (ver mesclar_shards).
+        escritor_log = EscritorLogCSV(caminho_shard(CSV_FILE, indice), CSV_HEADERS)
+
+
+def _features_para_predicao(estado_sessao_atual: dict) -> tuple[dict | None, PreditorDificuldade | None]:
+    estado_sessao_atual["ml_fator_dificuldade_aplicado"] = 1.0
     estado_sessao_atual["ml_features_usadas"] = {}
+    estado_sessao_atual["ml_versao_modelo"] = None
+    # Calculadas mesmo sem modelo: o log guarda as features exatas (com a semente do perfil) para o treino.
+    features_para_modelo = extrair_features_aluno(estado_sessao_atual)
+    estado_sessao_atual["ml_features_usadas"] = features_para_modelo
+    modelo_atual = registro_modelos.obter()
+    if modelo_atual is None:
+        return None, None
+    estado_sessao_atual["ml_versao_modelo"] = modelo_atual.versao
+    return features_para_modelo, modelo_atual.preditor
+
+def _aplicar_predicao_fator(estado_sessao_atual: dict, predicao_fator: float) -> float:
+    fator_dificuldade_ml = max(0.5, min(float(predicao_fator), 1.5))
+    estado_sessao_atual["ml_fator_dificuldade_aplicado"] = fator_dificuldade_ml
+    logger.debug("ML previu fator de dificuldade: %s, aplicado: %s", predicao_fator, fator_dificuldade_ml)
+    return fator_dificuldade_ml
 
-
-    if modelo_dificuldade:
-        features_para_modelo = extrair_features_aluno(estado_sessao_atual)
-        estado_sessao_atual["ml_features_usadas"] = features_para_modelo
-
-        try:
-            df_para_predicao = pd.DataFrame([features_para_modelo])
-            
-            predicao_fator = modelo_dificuldade.predict(df_para_predicao)[0]
-            
-            fator_dificuldade_ml = max(0.5, min(float(predicao_fator), 1.5)) 
-            estado_sessao_atual["ml_fator_dificuldade_aplicado"] = fator_dificuldade_ml
-            print(f"INFO: ML previu fator de dificuldade: {predicao_fator}, aplicado: {fator_dificuldade_ml}")
-        except Exception as e:
-            print(f"ERRO: Falha ao usar modelo de ML para prever dificuldade: {e}. Usando fator padrão 1.0.")
-           
+def prever_fator_dificuldade(estado_sessao_atual: dict) -> float:
+    features_para_modelo, preditor = _features_para_predicao(estado_sessao_atual)
+    if features_para_modelo is None:
+        return 1.0
+    try:
+        inicio = time.perf_counter()
+        predicao_fator = preditor.prever(features_para_modelo)
+        metrica_predicao.observar(time.perf_counter() - inicio)
+        return _aplicar_predicao_fator(estado_sessao_atual, predicao_fator)
+    except Exception as e:
+        logger.error("Falha ao usar modelo de ML para prever dificuldade: %s. Usando fator padrão 1.0.", e)
+        return 1.0
+
+async def prever_fator_dificuldade_async(estado_sessao_atual: dict) -> float:
+    if loteador_predicoes is None:
+        return prever_fator_dificuldade(estado_sessao_atual)
+    features_para_modelo, preditor = _features_para_predicao(estado_sessao_atual)
+    if features_para_modelo is None:
+        return 1.0
+    try:
+        inicio = time.perf_counter()
+        predicao_fator = await loteador_predicoes.prever(preditor, features_para_modelo)
+        metrica_predicao.observar(time.perf_counter() - inicio)
+        return _aplicar_predicao_fator(estado_sessao_atual, predicao_fator)
+    except Exception as e:
+        logger.error("Falha ao usar modelo de ML para prever dificuldade: %s. Usando fator padrão 1.0.", e)
+        return 1.0
+
+def gerar_numeros_pergunta(operacao: str, faixa_etaria: str, estado_sessao_atual: dict, fator_dificuldade_ml: float | None = None) -> tuple[int, int]:
+    n1, n2 = 0, 0
+    if fator_dificuldade_ml is None:
+        fator_dificuldade_ml = prever_fator_dificuldade(estado_sessao_atual)
 
     range_max_base = 5
     if faixa_etaria == "6-8": range_max_base = 10
@@ -161,7 +253,7 @@ def gerar_numeros_pergunta(operacao: str, faixa_etaria: str, estado_sessao_atual
 
     range_max = int(range_max_base * fator_dificuldade_ml)
     range_max = max(5, range_max)
-    print(f"DEBUG: Range max base: {range_max_base}, Fator ML: {fator_dificuldade_ml}, Range max final: {range_max}")
+    logger.debug("Range max base: %s, Fator ML: %s, Range max final: %s", range_max_base, fator_dificuldade_ml, range_max)
 
     n1_min = 1
     n2_min = 1
@@ -228,11 +320,18 @@ def gerar_numeros_pergunta(operacao: str, faixa_etaria: str, estado_sessao_atual
     n1=max(0,n1); n2=max(0,n2 if operacao != 'divisao' else (1 if n2==0 else n2) )
     return n1, n2
 
-def gerar_pergunta(operacao: str, faixa_etaria: str, estado_sessao_atual: dict) -> tuple[str | None, list[int] | None, int | None, str | None]:
-    if operacao not in OPERACOES_SUPORTADAS:
+def gerar_pergunta(operacao: str, faixa_etaria: str, estado_sessao_atual: dict, fator_dificuldade_ml: float | None = None) -> tuple[str | None, list[int] | None, int | None, str | None]:
+    if operacao not in catalogo.operacoes_validas:
         return None, None, None, "Operação não suportada."
 
-    n1, n2 = gerar_numeros_pergunta(operacao, faixa_etaria, estado_sessao_atual)
+    if banco_perguntas is not None:
+        if fator_dificuldade_ml is None:
+            fator_dificuldade_ml = prever_fator_dificuldade(estado_sessao_atual)
+        n1, n2, resposta_correta, pergunta_texto, fator_usado = banco_perguntas.sortear(operacao, faixa_etaria, fator_dificuldade_ml)
+        estado_sessao_atual["ml_fator_dificuldade_aplicado"] = fator_usado
+        return pergunta_texto, [n1, n2], resposta_correta, None
+
+    n1, n2 = gerar_numeros_pergunta(operacao, faixa_etaria, estado_sessao_atual, fator_dificuldade_ml)
     pergunta_texto = ""
     resposta_correta = 0
 
@@ -249,174 +348,137 @@ def gerar_pergunta(operacao: str, faixa_etaria: str, estado_sessao_atual: dict)
         resposta_correta = n1 // n2
     return pergunta_texto, [n1, n2], resposta_correta, None
 
-def obter_personagem_aleatorio(faixa_etaria: str, usar_voce_chance=0.3) -> tuple[str, str, str]:
-    if random.random() < usar_voce_chance: return "você", "você", "tem"
-    personagens_base = [("Ana", "ela", "tem"), ("Léo", "ele", "tem"), ("Bia", "ela", "tem"), ("um colega", "ele", "tem"), ("uma startup", "ela", "tem"), ("um cliente", "ele", "tem"), ("a equipe", "ela", "tem")]
-    personagens_contextuais = [("o estudante", "ele", "tem"), ("a pesquisadora", "ela", "tem"), ("o gerente de projetos", "ele", "tem"), ("a consultora financeira", "ela", "tem"), ("um investidor", "ele", "tem"), ("uma empresa", "ela", "tem")]
-    if faixa_etaria in ["3-5", "6-8"]: escolha = random.choice([p for p in personagens_base if p[0] not in ["uma startup", "um cliente", "a equipe"]])
-    elif faixa_etaria in ["9-12", "13-15"]: escolha = random.choice(personagens_base[:4] + personagens_contextuais[:2])
-    elif faixa_etaria in ["16-18", "19-22"]: escolha = random.choice(personagens_base + personagens_contextuais[:4])
-    else: escolha = random.choice(personagens_base + personagens_contextuais)
-    return escolha
-
-def obter_elementos_soma(faixa_etaria: str) -> tuple[str, str]:
-    verbos_ganho = ["ganhou", "recebeu", "adicionou", "acumulou", "obteve", "conseguiu"]
-    locais_acumulo = ["em sua conta", "em seu portfólio", "ao seu orçamento", "no total de vendas", "como bônus", "de lucro", "em sua poupança", "para o projeto"]
-    if faixa_etaria in ["3-5", "6-8", "9-12"]:
-        verbos_ganho = ["ganhou", "achou", "recebeu", "coletou", "juntou"]
-        locais_acumulo = ["em sua coleção", "em seu cofrinho", "na cesta", "na prateleira", "em sua mochila"]
-    elif faixa_etaria in ["13-15", "16-18"]:
-        verbos_ganho.extend(["economizou", "adquiriu"])
-        locais_acumulo.extend(["para sua viagem", "em créditos de jogo", "em sua mesada"])
-    return random.choice(verbos_ganho), random.choice(locais_acumulo)
-
-def obter_elementos_subtracao(faixa_etaria: str) -> tuple[str, str]:
-    verbos_perda = ["perdeu", "gastou", "retirou", "deduziu", "utilizou", "pagou"]
-    locais_origem = ["de sua conta", "de seu orçamento", "do investimento inicial", "para as despesas", "como imposto", "do saldo disponível", "para cobrir um custo"]
-    if faixa_etaria in ["3-5", "6-8", "9-12"]:
-        verbos_perda = ["perdeu", "deu", "usou", "comeu", "tirou"]
-        locais_origem = ["de sua coleção", "de sua caixa", "da prateleira", "do pacote", "do total que tinha"]
-    elif faixa_etaria in ["13-15", "16-18"]:
-        verbos_perda.extend(["consumiu", "emprestou"])
-        locais_origem.extend(["de seus créditos", "da mensalidade", "para um amigo"])
-    return random.choice(verbos_perda), random.choice(locais_origem)
-
-def obter_elementos_multi_div(faixa_etaria: str) -> tuple[str, str, str]:
-    grupos_plural_base = ["caixas", "pacotes", "grupos", "lotes", "conjuntos"]
-    if faixa_etaria in ["3-5", "6-8", "9-12"]: grupos_plural = ["cestas", "saquinhos", "equipes (de amigos)", "fileiras (de brinquedos)"] + grupos_plural_base[:2]
-    elif faixa_etaria in ["13-15", "16-18"]: grupos_plural = ["turmas", "disciplinas", "experimentos", "capítulos"] + grupos_plural_base[:3]
-    else: grupos_plural = ["departamentos", "projetos", "campanhas", "ações (da empresa)", "contratos", "relatórios"] + grupos_plural_base
-    grupos_singular = [g[:-1] if g.endswith("s") and g != "ações (da empresa)" and not g.endswith("ens") else g.replace(" (de amigos)","").replace(" (de brinquedos)","") for g in grupos_plural]
-    grupos_singular = [s.replace("ações (da empresa)", "ação (da empresa)") for s in grupos_singular]
-    idx = random.randrange(len(grupos_plural)); g_plural = grupos_plural[idx]; g_singular = grupos_singular[idx]
-    distribuicao_templates = [f"em cada {g_singular}", f"por {g_singular}", f"para cada {g_singular}", "em cada unidade", "contido em cada um(a)"]
-    if faixa_etaria in ["19-22", "23-25"]: distribuicao_templates.extend([f"alocado(a) por {g_singular}", f"designado(a) para cada {g_singular}"])
-    return g_plural, g_singular, random.choice(distribuicao_templates)
-
-def gerar_exemplo_pratico(operacao: str, faixa_etaria: str, numeros: list[int], resultado_correto: int, tentativa_idx: int = 0) -> str:
-    n1, n2 = numeros
-    obj_original = obter_objeto_aleatorio(faixa_etaria)
-    obj_n1_p = pluralizar(obj_original, n1)
-    obj_n2_p = pluralizar(obj_original, n2 if n2 != 0 else 1) if n2 != 0 else f"0 {obj_original}"
-    if resultado_correto == 0:
-        if faixa_etaria in ["3-5", "6-8", "9-12"]:
-             obj_res_p_txt = f"nenhum(a) {obj_original}" if not obj_original.endswith("s") and not '(' in obj_original else f"nenhum {obj_original}"
-             if '(' in obj_original: obj_res_p_txt = f"nenhum valor de {obj_original}"
-        else: obj_res_p_txt = f"0 {pluralizar(obj_original, 0)}"
-    else: obj_res_p_txt = f"{resultado_correto} {pluralizar(obj_original, resultado_correto)}"
-    exemplo = ""; simbolo = {"soma": "+", "subtracao": "-", "multiplicacao": "x", "divisao": "÷"}.get(operacao)
-    personagem_nome, personagem_pronome, personagem_verbo_ter = obter_personagem_aleatorio(faixa_etaria)
-    variation_style = tentativa_idx % NUM_EXEMPLO_VARIATIONS
-    if operacao == "soma":
-        verbo_s, contexto_s = obter_elementos_soma(faixa_etaria)
-        if variation_style == 0: exemplo = f"Considere que {personagem_nome} já {personagem_verbo_ter} {n1} {obj_n1_p}. Se {personagem_pronome} {verbo_s} mais {n2} {obj_n2_p if n2 !=0 else 'nada'}, {personagem_pronome} passará a ter {obj_res_p_txt} {contexto_s}."
-        elif variation_style == 1:
-            outro_p_nome, _, _ = obter_personagem_aleatorio(faixa_etaria, usar_voce_chance=0.05) 
-            exemplo = f"Se {personagem_nome} possui {n1} {obj_n1_p} e {outro_p_nome} transfere mais {n2} {obj_n2_p if n2 !=0 else 'nenhum ' + obj_original} para {personagem_pronome}, {personagem_nome} ficará com {obj_res_p_txt}."
-        else: 
-            local_generico = random.choice(['um saldo', 'um total', 'um montante', 'um relatório', 'uma planilha']) if faixa_etaria not in ["3-5","6-8","9-12"] else random.choice(['um cesto', 'um pote', 'um saco'])
-            exemplo = f"Imagine {local_generico} inicial de {n1} {obj_n1_p}. Adicionando {n2} {obj_n2_p if n2 !=0 else 'zero ' + obj_original}, o novo {local_generico.split(' ')[-1]} será de {obj_res_p_txt}."
-    elif operacao == "subtracao":
-        if n1 < n2 and faixa_etaria in ["3-5", "6-8", "9-12"]: exemplo = f"Se {personagem_nome} tem apenas {n1} {obj_n1_p}, não é possível tirar {n2} {obj_n2_p}. Precisaria de mais! Matematicamente, o resultado seria {resultado_correto}, indicando uma falta."
-        elif n1 < n2: exemplo = f"Se {personagem_nome} tem um saldo de {n1} {obj_n1_p} e precisa deduzir {n2} {obj_n2_p}, o resultado será {obj_res_p_txt}, indicando um déficit ou valor negativo."
-        else:
-            verbo_sub, contexto_sub = obter_elementos_subtracao(faixa_etaria)
-            if variation_style == 0: exemplo = f"{personagem_nome} {personagem_verbo_ter} {n1} {obj_n1_p}. Após {verbo_sub} {n2} {obj_n2_p} {contexto_sub}, {personagem_pronome} restará com {obj_res_p_txt}."
-            elif variation_style == 1:
-                local_origem_generico = random.choice(['um estoque', 'um orçamento', 'uma reserva']) if faixa_etaria not in ["3-5","6-8","9-12"] else random.choice(['uma prateleira', 'uma caixa', 'uma gaveta'])
-                exemplo = f"Havia {n1} {obj_n1_p} em {local_origem_generico}. Se {n2} {pluralizar(obj_original, n2)} foram {random.choice(['removidos', 'utilizados', 'retirados'])}, restaram {obj_res_p_txt}."
-            else:
-                verbo_acao = random.choice(["precisa pagar", "tem uma despesa de", "investiu"]) if faixa_etaria not in ["3-5","6-8","9-12"] else "precisa usar"
-                exemplo = f"Se {personagem_nome} {verbo_acao} {n2} {obj_n2_p} de um total disponível de {n1} {obj_n1_p}, sobrarão {obj_res_p_txt}."
-    elif operacao == "multiplicacao":
-        g_plural, g_singular, dist_template = obter_elementos_multi_div(faixa_etaria)
-        obj_n2_fmt = f"{n2} {pluralizar(obj_original, n2)}" if n2 != 0 else f"nenhum {obj_original}"
-        if variation_style == 0: exemplo = f"Se {personagem_nome} possui {n1} {pluralizar(g_singular, n1)}, e {dist_template.replace(g_singular, '')} {random.choice(['contém', 'gera', 'vale', 'custa'])} {obj_n2_fmt}, então o valor total ou quantidade total que {personagem_pronome} tem é de {obj_res_p_txt}."
-        elif variation_style == 1:
-            acao_mult = random.choice(["adquiriu", "processou", "vendeu", "analisou"]) if faixa_etaria not in ["3-5","6-8","9-12"] else random.choice(["comprou", "organizou", "fez"])
-            exemplo = f"{personagem_nome} {acao_mult} {n1} {pluralizar(g_singular, n1)}, cada um(a) associado(a) a {obj_n2_fmt}. Ao todo, isso representa {obj_res_p_txt}."
-        else: exemplo = f"A operação de multiplicar {n1} por {n2} pode ser vista como somar o número {n2}, {n1} {pluralizar('vez',n1)}. Isso resulta em {obj_res_p_txt}."
-    elif operacao == "divisao":
-        if n2 == 0: return "Não podemos dividir por zero em um exemplo prático!"
-        g_plural, g_singular, dist_template = obter_elementos_multi_div(faixa_etaria)
-        if resultado_correto == 0 and n1 > 0 : obj_resultado_fmt = f"nenhum(a) {obj_original} completo(a) (sobrariam {n1 % n2 if n2!=0 else 0} {pluralizar(obj_original, n1 % n2 if n2!=0 else 0)})"
-        else: obj_resultado_fmt = f"{resultado_correto} {pluralizar(obj_original, resultado_correto)}"
-        entidade_divisao_singular = random.choice(["participante", "seção", g_singular, "beneficiário"]) if faixa_etaria not in ["3-5","6-8","9-12"] else random.choice(["amigo", "pessoa", "caixinha"])
-        entidade_divisao_plural = pluralizar(entidade_divisao_singular, n2)
-        if variation_style == 0: exemplo = f"Se {personagem_nome} possui {n1} {obj_n1_p} e deseja distribuir igualmente entre {n2} {entidade_divisao_plural}, cada {entidade_divisao_singular} receberá {obj_resultado_fmt}."
-        elif variation_style == 1: exemplo = f"Imagine um total de {n1} {obj_n1_p} que precisam ser alocados em {n2} {pluralizar(g_singular, n2)} de forma equitativa. Cada {g_singular} comportará {obj_resultado_fmt}."
-        else: exemplo = f"Dado um montante de {n1} {obj_n1_p}, se cada {g_singular} deve conter {n2} {pluralizar(obj_original,n2)}, é possível formar {obj_resultado_fmt} {pluralizar(g_singular, resultado_correto)} completos."
-    if exemplo: exemplo += f" (Matematicamente: {n1} {simbolo} {n2} = {resultado_correto})"
-    else: exemplo = "Desculpe, não consegui pensar em um bom exemplo para esta situação."
-    return exemplo
-
-def salvar_log_csv():
-    global estado_sessao
-    log_final = {}
-    log_final["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_final["id_sessao"] = estado_sessao["id_sessao"]
-    log_final["faixa_etaria"] = estado_sessao["faixa_etaria_atual"]
-    log_final["operacao_solicitada"] = estado_sessao["operacao_atual"]
+def escolher_estilo_exemplo(estado_sessao: dict) -> int | None:
+    """Estilo do proximo exemplo pelo bandit (None quando o seletor esta desligado)."""
+    if seletor_estilos is None:
+        return None
+    mostrados = estado_sessao.setdefault("estilos_exemplo_atual", [])
+    estilo = seletor_estilos.escolher(estado_sessao["operacao_atual"], estado_sessao["faixa_etaria_atual"], mostrados)
+    mostrados.append(estilo)
+    return estilo
+
+def gerar_exemplo_pratico(operacao: str, faixa_etaria: str, numeros: list[int], resultado_correto: int, tentativa_idx: int = 0, variation_style: int | None = None) -> str:
+    if variation_style is None:
+        # Com analise do log disponivel, a primeira tentativa usa o estilo mais bem entendido naquele contexto.
+        ordem = ordem_estilos_exemplo.get((operacao, faixa_etaria))
+        variation_style = ordem[tentativa_idx % len(ordem)] if ordem else tentativa_idx % NUM_EXEMPLO_VARIATIONS
+    return gerador_exemplos.gerar(operacao, faixa_etaria, numeros, resultado_correto, variation_style)
+
+def registrar_no_perfil(estado_sessao: dict, operacao: str, acertou: bool) -> None:
+    if perfis_alunos is not None and estado_sessao.get("id_aluno"):
+        perfis_alunos.registrar(estado_sessao["id_aluno"], operacao, acertou)
+
+def _linha_log_base(estado_sessao: dict, fator_aplicado: float, versao_modelo: str | None, ml_features: dict,
+                    operacao: str | None = None, faixa_etaria: str | None = None) -> dict:
+    return {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "id_sessao": estado_sessao["id_sessao"],
+        "faixa_etaria": faixa_etaria or estado_sessao["faixa_etaria_atual"],
+        "operacao_solicitada": operacao or estado_sessao["operacao_atual"],
+        "ml_fator_dificuldade_aplicado": fator_aplicado,
+        "ml_versao_modelo": versao_modelo,
+        "ml_taxa_acerto_recente": ml_features.get("taxa_acerto_recente_op_sessao"),
+        "ml_perguntas_na_op_atual": ml_features.get("perguntas_respondidas_op_sessao"),
+        "ml_taxa_acerto_geral": ml_features.get("taxa_acerto_geral_sessao"),
+    }
+
+def salvar_log_csv(estado_sessao: dict):
+    log_final = _linha_log_base(
+        estado_sessao, estado_sessao.get("ml_fator_dificuldade_aplicado", 1.0),
+        estado_sessao.get("ml_versao_modelo"), estado_sessao.get("ml_features_usadas", {})
+    )
     log_final["pergunta_gerada"] = estado_sessao["pergunta_atual_texto"]
     log_final["numeros_pergunta"] = str(estado_sessao["pergunta_atual_numeros"])
     log_final["resposta_correta"] = estado_sessao["resposta_correta_pergunta"]
-    
-    log_final["ml_fator_dificuldade_aplicado"] = estado_sessao.get("ml_fator_dificuldade_aplicado", 1.0)
-    
-    ml_features = estado_sessao.get("ml_features_usadas", {})
-    log_final["ml_taxa_acerto_recente"] = ml_features.get("taxa_acerto_recente_op_sessao") 
-    log_final["ml_perguntas_na_op_atual"] = ml_features.get("perguntas_respondidas_op_sessao") 
 
     log_final.update(estado_sessao["log_interacao_atual"])
 
-    df_linha = pd.DataFrame([log_final])
-    
-    for col in CSV_HEADERS:
-        if col not in df_linha.columns:
-            df_linha[col] = None
-    df_linha = df_linha[CSV_HEADERS]
+    escritor_log.registrar(log_final)
 
-    if not os.path.exists(CSV_FILE):
-        df_linha.to_csv(CSV_FILE, index=False, header=True, encoding='utf-8-sig')
-    else:
-        df_linha.to_csv(CSV_FILE, mode='a', index=False, header=False, encoding='utf-8-sig')
-    
     estado_sessao["log_interacao_atual"] = {}
 
 
-@app.post("/aprender_matematica")
+@rotas.post("/aprender_matematica")
 async def aprender_matematica(data: AlunoInput):
-    global estado_sessao
-
+    inicio = time.perf_counter()
+    acao = data.acao if data.acao in catalogo.acoes_validas else "desconhecida"
+    resultado = "excecao"
+    chave_sessao = data.id_sessao or ID_SESSAO_PADRAO
+    try:
+        if not id_sessao_valido(chave_sessao):
+            resultado = "erro"
+            return {"erro": f"id_sessao inválido: use até {ID_SESSAO_MAX} letras, números, '_', '.', ':' ou '-'."}
+        async with sessoes.abrir(chave_sessao) as estado_sessao:
+            resposta = await processar_acao(data, estado_sessao)
+        resultado = "erro" if "erro" in resposta else "ok"
+        return resposta
+    except SessaoOcupada:
+        resultado = "erro"
+        logger.warning("Sessão '%s' continua reservada por outra requisição; pedido recusado.", chave_sessao)
+        return {"erro": "Outra requisição desta sessão ainda está em andamento. Tente novamente."}
+    finally:
+        metrica_requisicoes.inc(acao, resultado)
+        metrica_latencia.observar(time.perf_counter() - inicio, acao)
+
+
+@rotas.get("/catalogo")
+async def obter_catalogo(if_none_match: str | None = Header(default=None)):
+    cabecalhos = {"ETag": catalogo.etag, "Cache-Control": CACHE_CONTROL}
+    if catalogo.corresponde(if_none_match):
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(content=catalogo.corpo, media_type="application/json", headers=cabecalhos)
+
+
+@rotas.get("/metrics")
+async def exportar_metricas():
+    return PlainTextResponse(metricas.renderizar(), media_type="text/plain; version=0.0.4")
+
+
+async def _preparar_sessao(data: AlunoInput, estado_sessao: dict) -> str | None:
+    """Valida operacao/faixa e troca o contexto da sessao; devolve a mensagem de erro, se houver."""
+    if not data.operacao or not data.faixa_etaria:
+        return "Operação e faixa etária são obrigatórias para iniciar."
+
+    op_lower = data.operacao.lower()
+    if op_lower not in catalogo.operacoes_validas:
+        return catalogo.erro_operacao(data.operacao)
+
+    if data.faixa_etaria not in catalogo.faixas_validas:
+        return catalogo.erro_faixa(data.faixa_etaria)
+
+    if estado_sessao.get("id_sessao") != (estado_sessao.get("id_sessao") or gerar_id_sessao()) or \
+       estado_sessao.get("operacao_atual") != op_lower or \
+       estado_sessao.get("faixa_etaria_atual") != data.faixa_etaria:
+
+        resetar_historico(estado_sessao)
+        # Pergunta ou lista pendente pertence ao contexto anterior e nao pode ser respondida no novo.
+        estado_sessao["pergunta_atual_texto"] = None
+        estado_sessao["lista_atual"] = None
+        logger.debug("Resetando histórico de ML da sessão devido a nova sessão/operação/faixa.")
+
+    estado_sessao["id_sessao"] = estado_sessao.get("id_sessao") or data.id_sessao or gerar_id_sessao()
+    estado_sessao["operacao_atual"] = op_lower
+    estado_sessao["faixa_etaria_atual"] = data.faixa_etaria
+    if data.id_aluno:
+        estado_sessao["id_aluno"] = data.id_aluno
+    if perfis_alunos is not None and estado_sessao.get("id_aluno"):
+        estado_sessao["perfil_semente"] = await perfis_alunos.semente_features_async(estado_sessao["id_aluno"])
+    return None
+
+
+async def processar_acao(data: AlunoInput, estado_sessao: dict) -> dict:
     if data.acao == "iniciar_aprendizado":
-        if not data.operacao or not data.faixa_etaria:
-            return {"erro": "Operação e faixa etária são obrigatórias para iniciar."}
-        
-        op_lower = data.operacao.lower()
-        if op_lower not in OPERACOES_SUPORTADAS:
-            return {"erro": f"Operação '{data.operacao}' não suportada. Tente: {', '.join(OPERACOES_SUPORTADAS)}"}
-        
-        faixas_validas = [f for f in OBJETOS_POR_FAIXA.keys() if f != "padrao"]
-        if data.faixa_etaria not in faixas_validas:
-            return {"erro": f"Faixa etária '{data.faixa_etaria}' não suportada. Tente uma das seguintes: {', '.join(faixas_validas)}"}
+        erro_validacao = await _preparar_sessao(data, estado_sessao)
+        if erro_validacao: return {"erro": erro_validacao}
+        op_lower = estado_sessao["operacao_atual"]
 
-        if estado_sessao.get("id_sessao") != (estado_sessao.get("id_sessao") or datetime.now().strftime("%Y%m%d%H%M%S%f")) or \
-           estado_sessao.get("operacao_atual") != op_lower or \
-           estado_sessao.get("faixa_etaria_atual") != data.faixa_etaria:
-            
-            estado_sessao["historico_respostas_sessao"] = []
-            estado_sessao["perguntas_respondidas_total_sessao"] = 0
-            estado_sessao["acertos_total_sessao"] = 0
-            print("INFO: Resetando histórico de ML da sessão devido a nova sessão/operação/faixa.")
-
-        estado_sessao["id_sessao"] = estado_sessao.get("id_sessao") or datetime.now().strftime("%Y%m%d%H%M%S%f")
-        estado_sessao["operacao_atual"] = op_lower
-        estado_sessao["faixa_etaria_atual"] = data.faixa_etaria
         estado_sessao["tentativas_exemplo_atual"] = 0
         estado_sessao["log_interacao_atual"] = {}
-        pergunta, numeros, resp_correta, erro_geracao = gerar_pergunta(op_lower, data.faixa_etaria, estado_sessao)
+        fator_dificuldade_ml = await prever_fator_dificuldade_async(estado_sessao)
+        pergunta, numeros, resp_correta, erro_geracao = gerar_pergunta(op_lower, data.faixa_etaria, estado_sessao, fator_dificuldade_ml)
         if erro_geracao: return {"erro": erro_geracao}
 
+        metrica_fator.observar(estado_sessao["ml_fator_dificuldade_aplicado"])
         estado_sessao["pergunta_atual_texto"] = pergunta
         estado_sessao["pergunta_atual_numeros"] = numeros
         estado_sessao["resposta_correta_pergunta"] = resp_correta
@@ -424,6 +486,7 @@ async def aprender_matematica(data: AlunoInput):
         return {
             "mensagem": f"Olá! Vamos praticar {op_lower} com exemplos para a faixa etária de {data.faixa_etaria}.",
             "pergunta": pergunta,
+            "id_sessao": data.id_sessao,
             "id_sessao_debug": estado_sessao["id_sessao"],
             "ml_fator_aplicado_debug": estado_sessao.get("ml_fator_dificuldade_aplicado", "N/A")
         }
@@ -443,22 +506,19 @@ async def aprender_matematica(data: AlunoInput):
         estado_sessao["log_interacao_atual"]["resposta_aluno"] = resp_aluno_num
         estado_sessao["log_interacao_atual"]["acertou_pergunta"] = correta
         
-        estado_sessao["historico_respostas_sessao"].append({
-            "numeros_pergunta": list(estado_sessao["pergunta_atual_numeros"]),
-            "acertou": correta,
-            "op": str(estado_sessao["operacao_atual"])
-        })
-        estado_sessao["perguntas_respondidas_total_sessao"] += 1
-        if correta:
-            estado_sessao["acertos_total_sessao"] += 1
+        registrar_resposta(estado_sessao, str(estado_sessao["operacao_atual"]), correta, estado_sessao["pergunta_atual_numeros"])
+        registrar_no_perfil(estado_sessao, estado_sessao["operacao_atual"], correta)
+        metrica_respostas.inc(estado_sessao["operacao_atual"], estado_sessao["faixa_etaria_atual"], str(correta).lower())
         
         msg_feedback = "Correto!" if correta else f"Quase! A resposta correta era {estado_sessao['resposta_correta_pergunta']}."
         
         estado_sessao["tentativas_exemplo_atual"] = 0 
+        estado_sessao["estilos_exemplo_atual"] = []
         exemplo = gerar_exemplo_pratico(
             estado_sessao["operacao_atual"], estado_sessao["faixa_etaria_atual"],
             estado_sessao["pergunta_atual_numeros"], estado_sessao["resposta_correta_pergunta"],
-            tentativa_idx=estado_sessao["tentativas_exemplo_atual"]
+            tentativa_idx=estado_sessao["tentativas_exemplo_atual"],
+            variation_style=escolher_estilo_exemplo(estado_sessao)
         )
         estado_sessao["ultimo_exemplo_fornecido"] = exemplo
         estado_sessao["log_interacao_atual"][f"exemplo_fornecido_{estado_sessao['tentativas_exemplo_atual'] + 1}"] = exemplo
@@ -477,9 +537,12 @@ async def aprender_matematica(data: AlunoInput):
 
         num_exemplo_log = estado_sessao["tentativas_exemplo_atual"] + 1
         estado_sessao["log_interacao_atual"][f"entendeu_exemplo_{num_exemplo_log}"] = data.feedback_entendeu
+        if seletor_estilos is not None and estado_sessao.get("estilos_exemplo_atual"):
+            seletor_estilos.registrar(estado_sessao["operacao_atual"], estado_sessao["faixa_etaria_atual"],
+                                      estado_sessao["estilos_exemplo_atual"][-1], data.feedback_entendeu)
         
         if data.feedback_entendeu:
-            salvar_log_csv()
+            salvar_log_csv(estado_sessao)
             msg_proximo = (f"Ótimo! Fico feliz em ajudar. Gostaria de tentar outra pergunta de {estado_sessao['operacao_atual']} "
                            f"para a mesma faixa etária ({estado_sessao['faixa_etaria_atual']}) ou aprender uma nova operação? Use a ação 'iniciar_aprendizado'.")
             estado_sessao["pergunta_atual_texto"] = None 
@@ -490,7 +553,8 @@ async def aprender_matematica(data: AlunoInput):
                 novo_exemplo = gerar_exemplo_pratico(
                     estado_sessao["operacao_atual"], estado_sessao["faixa_etaria_atual"],
                     estado_sessao["pergunta_atual_numeros"], estado_sessao["resposta_correta_pergunta"],
-                    tentativa_idx=estado_sessao["tentativas_exemplo_atual"]
+                    tentativa_idx=estado_sessao["tentativas_exemplo_atual"],
+                    variation_style=escolher_estilo_exemplo(estado_sessao)
                 )
                 estado_sessao["ultimo_exemplo_fornecido"] = novo_exemplo
                 estado_sessao["log_interacao_atual"][f"exemplo_fornecido_{estado_sessao['tentativas_exemplo_atual'] + 1}"] = novo_exemplo
@@ -500,11 +564,127 @@ async def aprender_matematica(data: AlunoInput):
                     "pergunta_feedback": "E agora, este novo exemplo ficou mais claro? (Responda com 'sim' ou 'não')"
                 }
             else:
-                salvar_log_csv()
+                salvar_log_csv(estado_sessao)
                 msg_final_tentativa = ("Puxa, parece que ainda não ficou totalmente claro. Não se preocupe, aprender leva tempo! "
                                        "Seus esforços são muito válidos. Que tal tentarmos uma nova pergunta sobre este tópico ou mudar de assunto? "
                                        "Use a ação 'iniciar_aprendizado'.")
                 estado_sessao["pergunta_atual_texto"] = None
                 return {"mensagem": msg_final_tentativa, "proxima_acao_sugerida": "iniciar_aprendizado"}
+
+    elif data.acao == "gerar_lista":
+        quantidade = LISTA_QUANTIDADE_PADRAO if data.quantidade is None else data.quantidade
+        if not 1 <= quantidade <= LISTA_QUANTIDADE_MAX:
+            return {"erro": f"A lista deve ter entre 1 e {LISTA_QUANTIDADE_MAX} perguntas."}
+        erro_validacao = await _preparar_sessao(data, estado_sessao)
+        if erro_validacao: return {"erro": erro_validacao}
+
+        # Uma unica predicao vale para a lista inteira; as respostas ficam so no servidor.
+        fator_dificuldade_ml = await prever_fator_dificuldade_async(estado_sessao)
+        perguntas = []
+        for _ in range(quantidade):
+            pergunta, numeros, resp_correta, erro_geracao = gerar_pergunta(
+                estado_sessao["operacao_atual"], data.faixa_etaria, estado_sessao, fator_dificuldade_ml)
+            if erro_geracao: return {"erro": erro_geracao}
+            metrica_fator.observar(estado_sessao["ml_fator_dificuldade_aplicado"])
+            perguntas.append({"pergunta": pergunta, "numeros": numeros, "resposta_correta": resp_correta})
+
+        estado_sessao["lista_atual"] = {
+            "perguntas": perguntas,
+            "operacao": estado_sessao["operacao_atual"],
+            "faixa_etaria": estado_sessao["faixa_etaria_atual"],
+            "ml_fator_dificuldade_aplicado": estado_sessao["ml_fator_dificuldade_aplicado"],
+            "ml_versao_modelo": estado_sessao.get("ml_versao_modelo"),
+            "ml_features_usadas": estado_sessao.get("ml_features_usadas", {}),
+        }
+        return {
+            "mensagem": f"Aqui está uma lista com {quantidade} perguntas de {estado_sessao['operacao_atual']} para a faixa etária de {data.faixa_etaria}.",
+            "perguntas": [p["pergunta"] for p in perguntas],
+            "id_sessao": data.id_sessao,
+            "id_sessao_debug": estado_sessao["id_sessao"],
+            "ml_fator_aplicado_debug": estado_sessao["ml_fator_dificuldade_aplicado"]
+        }
+
+    elif data.acao == "enviar_respostas_lista":
+        lista = estado_sessao.get("lista_atual")
+        if not lista:
+            return {"erro": "Nenhuma lista ativa. Por favor, gere uma lista ('gerar_lista')."}
+        perguntas = lista["perguntas"]
+        if data.respostas_lista is None or len(data.respostas_lista) != len(perguntas):
+            return {"erro": f"Envie uma resposta para cada uma das {len(perguntas)} perguntas (use null para deixar em branco)."}
+
+        valores = []
+        for i, resposta in enumerate(data.respostas_lista, start=1):
+            if resposta is None or not resposta.strip():
+                valores.append(None)
+                continue
+            try:
+                valores.append(float(resposta.replace(",", ".")))
+            except ValueError:
+                return {"erro": f"A resposta {i} deve ser um número (ex: 10 ou 3.5)."}
+
+        op = lista.get("operacao", estado_sessao["operacao_atual"])
+        faixa = lista.get("faixa_etaria", estado_sessao["faixa_etaria_atual"])
+        base_log = _linha_log_base(estado_sessao, lista["ml_fator_dificuldade_aplicado"], lista["ml_versao_modelo"],
+                                   lista["ml_features_usadas"], operacao=op, faixa_etaria=faixa)
+        linhas_log, resultados, acertos = [], [], 0
+        for pergunta, valor in zip(perguntas, valores):
+            if valor is None:
+                resultados.append({"pergunta": pergunta["pergunta"], "respondida": False, "resposta_correta": pergunta["resposta_correta"]})
+                continue
+            correta = abs(valor - pergunta["resposta_correta"]) < 1e-9
+            acertos += correta
+            registrar_resposta(estado_sessao, op, correta, pergunta["numeros"])
+            registrar_no_perfil(estado_sessao, op, correta)
+            metrica_respostas.inc(op, faixa, str(correta).lower())
+            linhas_log.append({
+                **base_log,
+                "pergunta_gerada": pergunta["pergunta"],
+                "numeros_pergunta": str(pergunta["numeros"]),
+                "resposta_correta": pergunta["resposta_correta"],
+                "resposta_aluno": valor,
+                "acertou_pergunta": correta,
+            })
+            resultados.append({"pergunta": pergunta["pergunta"], "respondida": True, "correta": correta, "resposta_correta": pergunta["resposta_correta"]})
+
+        escritor_log.registrar_varios(linhas_log)
+        estado_sessao["lista_atual"] = None
+        return {
+            "mensagem": f"Você acertou {acertos} de {len(perguntas)} perguntas.",
+            "resultados": resultados,
+            "acertos": acertos,
+            "respondidas": len(linhas_log),
+            "total": len(perguntas),
+            "proxima_acao_sugerida": "gerar_lista"
+        }
     else:
-        return {"erro": "Ação desconhecida. As ações válidas são: 'iniciar_aprendizado', 'enviar_resposta' ou 'enviar_feedback_exemplo'."}
+        return {"erro": "Ação desconhecida. As ações válidas são: 'iniciar_aprendizado', 'enviar_resposta', 'enviar_feedback_exemplo', 'gerar_lista' ou 'enviar_respostas_lista'."}
+
+
+@asynccontextmanager
+async def ciclo_de_vida(_app: FastAPI):
+    await iniciar_servicos()
+    try:
+        yield
+    finally:
+        await encerrar()
+
+
+def criar_app() -> FastAPI:
+    """Monta o app com as rotas e os hooks de inicializacao/encerramento.
+
+    Tambem serve como fabrica: `uvicorn serverside.routes.main:criar_app --factory`.
+    O estado (sessoes, modelo, log) continua no modulo e e o mesmo para todos os apps.
+    """
+    aplicacao = FastAPI(lifespan=ciclo_de_vida)
+    aplicacao.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    aplicacao.include_router(rotas)
+    return aplicacao
+
+
+app = criar_app()
@@ -0,0 +1,213 @@
+"""Analise incremental do log de aprendizado: quais estilos de exemplo funcionam.
+
+    python -m serverside.servicos.analise_log aprendizado_log.csv
+    python -m serverside.servicos.analise_log aprendizado_log.csv --estado analise_log_estado.json --saida analise_exemplos.json
+
+O CSV e lido linha a linha a partir do ultimo offset (em bytes) salvo no
+arquivo de estado, entao uma nova execucao so processa o que foi anexado
+depois. Cada `exemplo_fornecido_N` e classificado pelo template que o gerou
+(`identificar_estilo`) e os agregados ficam em contadores:
+
+- exemplos: (operacao, faixa, estilo) -> [mostrados, entendidos]
+- acerto_fator: (operacao, faixa, fator arredondado a 0.1) -> [respondidas, acertos]
+
+A saida (`analise_exemplos.json`) traz a ordem dos estilos por taxa de
+entendimento suavizada para cada (operacao, faixa); o servidor usa essa ordem
+para decidir qual estilo mostrar primeiro.
+"""
+import argparse
+import csv
+import json
+import os
+from datetime import datetime
+
+from serverside.servicos.exemplos import identificar_estilo
+from serverside.servicos.log_aprendizado import CSV_HEADERS
+
+ESTADO_PADRAO = "analise_log_estado.json"
+SAIDA_PADRAO = "analise_exemplos.json"
+NUM_EXEMPLOS_LOG = 3
+ESTILOS_VARIACAO = (0, 1, 2)
+MIN_AMOSTRAS_ESTILO = 20
+SEPARADOR_CHAVE = "|"
+
+
+def novo_estado() -> dict:
+    return {"offset": 0, "linhas": 0, "exemplos": {}, "acerto_fator": {}, "exemplos_nao_identificados": 0}
+
+
+def carregar_estado(caminho: str) -> dict:
+    if not os.path.exists(caminho):
+        return novo_estado()
+    with open(caminho, encoding="utf-8") as arquivo:
+        return {**novo_estado(), **json.load(arquivo)}
+
+
+def _gravar_json(caminho: str, dados: dict) -> None:
+    with open(caminho + ".tmp", "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+    os.replace(caminho + ".tmp", caminho)
+
+
+def _chave(*partes) -> str:
+    return SEPARADOR_CHAVE.join(str(p) for p in partes)
+
+
+def _incrementar(agregados: dict, chave: str, sucesso: bool) -> None:
+    contagem = agregados.get(chave)
+    if contagem is None:
+        contagem = agregados[chave] = [0, 0]
+    contagem[0] += 1
+    contagem[1] += 1 if sucesso else 0
+
+
+def _para_bool(valor: str | None) -> bool | None:
+    valor = (valor or "").strip().lower()
+    if valor in ("true", "1"):
+        return True
+    if valor in ("false", "0"):
+        return False
+    return None
+
+
+def ler_registros(caminho_csv: str, offset: int):
+    """Gera (linha como dict, offset apos a linha) a partir de `offset` em bytes.
+
+    Uma ultima linha sem quebra de linha (gravacao em andamento) nao e
+    consumida, para ser lida inteira na proxima execucao.
+    """
+    with open(caminho_csv, "rb") as arquivo:
+        if offset == 0:
+            arquivo.readline()
+            offset = arquivo.tell()
+        arquivo.seek(offset)
+        pendente = b""
+        for bruta in iter(arquivo.readline, b""):
+            if not bruta.endswith(b"\n"):
+                break
+            pendente += bruta
+            if pendente.count(b'"') % 2:
+                continue
+            offset += len(pendente)
+            valores = next(csv.reader([pendente.decode("utf-8")]), None)
+            pendente = b""
+            if valores:
+                yield dict(zip(CSV_HEADERS, valores)), offset
+
+
+def processar_linha(estado: dict, linha: dict) -> None:
+    op = linha.get("operacao_solicitada") or ""
+    faixa = linha.get("faixa_etaria") or ""
+    for n in range(1, NUM_EXEMPLOS_LOG + 1):
+        texto = linha.get(f"exemplo_fornecido_{n}")
+        entendeu = _para_bool(linha.get(f"entendeu_exemplo_{n}"))
+        if not texto or entendeu is None:
+            continue
+        estilo = identificar_estilo(op, texto)
+        if estilo is None:
+            estado["exemplos_nao_identificados"] += 1
+            continue
+        _incrementar(estado["exemplos"], _chave(op, faixa, estilo), entendeu)
+
+    acertou = _para_bool(linha.get("acertou_pergunta"))
+    if acertou is not None:
+        try:
+            fator = round(float(linha.get("ml_fator_dificuldade_aplicado") or 1.0), 1)
+        except ValueError:
+            fator = 1.0
+        _incrementar(estado["acerto_fator"], _chave(op, faixa, fator), acertou)
+
+
+def atualizar(caminho_csv: str, estado: dict) -> int:
+    """Processa as linhas novas do CSV; devolve quantas foram lidas."""
+    if not os.path.exists(caminho_csv):
+        return 0
+    if os.path.getsize(caminho_csv) < estado["offset"]:
+        # Arquivo foi truncado ou trocado: os agregados continuam valendo, a leitura recomeca.
+        estado["offset"] = 0
+    lidas = 0
+    for linha, offset in ler_registros(caminho_csv, estado["offset"]):
+        processar_linha(estado, linha)
+        estado["offset"] = offset
+        lidas += 1
+    estado["linhas"] += lidas
+    estado["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+    return lidas
+
+
+def taxa_suavizada(mostrados: int, entendidos: int) -> float:
+    # Media da Beta(1 + entendidos, 1 + nao entendidos): evita 0% ou 100% com poucas amostras.
+    return (entendidos + 1) / (mostrados + 2)
+
+
+def resumo(estado: dict) -> dict:
+    taxas_estilo: dict[str, dict] = {}
+    ordem_estilos: dict[str, list[int]] = {}
+    por_contexto: dict[str, dict] = {}
+    for chave, (mostrados, entendidos) in estado["exemplos"].items():
+        op, faixa, estilo = chave.split(SEPARADOR_CHAVE)
+        taxas_estilo[chave] = {"mostrados": mostrados, "entendidos": entendidos, "taxa": entendidos / mostrados}
+        por_contexto.setdefault(_chave(op, faixa), {})[estilo] = (mostrados, entendidos)
+
+    for contexto, estilos in por_contexto.items():
+        contagens = [estilos.get(str(e), (0, 0)) for e in ESTILOS_VARIACAO]
+        if min(m for m, _ in contagens) < MIN_AMOSTRAS_ESTILO:
+            continue
+        ordem_estilos[contexto] = sorted(ESTILOS_VARIACAO, key=lambda e: -taxa_suavizada(*contagens[e]))
+
+    acerto_fator = {
+        chave: {"respondidas": respondidas, "acertos": acertos, "taxa": acertos / respondidas}
+        for chave, (respondidas, acertos) in sorted(estado["acerto_fator"].items())
+    }
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "linhas_processadas": estado["linhas"],
+        "min_amostras_estilo": MIN_AMOSTRAS_ESTILO,
+        "ordem_estilos": ordem_estilos,
+        "taxa_entendimento": taxas_estilo,
+        "acerto_por_fator": acerto_fator,
+    }
+
+
+def carregar_ordem_estilos(caminho: str) -> dict[tuple[str, str], tuple[int, ...]]:
+    """Le a saida da analise para o servidor: (operacao, faixa) -> estilos do melhor ao pior."""
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        ordem = json.load(arquivo).get("ordem_estilos", {})
+    return {tuple(contexto.split(SEPARADOR_CHAVE)): tuple(estilos) for contexto, estilos in ordem.items()}
+
+
+def carregar_contagens_estilos(caminho: str) -> dict[tuple[str, str, int], tuple[int, int]]:
+    """Le a saida da analise: (operacao, faixa, estilo) -> (mostrados, entendidos), so estilos de variacao."""
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        taxas = json.load(arquivo).get("taxa_entendimento", {})
+    contagens = {}
+    for chave, valores in taxas.items():
+        op, faixa, estilo = chave.split(SEPARADOR_CHAVE)
+        if estilo.isdigit():
+            contagens[(op, faixa, int(estilo))] = (valores["mostrados"], valores["entendidos"])
+    return contagens
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Analise incremental da eficacia dos exemplos no log CSV.")
+    parser.add_argument("log", help="Caminho do aprendizado_log.csv")
+    parser.add_argument("--estado", default=ESTADO_PADRAO, help="Arquivo com offset e agregados da ultima execucao.")
+    parser.add_argument("--saida", default=SAIDA_PADRAO, help="Resumo usado pelo servidor para escolher o estilo do exemplo.")
+    parser.add_argument("--recomecar", action="store_true", help="Ignora o estado salvo e relê o log inteiro.")
+    args = parser.parse_args(argv)
+
+    estado = novo_estado() if args.recomecar else carregar_estado(args.estado)
+    lidas = atualizar(args.log, estado)
+    _gravar_json(args.estado, estado)
+    dados = resumo(estado)
+    _gravar_json(args.saida, dados)
+    print(f"INFO: {lidas} linhas novas processadas ({estado['linhas']} no total); "
+          f"{len(dados['ordem_estilos'])} contextos com ordem de estilos em '{args.saida}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Banco de perguntas pre-geradas por (operacao, faixa etaria, fator quantizado).
+
+Cada balde guarda um bloco de perguntas ja prontas (numeros, resposta e texto)
+gerado de uma vez com NumPy, seguindo as mesmas regras de
+`gerar_numeros_pergunta` (subtracao sem negativos, divisao exata, teto de
+quociente e reescala de divisoes grandes). Uma requisicao so avanca o cursor
+do balde; quando o bloco atual esta acabando, uma thread gera o proximo.
+
+O fator de dificuldade e arredondado para multiplos de PASSO_FATOR dentro de
+[FATOR_MIN, FATOR_MAX]; o fator efetivamente usado e devolvido para o log.
+"""
+import logging
+import queue
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FATOR_MIN = 0.5
+FATOR_MAX = 1.5
+PASSO_FATOR = 0.05
+CAPACIDADE_BALDE = 1024
+FRACAO_REABASTECER = 0.25
+
+RANGE_MAX_BASE = {"6-8": 10, "9-12": 25, "13-15": 75, "16-18": 150, "19-22": 300, "23-25": 600}
+RANGE_MAX_BASE_PADRAO = 20
+QUOCIENTE_MAX_BASE = {"3-5": 4, "9-12": 15, "13-15": 15, "16-18": 25, "19-22": 25, "23-25": 25}
+QUOCIENTE_MAX_BASE_PADRAO = 10
+FAIXAS_ADULTAS = ("19-22", "23-25")
+SIMBOLOS = {"soma": "+", "subtracao": "-", "multiplicacao": "x", "divisao": "÷"}
+
+
+def quantizar_fator(fator: float) -> float:
+    fator = max(FATOR_MIN, min(float(fator), FATOR_MAX))
+    return round(FATOR_MIN + round((fator - FATOR_MIN) / PASSO_FATOR) * PASSO_FATOR, 2)
+
+
+def gerar_numeros_vetorizado(operacao: str, faixa_etaria: str, fator: float, n: int, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Versao NumPy de `gerar_numeros_pergunta` para `n` perguntas com o mesmo fator."""
+    f = fator
+    range_max_base = RANGE_MAX_BASE.get(faixa_etaria, RANGE_MAX_BASE_PADRAO)
+    range_max = max(5, int(range_max_base * f))
+
+    if faixa_etaria in FAIXAS_ADULTAS and f >= 1:
+        n1_min = np.maximum(1, rng.choice([int(10 * f), int(20 * f), int(5 * f)], n))
+        n2_min = np.maximum(1, rng.choice([int(5 * f), int(10 * f), int(1 * f)], n))
+    else:
+        n1_min = np.ones(n, dtype=np.int64)
+        n2_min = np.ones(n, dtype=np.int64)
+
+    if operacao in ("multiplicacao", "divisao"):
+        if faixa_etaria == "3-5":
+            n1 = rng.integers(1, (int(5 * f) if f > 0.8 else 5) + 1, n)
+            n2 = rng.integers(1, (int(3 * f) if f > 0.8 else 3) + 1, n)
+        else:
+            md_n1_base = range_max_base // 10 if range_max_base > 50 else range_max_base // 5
+            md_n2_base = 10 if faixa_etaria not in FAIXAS_ADULTAS else 20
+            n1 = rng.integers(n1_min, np.maximum(n1_min + 1, int(md_n1_base * f)) + 1)
+            n2 = rng.integers(n2_min, np.maximum(n2_min + 1, int(md_n2_base * f)) + 1)
+    else:
+        n1 = rng.integers(n1_min, np.where(range_max >= n1_min, range_max, n1_min + 1) + 1)
+        n2 = rng.integers(n2_min, np.where(range_max >= n2_min, range_max, n2_min + 1) + 1)
+
+    if operacao == "subtracao":
+        n1, n2 = np.maximum(n1, n2), np.minimum(n1, n2)
+        iguais = n1 == n2
+        n1[iguais] += rng.integers(1, max(1, int(range_max // 10 * f)) + 1, int(iguais.sum()))
+
+    if operacao == "divisao":
+        if faixa_etaria not in ("3-5", "6-8") and range_max > 5:
+            um = n2 == 1
+            n2[um] = rng.integers(2, max(3, min(10, int(range_max // 10 * f))) + 1, int(um.sum()))
+        max_quociente = max(1, int(QUOCIENTE_MAX_BASE.get(faixa_etaria, QUOCIENTE_MAX_BASE_PADRAO) * f))
+        quociente = rng.integers(1, max_quociente + 1, n)
+        n1 = n2 * quociente
+        grandes = (n1 > range_max_base * f * 1.2) & (n2 > 1)
+        n2_novo = rng.integers(1, np.maximum(1, n2[grandes] // 2) + 1)
+        n1[grandes] = n2_novo * quociente[grandes]
+        n2[grandes] = n2_novo
+
+    return n1, n2
+
+
+def calcular_respostas(operacao: str, n1: np.ndarray, n2: np.ndarray) -> np.ndarray:
+    if operacao == "soma":
+        return n1 + n2
+    if operacao == "subtracao":
+        return n1 - n2
+    if operacao == "multiplicacao":
+        return n1 * n2
+    return n1 // n2
+
+
+class _Balde:
+    __slots__ = ("itens", "cursor", "proximo", "reabastecendo")
+
+    def __init__(self, itens: list):
+        self.itens = itens
+        self.cursor = 0
+        self.proximo = None
+        self.reabastecendo = False
+
+
+class BancoPerguntas:
+    def __init__(self, capacidade: int = CAPACIDADE_BALDE, semente: int | None = None):
+        self.capacidade = capacidade
+        self._baldes: dict[tuple[str, str, float], _Balde] = {}
+        self._lock = threading.RLock()
+        self._sementes = np.random.SeedSequence(semente)
+        self._pedidos: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self.contadores = {"sorteios": 0, "blocos_gerados": 0, "geracoes_sincronas": 0}
+
+    def resemear(self, semente: int | None = None) -> None:
+        """Novas sementes e baldes vazios; usado apos um fork para os processos nao repetirem perguntas."""
+        with self._lock:
+            self._sementes = np.random.SeedSequence(semente)
+            self._baldes.clear()
+            self._pedidos = queue.Queue()
+            self._thread = None
+
+    def _rng(self) -> np.random.Generator:
+        with self._lock:
+            semente = self._sementes.spawn(1)[0]
+        return np.random.default_rng(semente)
+
+    def gerar_bloco(self, operacao: str, faixa_etaria: str, fator: float) -> list[tuple[int, int, int, str]]:
+        n1, n2 = gerar_numeros_vetorizado(operacao, faixa_etaria, fator, self.capacidade, self._rng())
+        respostas = calcular_respostas(operacao, n1, n2)
+        simbolo = SIMBOLOS[operacao]
+        self.contadores["blocos_gerados"] += 1
+        return [(a, b, r, f"Quanto é {a} {simbolo} {b}?") for a, b, r in zip(n1.tolist(), n2.tolist(), respostas.tolist())]
+
+    def sortear(self, operacao: str, faixa_etaria: str, fator: float) -> tuple[int, int, int, str, float]:
+        """Retorna (n1, n2, resposta, texto, fator usado) em O(1)."""
+        fator = quantizar_fator(fator)
+        chave = (operacao, faixa_etaria, fator)
+        with self._lock:
+            balde = self._baldes.get(chave)
+            if balde is not None and balde.cursor >= len(balde.itens) and balde.proximo is not None:
+                balde.itens, balde.proximo, balde.cursor = balde.proximo, None, 0
+            if balde is None or balde.cursor >= len(balde.itens):
+                self.contadores["geracoes_sincronas"] += 1
+                itens = self.gerar_bloco(operacao, faixa_etaria, fator)
+                if balde is None:
+                    balde = self._baldes[chave] = _Balde(itens)
+                else:
+                    balde.itens, balde.cursor = itens, 0
+            item = balde.itens[balde.cursor]
+            balde.cursor += 1
+            self.contadores["sorteios"] += 1
+            pedir = (not balde.reabastecendo and balde.proximo is None
+                     and len(balde.itens) - balde.cursor < self.capacidade * FRACAO_REABASTECER)
+            if pedir:
+                balde.reabastecendo = True
+        if pedir:
+            self._pedir_reabastecimento(chave)
+        return (*item, fator)
+
+    def aquecer(self, operacoes, faixas, fatores=None) -> None:
+        fatores = fatores if fatores is not None else [1.0]
+        for operacao in operacoes:
+            for faixa in faixas:
+                for fator in fatores:
+                    chave = (operacao, faixa, quantizar_fator(fator))
+                    if chave not in self._baldes:
+                        itens = self.gerar_bloco(*chave)
+                        with self._lock:
+                            self._baldes.setdefault(chave, _Balde(itens))
+
+    def _pedir_reabastecimento(self, chave: tuple[str, str, float]) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop_reabastecimento, name="banco-perguntas", daemon=True)
+                self._thread.start()
+        self._pedidos.put(chave)
+
+    def _loop_reabastecimento(self) -> None:
+        while True:
+            chave = self._pedidos.get()
+            try:
+                itens = self.gerar_bloco(*chave)
+            except Exception as e:
+                logger.error("Falha ao reabastecer o banco de perguntas %s: %s", chave, e)
+                itens = None
+            with self._lock:
+                balde = self._baldes[chave]
+                balde.proximo = itens
+                balde.reabastecendo = False
@@ -0,0 +1,162 @@
+"""Escolha do estilo de exemplo por Thompson sampling, um bandit por (operacao, faixa).
+
+Cada estilo tem uma Beta(alfa, beta) por contexto, guardada em dois arrays
+float64 de formato (operacoes, faixas, estilos). `escolher` sorteia uma amostra
+de cada Beta do contexto (sem repetir estilos ja mostrados para a mesma
+pergunta) e fica com a maior; `registrar` soma 1 em alfa (entendeu) ou em beta
+(nao entendeu). Os arrays sao gravados periodicamente em um .npz e recarregados
+na inicializacao. Sem snapshot, os priors podem ser semeados com os contadores
+da analise do log (`analise_log`).
+"""
+import asyncio
+import logging
+import mmap
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PRIOR_ALFA = 1.0
+PRIOR_BETA = 1.0
+PESO_MAX_SEMENTE = 50
+INTERVALO_SNAPSHOT_SEGUNDOS = 60.0
+
+
+class SeletorEstilos:
+    def __init__(self, operacoes, faixas, num_estilos: int, caminho_snapshot: str | None = None,
+                 intervalo_snapshot: float = INTERVALO_SNAPSHOT_SEGUNDOS, semente: int | None = None):
+        self.operacoes = tuple(operacoes)
+        self.faixas = tuple(faixas)
+        self.num_estilos = num_estilos
+        self._indice_op = {op: i for i, op in enumerate(self.operacoes)}
+        self._indice_faixa = {faixa: j for j, faixa in enumerate(self.faixas)}
+        formato = (len(self.operacoes), len(self.faixas), num_estilos)
+        self.alfa = np.full(formato, PRIOR_ALFA)
+        self.beta = np.full(formato, PRIOR_BETA)
+        self.caminho_snapshot = caminho_snapshot
+        self.intervalo_snapshot = intervalo_snapshot
+        self._rng = np.random.default_rng(semente)
+        self._lock = threading.Lock()
+        self._alteracoes = 0
+        self._compartilhado = False
+        self._tarefa_snapshot: asyncio.Task | None = None
+
+    def compartilhar(self) -> None:
+        """Move alfa/beta para memoria anonima compartilhada. Chamar no processo pai, antes do fork.
+
+        Depois do fork todos os workers leem e atualizam os mesmos arrays,
+        protegidos por um lock entre processos.
+        """
+        with self._lock:
+            for nome in ("alfa", "beta"):
+                atual = getattr(self, nome)
+                compartilhado = np.frombuffer(mmap.mmap(-1, atual.nbytes), dtype=atual.dtype).reshape(atual.shape)
+                compartilhado[...] = atual
+                setattr(self, nome, compartilhado)
+        self._lock = multiprocessing.Lock()
+        self._compartilhado = True
+
+    def resemear(self, semente: int | None = None) -> None:
+        self._rng = np.random.default_rng(semente)
+
+    def _indices(self, operacao: str, faixa_etaria: str) -> tuple[int, int] | None:
+        i = self._indice_op.get(operacao)
+        j = self._indice_faixa.get(faixa_etaria)
+        return None if i is None or j is None else (i, j)
+
+    def escolher(self, operacao: str, faixa_etaria: str, ja_mostrados=()) -> int:
+        indices = self._indices(operacao, faixa_etaria)
+        disponiveis = [e for e in range(self.num_estilos) if e not in ja_mostrados] or list(range(self.num_estilos))
+        if indices is None:
+            return disponiveis[0]
+        i, j = indices
+        with self._lock:
+            amostras = self._rng.beta(self.alfa[i, j, disponiveis], self.beta[i, j, disponiveis])
+        return disponiveis[int(np.argmax(amostras))]
+
+    def registrar(self, operacao: str, faixa_etaria: str, estilo: int, entendeu: bool) -> None:
+        indices = self._indices(operacao, faixa_etaria)
+        if indices is None or not 0 <= estilo < self.num_estilos:
+            return
+        i, j = indices
+        with self._lock:
+            if entendeu:
+                self.alfa[i, j, estilo] += 1
+            else:
+                self.beta[i, j, estilo] += 1
+            self._alteracoes += 1
+
+    def semear(self, contagens: dict[tuple[str, str, int], tuple[int, int]], peso_max: int = PESO_MAX_SEMENTE) -> int:
+        """Soma (entendidos, nao entendidos) aos priors, limitando cada estilo a `peso_max` amostras.
+
+        O limite evita que um historico longo congele a escolha: dados novos
+        continuam podendo mudar a ordem dos estilos.
+        """
+        semeados = 0
+        with self._lock:
+            for (operacao, faixa_etaria, estilo), (mostrados, entendidos) in contagens.items():
+                indices = self._indices(operacao, faixa_etaria)
+                if indices is None or not 0 <= estilo < self.num_estilos or mostrados <= 0:
+                    continue
+                escala = min(1.0, peso_max / mostrados)
+                i, j = indices
+                self.alfa[i, j, estilo] += entendidos * escala
+                self.beta[i, j, estilo] += (mostrados - entendidos) * escala
+                semeados += 1
+        return semeados
+
+    def salvar(self) -> bool:
+        if not self.caminho_snapshot:
+            return False
+        with self._lock:
+            alfa, beta = self.alfa.copy(), self.beta.copy()
+            alteracoes, self._alteracoes = self._alteracoes, 0
+        caminho_tmp = self.caminho_snapshot + ".tmp.npz"
+        np.savez(caminho_tmp, alfa=alfa, beta=beta, operacoes=np.array(self.operacoes), faixas=np.array(self.faixas))
+        os.replace(caminho_tmp, self.caminho_snapshot)
+        logger.debug("Snapshot do seletor de estilos salvo em '%s' (%d atualizações).", self.caminho_snapshot, alteracoes)
+        return True
+
+    def carregar(self) -> bool:
+        if not self.caminho_snapshot or not os.path.exists(self.caminho_snapshot):
+            return False
+        with np.load(self.caminho_snapshot) as dados:
+            alfa, beta = dados["alfa"], dados["beta"]
+            operacoes, faixas = tuple(dados["operacoes"].tolist()), tuple(dados["faixas"].tolist())
+        if operacoes != self.operacoes or faixas != self.faixas or alfa.shape != self.alfa.shape:
+            logger.warning("Snapshot do seletor de estilos '%s' não corresponde ao catálogo atual. Ignorando.", self.caminho_snapshot)
+            return False
+        with self._lock:
+            self.alfa[...] = alfa
+            self.beta[...] = beta
+        logger.info("Seletor de estilos carregado de '%s'.", self.caminho_snapshot)
+        return True
+
+    async def _salvar_periodicamente(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo_snapshot)
+            # Com arrays compartilhados, as alteracoes dos outros workers nao aparecem no contador local.
+            if self._alteracoes or self._compartilhado:
+                try:
+                    await asyncio.to_thread(self.salvar)
+                except Exception as e:
+                    logger.error("Falha ao salvar snapshot do seletor de estilos: %s", e)
+
+    def iniciar_snapshots(self) -> None:
+        if self._tarefa_snapshot is None and self.caminho_snapshot and self.intervalo_snapshot > 0:
+            self._tarefa_snapshot = asyncio.get_running_loop().create_task(self._salvar_periodicamente())
+
+    async def parar_snapshots(self) -> None:
+        if self._tarefa_snapshot is not None:
+            self._tarefa_snapshot.cancel()
+            try:
+                await self._tarefa_snapshot
+            except asyncio.CancelledError:
+                pass
+            self._tarefa_snapshot = None
+        # Mesmo criterio do salvamento periodico: o worker que grava nao ve as alteracoes dos outros.
+        if self._alteracoes or self._compartilhado:
+            self.salvar()
@@ -0,0 +1,59 @@
+"""Catalogo de operacoes e faixas etarias montado uma vez na inicializacao.
+
+Guarda os conjuntos usados na validacao das requisicoes, as mensagens de erro
+ja formatadas e o JSON servido em GET /catalogo, com um ETag forte calculado
+sobre os proprios bytes. Clientes que reenviam o ETag em If-None-Match recebem
+304 sem corpo.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+
+CACHE_CONTROL = "public, no-cache"
+
+
+@dataclass(frozen=True)
+class Catalogo:
+    operacoes: tuple[str, ...]
+    faixas_etarias: tuple[str, ...]
+    acoes: tuple[str, ...]
+    variacoes_exemplo: int
+    operacoes_validas: frozenset[str] = field(init=False)
+    faixas_validas: frozenset[str] = field(init=False)
+    acoes_validas: frozenset[str] = field(init=False)
+    lista_operacoes: str = field(init=False, repr=False)
+    lista_faixas: str = field(init=False, repr=False)
+    corpo: bytes = field(init=False, repr=False)
+    etag: str = field(init=False)
+
+    def __post_init__(self):
+        definir = object.__setattr__
+        definir(self, "operacoes_validas", frozenset(self.operacoes))
+        definir(self, "faixas_validas", frozenset(self.faixas_etarias))
+        definir(self, "acoes_validas", frozenset(self.acoes))
+        definir(self, "lista_operacoes", ", ".join(self.operacoes))
+        definir(self, "lista_faixas", ", ".join(self.faixas_etarias))
+        corpo = json.dumps({
+            "operacoes": list(self.operacoes),
+            "faixas_etarias": list(self.faixas_etarias),
+            "acoes": list(self.acoes),
+            "variacoes_exemplo": self.variacoes_exemplo,
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        definir(self, "corpo", corpo)
+        definir(self, "etag", '"' + hashlib.sha256(corpo).hexdigest()[:32] + '"')
+
+    def erro_operacao(self, operacao: str) -> str:
+        return f"Operação '{operacao}' não suportada. Tente: {self.lista_operacoes}"
+
+    def erro_faixa(self, faixa_etaria: str) -> str:
+        return f"Faixa etária '{faixa_etaria}' não suportada. Tente uma das seguintes: {self.lista_faixas}"
+
+    def corresponde(self, if_none_match: str | None) -> bool:
+        """True se o cabecalho If-None-Match ja contem o ETag atual."""
+        if not if_none_match:
+            return False
+        for candidato in if_none_match.split(","):
+            candidato = candidato.strip()
+            if candidato == "*" or candidato.removeprefix("W/") == self.etag:
+                return True
+        return False
@@ -0,0 +1,275 @@
+"""Gerador de exemplos praticos com vocabulario e templates pre-compilados.
+
+Tudo o que antes era montado a cada chamada (listas de personagens, verbos e
+grupos por faixa etaria, formas singulares dos grupos, plurais das palavras,
+frases de distribuicao) e calculado uma vez em `compilar_vocabularios` e
+guardado em tuplas. Renderizar um exemplo passa a ser escolher indices e fazer
+um unico `str.format`.
+
+As escolhas aleatorias acontecem na mesma ordem e sobre sequencias do mesmo
+tamanho que no gerador original, entao, para o mesmo estado de `random`, o
+texto gerado e identico.
+"""
+import random
+import re
+import string
+from typing import NamedTuple
+
+FAIXAS_INFANTIS = ("3-5", "6-8", "9-12")
+FAIXAS_ADOLESCENTES = ("13-15", "16-18")
+FAIXAS_ADULTAS = ("19-22", "23-25")
+SIMBOLOS = {"soma": "+", "subtracao": "-", "multiplicacao": "x", "divisao": "÷"}
+EXEMPLO_INDISPONIVEL = "Desculpe, não consegui pensar em um bom exemplo para esta situação."
+EXEMPLO_DIVISAO_POR_ZERO = "Não podemos dividir por zero em um exemplo prático!"
+PERSONAGEM_VOCE = ("você", "você", "tem")
+
+_PERSONAGENS_BASE = (("Ana", "ela", "tem"), ("Léo", "ele", "tem"), ("Bia", "ela", "tem"), ("um colega", "ele", "tem"), ("uma startup", "ela", "tem"), ("um cliente", "ele", "tem"), ("a equipe", "ela", "tem"))
+_PERSONAGENS_CONTEXTUAIS = (("o estudante", "ele", "tem"), ("a pesquisadora", "ela", "tem"), ("o gerente de projetos", "ele", "tem"), ("a consultora financeira", "ela", "tem"), ("um investidor", "ele", "tem"), ("uma empresa", "ela", "tem"))
+_MATEMATICAMENTE = " (Matematicamente: {n1} {simbolo} {n2} = {resultado})"
+
+TEMPLATES = {
+    ("soma", 0): "Considere que {nome} já {ter} {n1} {obj_n1}. Se {pronome} {verbo} mais {n2} {obj_n2}, {pronome} passará a ter {res} {contexto}.",
+    ("soma", 1): "Se {nome} possui {n1} {obj_n1} e {outro} transfere mais {n2} {obj_n2} para {pronome}, {nome} ficará com {res}.",
+    ("soma", 2): "Imagine {local} inicial de {n1} {obj_n1}. Adicionando {n2} {obj_n2}, o novo {local_nome} será de {res}.",
+    ("subtracao", "falta"): "Se {nome} tem apenas {n1} {obj_n1}, não é possível tirar {n2} {obj_n2}. Precisaria de mais! Matematicamente, o resultado seria {resultado}, indicando uma falta.",
+    ("subtracao", "deficit"): "Se {nome} tem um saldo de {n1} {obj_n1} e precisa deduzir {n2} {obj_n2}, o resultado será {res}, indicando um déficit ou valor negativo.",
+    ("subtracao", 0): "{nome} {ter} {n1} {obj_n1}. Após {verbo} {n2} {obj_n2} {contexto}, {pronome} restará com {res}.",
+    ("subtracao", 1): "Havia {n1} {obj_n1} em {local}. Se {n2} {obj_n2} foram {participio}, restaram {res}.",
+    ("subtracao", 2): "Se {nome} {verbo} {n2} {obj_n2} de um total disponível de {n1} {obj_n1}, sobrarão {res}.",
+    ("multiplicacao", 0): "Se {nome} possui {n1} {grupos_n1}, e {distribuicao} {verbo} {obj_n2}, então o valor total ou quantidade total que {pronome} tem é de {res}.",
+    ("multiplicacao", 1): "{nome} {verbo} {n1} {grupos_n1}, cada um(a) associado(a) a {obj_n2}. Ao todo, isso representa {res}.",
+    ("multiplicacao", 2): "A operação de multiplicar {n1} por {n2} pode ser vista como somar o número {n2}, {n1} {vezes}. Isso resulta em {res}.",
+    ("divisao", 0): "Se {nome} possui {n1} {obj_n1} e deseja distribuir igualmente entre {n2} {entidades}, cada {entidade} receberá {res}.",
+    ("divisao", 1): "Imagine um total de {n1} {obj_n1} que precisam ser alocados em {n2} {grupos_n2} de forma equitativa. Cada {grupo} comportará {res}.",
+    ("divisao", 2): "Dado um montante de {n1} {obj_n1}, se cada {grupo} deve conter {n2} {obj_n2}, é possível formar {res} {grupos_res} completos.",
+}
+TEMPLATES = {chave: template + _MATEMATICAMENTE for chave, template in TEMPLATES.items()}
+
+
+def _compilar_padrao(template: str) -> re.Pattern:
+    partes = []
+    for literal, campo, _, _ in string.Formatter().parse(template):
+        partes.append(re.escape(literal))
+        if campo is not None:
+            partes.append(".+?")
+    return re.compile("".join(partes), re.S)
+
+
+PADROES_TEMPLATES = {chave: _compilar_padrao(template) for chave, template in TEMPLATES.items()}
+
+
+def identificar_estilo(operacao: str, texto: str) -> int | str | None:
+    """Descobre de qual template um exemplo ja renderizado saiu (None se nenhum bater)."""
+    for (op, estilo), padrao in PADROES_TEMPLATES.items():
+        if op == operacao and padrao.fullmatch(texto):
+            return estilo
+    return None
+
+
+def pluralizar(palavra: str, quantidade: int) -> str:
+    if quantidade == 1: return palavra
+    if palavra.endswith('ão'): return palavra[:-2] + 'ões'
+    elif palavra.endswith('m'): return palavra[:-1] + 'ns'
+    elif palavra.endswith(('r', 's', 'z')): return palavra + 'es'
+    elif palavra.endswith(tuple('aeiouln')): return palavra + "s"
+    else: return palavra + 's'
+
+
+class Objeto(NamedTuple):
+    singular: str
+    plural: str
+    nenhum: str
+
+
+class Grupo(NamedTuple):
+    plural: str
+    singular: str
+    singular_plural: str
+    distribuicoes_sem_grupo: tuple[str, ...]
+    entidades_divisao: tuple[str, ...]
+
+
+class Vocabulario(NamedTuple):
+    infantil: bool
+    objetos: tuple[Objeto, ...]
+    personagens: tuple[tuple[str, str, str], ...]
+    verbos_ganho: tuple[str, ...]
+    locais_acumulo: tuple[str, ...]
+    locais_soma: tuple[tuple[str, str], ...]
+    verbos_perda: tuple[str, ...]
+    locais_origem: tuple[str, ...]
+    locais_subtracao: tuple[str, ...]
+    verbos_despesa: tuple[str, ...]
+    grupos: tuple[Grupo, ...]
+    acoes_multiplicacao: tuple[str, ...]
+
+
+def _personagens(faixa: str) -> tuple:
+    if faixa in ["3-5", "6-8"]: return tuple(p for p in _PERSONAGENS_BASE if p[0] not in ["uma startup", "um cliente", "a equipe"])
+    elif faixa in ["9-12", "13-15"]: return _PERSONAGENS_BASE[:4] + _PERSONAGENS_CONTEXTUAIS[:2]
+    elif faixa in ["16-18", "19-22"]: return _PERSONAGENS_BASE + _PERSONAGENS_CONTEXTUAIS[:4]
+    return _PERSONAGENS_BASE + _PERSONAGENS_CONTEXTUAIS
+
+
+def _grupos(faixa: str, infantil: bool) -> tuple[Grupo, ...]:
+    grupos_plural_base = ["caixas", "pacotes", "grupos", "lotes", "conjuntos"]
+    if faixa in FAIXAS_INFANTIS: grupos_plural = ["cestas", "saquinhos", "equipes (de amigos)", "fileiras (de brinquedos)"] + grupos_plural_base[:2]
+    elif faixa in FAIXAS_ADOLESCENTES: grupos_plural = ["turmas", "disciplinas", "experimentos", "capítulos"] + grupos_plural_base[:3]
+    else: grupos_plural = ["departamentos", "projetos", "campanhas", "ações (da empresa)", "contratos", "relatórios"] + grupos_plural_base
+    grupos = []
+    for g_plural in grupos_plural:
+        if g_plural.endswith("s") and g_plural != "ações (da empresa)" and not g_plural.endswith("ens"):
+            g_singular = g_plural[:-1]
+        else:
+            g_singular = g_plural.replace(" (de amigos)", "").replace(" (de brinquedos)", "")
+        g_singular = g_singular.replace("ações (da empresa)", "ação (da empresa)")
+        distribuicoes = [f"em cada {g_singular}", f"por {g_singular}", f"para cada {g_singular}", "em cada unidade", "contido em cada um(a)"]
+        if faixa in FAIXAS_ADULTAS: distribuicoes.extend([f"alocado(a) por {g_singular}", f"designado(a) para cada {g_singular}"])
+        entidades = ("amigo", "pessoa", "caixinha") if infantil else ("participante", "seção", g_singular, "beneficiário")
+        grupos.append(Grupo(g_plural, g_singular, pluralizar(g_singular, 2),
+                            tuple(d.replace(g_singular, '') for d in distribuicoes), entidades))
+    return tuple(grupos)
+
+
+def _compilar_vocabulario(faixa: str, objetos: list[str]) -> Vocabulario:
+    infantil = faixa in FAIXAS_INFANTIS
+
+    verbos_ganho = ["ganhou", "recebeu", "adicionou", "acumulou", "obteve", "conseguiu"]
+    locais_acumulo = ["em sua conta", "em seu portfólio", "ao seu orçamento", "no total de vendas", "como bônus", "de lucro", "em sua poupança", "para o projeto"]
+    verbos_perda = ["perdeu", "gastou", "retirou", "deduziu", "utilizou", "pagou"]
+    locais_origem = ["de sua conta", "de seu orçamento", "do investimento inicial", "para as despesas", "como imposto", "do saldo disponível", "para cobrir um custo"]
+    if infantil:
+        verbos_ganho = ["ganhou", "achou", "recebeu", "coletou", "juntou"]
+        locais_acumulo = ["em sua coleção", "em seu cofrinho", "na cesta", "na prateleira", "em sua mochila"]
+        verbos_perda = ["perdeu", "deu", "usou", "comeu", "tirou"]
+        locais_origem = ["de sua coleção", "de sua caixa", "da prateleira", "do pacote", "do total que tinha"]
+    elif faixa in FAIXAS_ADOLESCENTES:
+        verbos_ganho.extend(["economizou", "adquiriu"])
+        locais_acumulo.extend(["para sua viagem", "em créditos de jogo", "em sua mesada"])
+        verbos_perda.extend(["consumiu", "emprestou"])
+        locais_origem.extend(["de seus créditos", "da mensalidade", "para um amigo"])
+
+    objetos_compilados = []
+    for obj in objetos:
+        if infantil:
+            nenhum = f"nenhum(a) {obj}" if not obj.endswith("s") and not '(' in obj else f"nenhum {obj}"
+            if '(' in obj: nenhum = f"nenhum valor de {obj}"
+        else:
+            nenhum = f"0 {pluralizar(obj, 0)}"
+        objetos_compilados.append(Objeto(obj, pluralizar(obj, 2), nenhum))
+
+    locais_soma = ['um cesto', 'um pote', 'um saco'] if infantil else ['um saldo', 'um total', 'um montante', 'um relatório', 'uma planilha']
+    return Vocabulario(
+        infantil=infantil,
+        objetos=tuple(objetos_compilados),
+        personagens=_personagens(faixa),
+        verbos_ganho=tuple(verbos_ganho),
+        locais_acumulo=tuple(locais_acumulo),
+        locais_soma=tuple((local, local.split(' ')[-1]) for local in locais_soma),
+        verbos_perda=tuple(verbos_perda),
+        locais_origem=tuple(locais_origem),
+        locais_subtracao=('uma prateleira', 'uma caixa', 'uma gaveta') if infantil else ('um estoque', 'um orçamento', 'uma reserva'),
+        verbos_despesa=("precisa usar",) if infantil else ("precisa pagar", "tem uma despesa de", "investiu"),
+        grupos=_grupos(faixa, infantil),
+        acoes_multiplicacao=("comprou", "organizou", "fez") if infantil else ("adquiriu", "processou", "vendeu", "analisou"),
+    )
+
+
+class GeradorExemplos:
+    def __init__(self, objetos_por_faixa: dict[str, list[str]]):
+        self.vocabularios = {
+            faixa: _compilar_vocabulario(faixa, objetos)
+            for faixa, objetos in objetos_por_faixa.items() if faixa != "padrao"
+        }
+        self.vocabulario_padrao = _compilar_vocabulario("padrao", objetos_por_faixa["padrao"])
+        plurais = {"vez": pluralizar("vez", 2)}
+        for vocabulario in (*self.vocabularios.values(), self.vocabulario_padrao):
+            plurais.update((o.singular, o.plural) for o in vocabulario.objetos)
+            for grupo in vocabulario.grupos:
+                plurais[grupo.singular] = grupo.singular_plural
+                plurais.update((e, pluralizar(e, 2)) for e in grupo.entidades_divisao)
+        self.plurais = plurais
+
+    def _plural(self, palavra: str, quantidade: int) -> str:
+        if quantidade == 1:
+            return palavra
+        plural = self.plurais.get(palavra)
+        return plural if plural is not None else pluralizar(palavra, quantidade)
+
+    def _personagem(self, vocabulario: Vocabulario, usar_voce_chance: float = 0.3) -> tuple[str, str, str]:
+        if random.random() < usar_voce_chance: return PERSONAGEM_VOCE
+        return random.choice(vocabulario.personagens)
+
+    def gerar(self, operacao: str, faixa_etaria: str, numeros: list[int], resultado_correto: int, variation_style: int) -> str:
+        n1, n2 = numeros
+        estilo = variation_style if variation_style in (0, 1) else 2
+        voc = self.vocabularios.get(faixa_etaria, self.vocabulario_padrao)
+        plural = self._plural
+        objeto = random.choice(voc.objetos)
+        obj = objeto.singular
+        if resultado_correto == 0:
+            res = objeto.nenhum
+        else:
+            res = f"{resultado_correto} {objeto.plural if resultado_correto != 1 else obj}"
+        obj_n1 = objeto.plural if n1 != 1 else obj
+        obj_n2 = (objeto.plural if n2 != 1 else obj) if n2 != 0 else f"0 {obj}"
+        nome, pronome, ter = self._personagem(voc)
+        campos = {"n1": n1, "n2": n2, "resultado": resultado_correto, "simbolo": SIMBOLOS.get(operacao),
+                  "nome": nome, "pronome": pronome, "ter": ter, "obj_n1": obj_n1, "res": res}
+
+        if operacao == "soma":
+            campos["verbo"] = random.choice(voc.verbos_ganho)
+            campos["contexto"] = random.choice(voc.locais_acumulo)
+            if estilo == 0:
+                campos["obj_n2"] = obj_n2 if n2 != 0 else 'nada'
+            elif estilo == 1:
+                campos["outro"] = self._personagem(voc, usar_voce_chance=0.05)[0]
+                campos["obj_n2"] = obj_n2 if n2 != 0 else 'nenhum ' + obj
+            else:
+                campos["local"], campos["local_nome"] = random.choice(voc.locais_soma)
+                campos["obj_n2"] = obj_n2 if n2 != 0 else 'zero ' + obj
+        elif operacao == "subtracao":
+            campos["obj_n2"] = obj_n2
+            if n1 < n2:
+                estilo = "falta" if voc.infantil else "deficit"
+            else:
+                campos["verbo"] = random.choice(voc.verbos_perda)
+                campos["contexto"] = random.choice(voc.locais_origem)
+                if estilo == 1:
+                    campos["local"] = random.choice(voc.locais_subtracao)
+                    campos["obj_n2"] = plural(obj, n2)
+                    campos["participio"] = random.choice(['removidos', 'utilizados', 'retirados'])
+                elif estilo == 2:
+                    campos["verbo"] = voc.verbos_despesa[0] if voc.infantil else random.choice(voc.verbos_despesa)
+        elif operacao == "multiplicacao":
+            grupo = voc.grupos[random.randrange(len(voc.grupos))]
+            distribuicao = random.choice(grupo.distribuicoes_sem_grupo)
+            campos["grupos_n1"] = plural(grupo.singular, n1)
+            campos["obj_n2"] = f"{n2} {plural(obj, n2)}" if n2 != 0 else f"nenhum {obj}"
+            if estilo == 0:
+                campos["distribuicao"] = distribuicao
+                campos["verbo"] = random.choice(['contém', 'gera', 'vale', 'custa'])
+            elif estilo == 1:
+                campos["verbo"] = random.choice(voc.acoes_multiplicacao)
+            else:
+                campos["vezes"] = plural('vez', n1)
+        elif operacao == "divisao":
+            if n2 == 0: return EXEMPLO_DIVISAO_POR_ZERO
+            grupo = voc.grupos[random.randrange(len(voc.grupos))]
+            random.choice(grupo.distribuicoes_sem_grupo)
+            if resultado_correto == 0 and n1 > 0:
+                resto = n1 % n2
+                campos["res"] = f"nenhum(a) {obj} completo(a) (sobrariam {resto} {plural(obj, resto)})"
+            else:
+                campos["res"] = f"{resultado_correto} {plural(obj, resultado_correto)}"
+            entidade = random.choice(grupo.entidades_divisao)
+            campos["entidade"] = entidade
+            campos["entidades"] = plural(entidade, n2)
+            campos["grupo"] = grupo.singular
+            campos["grupos_n2"] = plural(grupo.singular, n2)
+            campos["grupos_res"] = plural(grupo.singular, resultado_correto)
+            campos["obj_n2"] = plural(obj, n2)
+        else:
+            return EXEMPLO_INDISPONIVEL
+
+        return TEMPLATES[(operacao, estilo)].format_map(campos)
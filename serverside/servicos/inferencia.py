@@ -0,0 +1,177 @@
+"""Inferencia rapida do modelo de fator de dificuldade.
+
+O modelo recebe sempre as mesmas 4 features, entao o esquema e fixado aqui e,
+quando o estimador permite, ele e "compilado" em estruturas Python simples
+(coeficientes lineares ou arvores achatadas em listas). Assim uma predicao de
+uma linha nao passa pela validacao do sklearn nem cria um DataFrame.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FEATURES_MODELO = [
+    "taxa_acerto_geral_sessao",
+    "taxa_acerto_recente_op_sessao",
+    "perguntas_respondidas_op_sessao",
+    "faixa_etaria_inicio_num",
+]
+AMOSTRAS_PARIDADE = 256
+
+
+class AvaliadorLinear:
+    def __init__(self, coeficientes, intercepto: float):
+        self.coeficientes = [float(c) for c in coeficientes]
+        self.intercepto = float(intercepto)
+
+    def avaliar(self, valores: list[float]) -> float:
+        total = self.intercepto
+        for c, v in zip(self.coeficientes, valores):
+            total += c * v
+        return total
+
+
+class AvaliadorArvores:
+    """Soma ponderada de arvores de regressao achatadas (DecisionTree, RandomForest, GradientBoosting)."""
+
+    def __init__(self, arvores, peso: float = 1.0, base: float = 0.0):
+        self.peso = peso
+        self.base = base
+        self.arvores = []
+        for arvore in arvores:
+            self.arvores.append((
+                arvore.children_left.tolist(),
+                arvore.children_right.tolist(),
+                arvore.feature.tolist(),
+                arvore.threshold.tolist(),
+                arvore.value[:, 0, 0].tolist(),
+            ))
+
+    def avaliar(self, valores: list[float]) -> float:
+        # As arvores do sklearn comparam as features em float32.
+        valores = [float(np.float32(v)) for v in valores]
+        total = 0.0
+        for esquerda, direita, feature, limiar, valor in self.arvores:
+            no = 0
+            while esquerda[no] != -1:
+                no = esquerda[no] if valores[feature[no]] <= limiar[no] else direita[no]
+            total += valor[no]
+        return self.base + self.peso * total
+
+
+def compilar_modelo(modelo):
+    """Retorna um avaliador leve para o modelo, ou None se o tipo nao for suportado."""
+    n_features = len(FEATURES_MODELO)
+    if getattr(modelo, "n_features_in_", n_features) != n_features:
+        return None
+
+    coef = getattr(modelo, "coef_", None)
+    if coef is not None and hasattr(modelo, "intercept_"):
+        coef = np.ravel(coef)
+        intercepto = np.ravel(modelo.intercept_)
+        if coef.shape[0] != n_features or intercepto.shape[0] != 1:
+            return None
+        return AvaliadorLinear(coef, intercepto[0])
+
+    if hasattr(modelo, "tree_"):
+        return AvaliadorArvores([modelo.tree_])
+
+    estimadores = getattr(modelo, "estimators_", None)
+    if estimadores is None:
+        return None
+    if type(modelo).__name__ in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        return AvaliadorArvores([e.tree_ for e in estimadores], peso=1.0 / len(estimadores))
+    if type(modelo).__name__ == "GradientBoostingRegressor" and getattr(modelo, "init_", None) is not None:
+        init = modelo.init_
+        if init == "zero":
+            base = 0.0
+        elif hasattr(init, "constant_"):
+            base = float(np.ravel(init.constant_)[0])
+        else:
+            return None
+        return AvaliadorArvores([e.tree_ for e in np.ravel(estimadores)], peso=float(modelo.learning_rate), base=base)
+    return None
+
+
+class PreditorDificuldade:
+    """Predicao de uma linha de features com o caminho mais barato disponivel.
+
+    Ordem de preferencia: avaliador compilado, `predict` sobre uma linha NumPy
+    pre-alocada (modelos treinados sem nomes de colunas) e, por ultimo, o
+    caminho original com `pd.DataFrame`. Com preprocessador, as features passam
+    por `transform` antes do modelo e nao ha compilacao.
+    """
+
+    def __init__(self, modelo, preprocessador=None, verificar: bool = True):
+        self.modelo = modelo
+        self.preprocessador = preprocessador
+        self.avaliador = compilar_modelo(modelo) if preprocessador is None else None
+        self._linha = np.zeros((1, len(FEATURES_MODELO)), dtype=np.float64)
+        entrada = preprocessador if preprocessador is not None else modelo
+        self._usa_nomes = hasattr(entrada, "feature_names_in_")
+        if self.avaliador is not None and verificar and not self.verificar_paridade():
+            logger.warning("Avaliador compilado diverge de predict() para %s. Usando predict().", type(modelo).__name__)
+            self.avaliador = None
+
+    @property
+    def caminho(self) -> str:
+        if self.avaliador is not None:
+            return "compilado"
+        return "pandas" if self._usa_nomes else "numpy"
+
+    def vetor(self, features: dict) -> list[float]:
+        return [float(features[nome]) for nome in FEATURES_MODELO]
+
+    def prever(self, features: dict) -> float:
+        valores = self.vetor(features)
+        if self.avaliador is not None:
+            return self.avaliador.avaliar(valores)
+        if self._usa_nomes:
+            import pandas as pd
+            return float(self._predict(pd.DataFrame([features], columns=FEATURES_MODELO))[0])
+        self._linha[0, :] = valores
+        return float(self._predict(self._linha)[0])
+
+    def _predict(self, X):
+        if self.preprocessador is not None:
+            X = self.preprocessador.transform(X)
+        return self.modelo.predict(X)
+
+    def prever_lote(self, X: np.ndarray) -> np.ndarray:
+        """Predicao vetorizada de varias linhas (colunas na ordem de FEATURES_MODELO)."""
+        if isinstance(self.avaliador, AvaliadorLinear):
+            return X @ np.asarray(self.avaliador.coeficientes) + self.avaliador.intercepto
+        if self._usa_nomes:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=FEATURES_MODELO)
+        return np.asarray(self._predict(X), dtype=np.float64)
+
+    def verificar_paridade(self, n_amostras: int = AMOSTRAS_PARIDADE, tolerancia: float = 1e-9, semente: int = 0) -> bool:
+        if self.avaliador is None:
+            return True
+        amostras = gerar_amostras_features(n_amostras, semente)
+        X = np.array([self.vetor(f) for f in amostras], dtype=np.float64)
+        if self._usa_nomes:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=FEATURES_MODELO)
+        esperado = self.modelo.predict(X)
+        for features, valor_esperado in zip(amostras, esperado):
+            if abs(self.avaliador.avaliar(self.vetor(features)) - float(valor_esperado)) > tolerancia:
+                return False
+        return True
+
+
+def gerar_amostras_features(n: int, semente: int = 0) -> list[dict]:
+    rng = np.random.default_rng(semente)
+    faixas = [3, 6, 9, 13, 16, 19, 23]
+    amostras = []
+    for _ in range(n):
+        respondidas = int(rng.integers(0, 60))
+        amostras.append({
+            "taxa_acerto_geral_sessao": float(rng.random()),
+            "taxa_acerto_recente_op_sessao": float(rng.integers(0, 6)) / 5 if respondidas else 0.0,
+            "perguntas_respondidas_op_sessao": respondidas,
+            "faixa_etaria_inicio_num": int(rng.choice(faixas)),
+        })
+    return amostras
@@ -0,0 +1,241 @@
+import csv
+import glob
+import heapq
+import logging
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+LOG_TAMANHO_LOTE = 200
+LOG_INTERVALO_FLUSH_SEGUNDOS = 1.0
+LOG_MAX_PENDENTES = 10000
+LOG_AVISO_DESCARTES_A_CADA = 1000
+
+CSV_HEADERS = [
+    "timestamp", "id_sessao", "faixa_etaria", "operacao_solicitada",
+    "pergunta_gerada", "numeros_pergunta", "resposta_aluno", "resposta_correta", "acertou_pergunta",
+    "exemplo_fornecido_1", "entendeu_exemplo_1",
+    "exemplo_fornecido_2", "entendeu_exemplo_2",
+    "exemplo_fornecido_3", "entendeu_exemplo_3",
+
+    "ml_fator_dificuldade_aplicado",
+    "ml_taxa_acerto_recente",
+    "ml_perguntas_na_op_atual",
+    "ml_versao_modelo",
+    "ml_taxa_acerto_geral"
+]
+
+
+class EscritorLogEmLotes(ABC):
+    """Fila em memoria + thread de flush que grava as linhas do log em lotes.
+
+    `registrar` so enfileira; a gravacao acontece quando o lote enche ou quando
+    passa `intervalo_flush` segundos. `registrar` e chamado de dentro das rotas
+    async e nunca bloqueia: com a fila cheia (disco lento ou travado), a linha e
+    descartada e contada em `linhas_descartadas`, para nao parar o event loop
+    e todas as requisicoes junto com o log. Subclasses definem
+    o formato em `_escrever_lote`.
+    """
+
+    def __init__(self, caminho: str, cabecalhos: list[str], tamanho_lote: int = LOG_TAMANHO_LOTE,
+                 intervalo_flush: float = LOG_INTERVALO_FLUSH_SEGUNDOS, max_pendentes: int = LOG_MAX_PENDENTES):
+        self.caminho = caminho
+        self.cabecalhos = list(cabecalhos)
+        self.tamanho_lote = tamanho_lote
+        self.intervalo_flush = intervalo_flush
+        self._fila: queue.Queue = queue.Queue(maxsize=max_pendentes)
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock_inicio = threading.Lock()
+        self.contadores = {
+            "linhas_enfileiradas": 0,
+            "linhas_gravadas": 0,
+            "lotes_gravados": 0,
+            "linhas_descartadas": 0,
+            "erros_gravacao": 0,
+            "ultimo_lote_tamanho": 0,
+            "ultimo_lote_segundos": 0.0,
+        }
+
+    def iniciar(self) -> None:
+        with self._lock_inicio:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop_flush, name="escritor-log", daemon=True)
+            self._thread.start()
+
+    def registrar(self, linha: dict) -> bool:
+        """Enfileira a linha; retorna False se ela foi descartada com a fila cheia."""
+        if self._thread is None:
+            self.iniciar()
+        try:
+            self._fila.put_nowait(linha)
+        except queue.Full:
+            self.contadores["linhas_descartadas"] += 1
+            descartadas = self.contadores["linhas_descartadas"]
+            if descartadas == 1 or descartadas % LOG_AVISO_DESCARTES_A_CADA == 0:
+                logger.warning("Fila de gravação de '%s' cheia: %d linhas descartadas até agora.", self.caminho, descartadas)
+            return False
+        self.contadores["linhas_enfileiradas"] += 1
+        return True
+
+    def registrar_varios(self, linhas: list[dict]) -> None:
+        for linha in linhas:
+            self.registrar(linha)
+
+    def pendentes(self) -> int:
+        return self._fila.qsize()
+
+    def fechar(self, timeout: float | None = 10.0) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._gravar_lote(self._drenar(None))
+
+    def estatisticas(self) -> dict:
+        return {**self.contadores, "linhas_pendentes": self.pendentes()}
+
+    def _drenar(self, limite: int | None) -> list[dict]:
+        lote = []
+        while limite is None or len(lote) < limite:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _loop_flush(self) -> None:
+        while not self._parar.is_set():
+            lote = []
+            prazo = time.monotonic() + self.intervalo_flush
+            while len(lote) < self.tamanho_lote and not self._parar.is_set():
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._fila.get(timeout=min(restante, 0.1)))
+                except queue.Empty:
+                    continue
+                lote.extend(self._drenar(self.tamanho_lote - len(lote)))
+            self._gravar_lote(lote)
+
+    def _gravar_lote(self, lote: list[dict]) -> None:
+        if not lote:
+            return
+        inicio = time.perf_counter()
+        try:
+            self._escrever_lote(lote)
+        except Exception as e:
+            self.contadores["erros_gravacao"] += 1
+            logger.error("Falha ao gravar lote de %d linhas em '%s': %s", len(lote), self.caminho, e)
+            return
+        self.contadores["linhas_gravadas"] += len(lote)
+        self.contadores["lotes_gravados"] += 1
+        self.contadores["ultimo_lote_tamanho"] = len(lote)
+        self.contadores["ultimo_lote_segundos"] = time.perf_counter() - inicio
+
+    @abstractmethod
+    def _escrever_lote(self, lote: list[dict]) -> None:
+        ...
+
+
+def alinhar_cabecalho_csv(caminho: str, cabecalhos: list[str]) -> None:
+    """Deixa um CSV ja existente com o cabecalho `cabecalhos` antes de receber linhas novas.
+
+    Colunas novas no fim (o caso normal quando o log ganha campos): o arquivo e
+    reescrito com o cabecalho atual e as linhas antigas completadas com vazio.
+    Qualquer outra diferenca: o arquivo e renomeado para
+    <nome>.cabecalho-antigo-<data>.csv e o log recomeca num arquivo novo.
+    """
+    if not os.path.exists(caminho) or os.path.getsize(caminho) == 0:
+        return
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        atual = next(csv.reader(arquivo), [])
+    if atual == cabecalhos:
+        return
+    if atual == cabecalhos[:len(atual)]:
+        caminho_tmp = caminho + ".tmp"
+        with open(caminho, newline="", encoding="utf-8-sig") as origem, \
+                open(caminho_tmp, "w", newline="", encoding="utf-8-sig") as destino:
+            leitor = csv.reader(origem)
+            next(leitor, None)
+            escritor = csv.writer(destino, lineterminator="\n")
+            escritor.writerow(cabecalhos)
+            for valores in leitor:
+                if valores:
+                    escritor.writerow(valores + [""] * (len(cabecalhos) - len(valores)))
+        os.replace(caminho_tmp, caminho)
+        logger.warning("Cabeçalho de '%s' atualizado com as colunas novas %s.", caminho, cabecalhos[len(atual):])
+        return
+    raiz, extensao = os.path.splitext(caminho)
+    antigo = f"{raiz}.cabecalho-antigo-{datetime.now():%Y%m%d%H%M%S}{extensao}"
+    os.replace(caminho, antigo)
+    logger.warning("Cabeçalho de '%s' não confere com o atual; arquivo movido para '%s'.", caminho, antigo)
+
+
+class EscritorLogCSV(EscritorLogEmLotes):
+    _cabecalho_conferido = False
+
+    def _escrever_lote(self, lote: list[dict]) -> None:
+        if not self._cabecalho_conferido:
+            # Um log gravado por uma versao anterior pode ter menos colunas; as linhas novas nao podem ir embaixo dele.
+            alinhar_cabecalho_csv(self.caminho, self.cabecalhos)
+            self._cabecalho_conferido = True
+        escrever_cabecalho = not os.path.exists(self.caminho) or os.path.getsize(self.caminho) == 0
+        with open(self.caminho, "a", newline="", encoding="utf-8-sig") as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=self.cabecalhos, extrasaction="ignore", lineterminator="\n")
+            if escrever_cabecalho:
+                escritor.writeheader()
+            escritor.writerows(lote)
+
+
+def caminho_shard(caminho: str, indice: int) -> str:
+    raiz, extensao = os.path.splitext(caminho)
+    return f"{raiz}.worker-{indice}{extensao}"
+
+
+def listar_shards(caminho: str) -> list[str]:
+    raiz, extensao = os.path.splitext(caminho)
+    return sorted(glob.glob(f"{glob.escape(raiz)}.worker-*{extensao}"))
+
+
+def mesclar_shards(caminho: str, cabecalhos: list[str]) -> int:
+    """Anexa ao CSV principal as linhas dos shards por worker, em ordem de timestamp, e remove os shards.
+
+    Deve rodar com os workers parados. Cada shard ja esta em ordem de
+    timestamp, entao a juncao e um merge em streaming.
+    """
+    shards = listar_shards(caminho)
+    if not shards:
+        return 0
+    alinhar_cabecalho_csv(caminho, cabecalhos)
+    arquivos = [open(shard, newline="", encoding="utf-8-sig") for shard in shards]
+    total = 0
+    try:
+        leitores = []
+        for arquivo in arquivos:
+            leitor = csv.reader(arquivo)
+            next(leitor, None)
+            leitores.append(leitor)
+        escrever_cabecalho = not os.path.exists(caminho) or os.path.getsize(caminho) == 0
+        with open(caminho, "a", newline="", encoding="utf-8-sig") as destino:
+            escritor = csv.writer(destino, lineterminator="\n")
+            if escrever_cabecalho:
+                escritor.writerow(cabecalhos)
+            for valores in heapq.merge(*leitores, key=lambda v: v[0] if v else ""):
+                if valores:
+                    escritor.writerow(valores)
+                    total += 1
+    finally:
+        for arquivo in arquivos:
+            arquivo.close()
+    for shard in shards:
+        os.remove(shard)
+    return total
@@ -0,0 +1,212 @@
+"""Log de aprendizado em Parquet particionado por data e operacao.
+
+Layout: <raiz>/data=AAAA-MM-DD/operacao_solicitada=<op>/parte-*.parquet
+
+Uso pela linha de comando (a partir da raiz do repositorio):
+    python -m serverside.servicos.log_parquet converter aprendizado_log.csv log_parquet
+    python -m serverside.servicos.log_parquet compactar log_parquet
+"""
+import argparse
+import csv
+import os
+import uuid
+from datetime import datetime
+
+from serverside.servicos.log_aprendizado import CSV_HEADERS, EscritorLogEmLotes
+
+COLUNAS_TEXTO = [
+    "id_sessao", "faixa_etaria", "pergunta_gerada", "numeros_pergunta",
+    "exemplo_fornecido_1", "exemplo_fornecido_2", "exemplo_fornecido_3", "ml_versao_modelo",
+]
+COLUNAS_BOOL = ["acertou_pergunta", "entendeu_exemplo_1", "entendeu_exemplo_2", "entendeu_exemplo_3"]
+COLUNAS_FLOAT = ["resposta_aluno", "ml_fator_dificuldade_aplicado", "ml_taxa_acerto_recente", "ml_taxa_acerto_geral"]
+COLUNAS_INT = ["resposta_correta", "ml_perguntas_na_op_atual"]
+COMPRESSAO = "zstd"
+TAMANHO_CHUNK_CONVERSAO = 50000
+
+
+def _importar_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("O log em Parquet precisa do pacote 'pyarrow' (pip install pyarrow).") from e
+    return pa, pq
+
+
+def schema_log():
+    pa, _ = _importar_pyarrow()
+    campos = [pa.field("timestamp", pa.timestamp("s"))]
+    for coluna in CSV_HEADERS:
+        if coluna in COLUNAS_TEXTO:
+            tipo = pa.dictionary(pa.int16(), pa.string()) if coluna == "faixa_etaria" else pa.string()
+        elif coluna in COLUNAS_BOOL:
+            tipo = pa.bool_()
+        elif coluna in COLUNAS_FLOAT:
+            tipo = pa.float64()
+        elif coluna in COLUNAS_INT:
+            tipo = pa.int64()
+        else:
+            continue
+        campos.append(pa.field(coluna, tipo))
+    return pa.schema(campos)
+
+
+def _para_bool(valor):
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, str):
+        return valor.strip().lower() in ("true", "1", "sim")
+    return bool(valor)
+
+
+def _para_float(valor):
+    if valor is None or valor == "":
+        return None
+    return float(valor)
+
+
+def _para_int(valor):
+    if valor is None or valor == "":
+        return None
+    return int(float(valor))
+
+
+def _para_datetime(valor):
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.strptime(valor, "%Y-%m-%d %H:%M:%S")
+
+
+def normalizar_linha(linha: dict) -> dict:
+    normalizada = {"timestamp": _para_datetime(linha["timestamp"])}
+    normalizada["operacao_solicitada"] = linha.get("operacao_solicitada") or "desconhecida"
+    for coluna in COLUNAS_TEXTO:
+        valor = linha.get(coluna)
+        normalizada[coluna] = None if valor is None or valor == "" else str(valor)
+    for coluna in COLUNAS_BOOL:
+        normalizada[coluna] = _para_bool(linha.get(coluna))
+    for coluna in COLUNAS_FLOAT:
+        normalizada[coluna] = _para_float(linha.get(coluna))
+    for coluna in COLUNAS_INT:
+        normalizada[coluna] = _para_int(linha.get(coluna))
+    return normalizada
+
+
+def _diretorio_particao(raiz: str, data: str, operacao: str) -> str:
+    return os.path.join(raiz, f"data={data}", f"operacao_solicitada={operacao}")
+
+
+def gravar_particionado(raiz: str, linhas: list[dict], prefixo: str = "parte") -> list[str]:
+    pa, pq = _importar_pyarrow()
+    schema = schema_log()
+    grupos: dict[tuple[str, str], list[dict]] = {}
+    for linha in linhas:
+        normalizada = normalizar_linha(linha)
+        chave = (normalizada["timestamp"].strftime("%Y-%m-%d"), normalizada.pop("operacao_solicitada"))
+        grupos.setdefault(chave, []).append(normalizada)
+
+    arquivos = []
+    for (data, operacao), grupo in grupos.items():
+        diretorio = _diretorio_particao(raiz, data, operacao)
+        os.makedirs(diretorio, exist_ok=True)
+        tabela = pa.Table.from_pylist(grupo, schema=schema)
+        caminho = os.path.join(diretorio, f"{prefixo}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+        caminho_tmp = caminho + ".tmp"
+        pq.write_table(tabela, caminho_tmp, compression=COMPRESSAO)
+        os.replace(caminho_tmp, caminho)
+        arquivos.append(caminho)
+    return arquivos
+
+
+class EscritorLogParquet(EscritorLogEmLotes):
+    """Mesmo pipeline em lotes do CSV, mas cada lote vira um arquivo por particao."""
+
+    def __init__(self, caminho: str, cabecalhos: list[str], **opcoes):
+        _importar_pyarrow()
+        super().__init__(caminho, cabecalhos, **opcoes)
+
+    def _escrever_lote(self, lote: list[dict]) -> None:
+        gravar_particionado(self.caminho, lote)
+
+
+def _listar_particoes(raiz: str):
+    for dir_data in sorted(os.listdir(raiz)):
+        caminho_data = os.path.join(raiz, dir_data)
+        if not dir_data.startswith("data=") or not os.path.isdir(caminho_data):
+            continue
+        for dir_op in sorted(os.listdir(caminho_data)):
+            caminho_op = os.path.join(caminho_data, dir_op)
+            if dir_op.startswith("operacao_solicitada=") and os.path.isdir(caminho_op):
+                yield caminho_op
+
+
+def compactar(raiz: str, min_arquivos: int = 2) -> dict:
+    """Junta os arquivos pequenos de cada particao em um unico arquivo."""
+    pa, pq = _importar_pyarrow()
+    schema = schema_log()
+    resumo = {"particoes_compactadas": 0, "arquivos_removidos": 0, "linhas": 0}
+    for particao in _listar_particoes(raiz):
+        arquivos = sorted(os.path.join(particao, a) for a in os.listdir(particao) if a.endswith(".parquet"))
+        if len(arquivos) < min_arquivos:
+            continue
+        tabela = pa.concat_tables(pq.read_table(a, schema=schema) for a in arquivos)
+        tabela = tabela.sort_by("timestamp")
+        destino = os.path.join(particao, f"compactado-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(tabela, destino + ".tmp", compression=COMPRESSAO)
+        os.replace(destino + ".tmp", destino)
+        for arquivo in arquivos:
+            os.remove(arquivo)
+        resumo["particoes_compactadas"] += 1
+        resumo["arquivos_removidos"] += len(arquivos)
+        resumo["linhas"] += tabela.num_rows
+    return resumo
+
+
+def converter_csv(caminho_csv: str, raiz: str, tamanho_chunk: int = TAMANHO_CHUNK_CONVERSAO) -> int:
+    """Converte o CSV legado em Parquet particionado, lendo em blocos.
+
+    As colunas sao mapeadas por posicao em CSV_HEADERS, porque linhas antigas
+    do CSV foram gravadas com menos colunas do que o cabecalho atual.
+    """
+    total = 0
+    with open(caminho_csv, newline="", encoding="utf-8-sig") as arquivo:
+        leitor = csv.reader(arquivo)
+        next(leitor, None)
+        chunk = []
+        for valores in leitor:
+            if not valores:
+                continue
+            chunk.append(dict(zip(CSV_HEADERS, valores)))
+            if len(chunk) >= tamanho_chunk:
+                gravar_particionado(raiz, chunk, prefixo="convertido")
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            gravar_particionado(raiz, chunk, prefixo="convertido")
+            total += len(chunk)
+    return total
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Ferramentas do log de aprendizado em Parquet.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_conv = sub.add_parser("converter", help="Converte o CSV de log em Parquet particionado.")
+    p_conv.add_argument("csv")
+    p_conv.add_argument("raiz")
+    p_conv.add_argument("--tamanho-chunk", type=int, default=TAMANHO_CHUNK_CONVERSAO)
+    p_comp = sub.add_parser("compactar", help="Junta arquivos pequenos de cada particao.")
+    p_comp.add_argument("raiz")
+    p_comp.add_argument("--min-arquivos", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.comando == "converter":
+        total = converter_csv(args.csv, args.raiz, args.tamanho_chunk)
+        print(f"INFO: {total} linhas convertidas de '{args.csv}' para '{args.raiz}'.")
+    else:
+        resumo = compactar(args.raiz, args.min_arquivos)
+        print(f"INFO: Compactação concluída: {resumo}")
+
+
+if __name__ == "__main__":
+    main()
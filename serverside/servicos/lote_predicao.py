@@ -0,0 +1,68 @@
+import asyncio
+
+import numpy as np
+
+from serverside.servicos.inferencia import PreditorDificuldade
+
+LOTE_MAX_TAMANHO = 64
+LOTE_MAX_ESPERA_US = 500
+
+
+class LoteadorPredicoes:
+    """Agrupa predicoes de requisicoes concorrentes em um unico `predict` vetorizado.
+
+    Cada chamada a `prever` entra na fila do lote atual; o lote e despachado
+    quando atinge `max_lote` itens ou quando passam `max_espera_us`
+    microssegundos desde o primeiro item, o que ocorrer antes. Cada item guarda
+    o preditor do chamador, entao numa troca de versao do modelo o lote e
+    avaliado por grupos e cada linha usa a versao registrada no log. Compensa para
+    modelos cujo custo por chamada de `predict` domina (o caminho compilado de
+    PreditorDificuldade ja custa poucos microssegundos e dispensa o lote).
+    """
+
+    def __init__(self, max_lote: int = LOTE_MAX_TAMANHO, max_espera_us: int = LOTE_MAX_ESPERA_US):
+        self.max_lote = max_lote
+        self.max_espera = max_espera_us / 1_000_000
+        self._pendentes: list[tuple[PreditorDificuldade, list[float], asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self.contadores = {"lotes": 0, "predicoes": 0, "maior_lote": 0}
+
+    async def prever(self, preditor: PreditorDificuldade, features: dict) -> float:
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._pendentes.append((preditor, preditor.vetor(features), futuro))
+        if len(self._pendentes) >= self.max_lote:
+            self._despachar()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_espera, self._despachar)
+        return await futuro
+
+    def _despachar(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pendentes, self._pendentes = self._pendentes, []
+        if not pendentes:
+            return
+        grupos: dict[int, tuple[PreditorDificuldade, list, list]] = {}
+        for preditor, vetor, futuro in pendentes:
+            grupo = grupos.setdefault(id(preditor), (preditor, [], []))
+            grupo[1].append(vetor)
+            grupo[2].append(futuro)
+        for preditor, vetores, futuros in grupos.values():
+            self._resolver(preditor, vetores, futuros)
+        self.contadores["lotes"] += 1
+        self.contadores["predicoes"] += len(pendentes)
+        self.contadores["maior_lote"] = max(self.contadores["maior_lote"], len(pendentes))
+
+    def _resolver(self, preditor: PreditorDificuldade, vetores: list, futuros: list) -> None:
+        try:
+            predicoes = preditor.prever_lote(np.asarray(vetores, dtype=np.float64))
+        except Exception as e:
+            for futuro in futuros:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+        for futuro, valor in zip(futuros, predicoes):
+            if not futuro.done():
+                futuro.set_result(float(valor))
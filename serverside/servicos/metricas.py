@@ -0,0 +1,151 @@
+"""Logging com niveis e metricas no formato texto do Prometheus, sem dependencias.
+
+As mensagens do servidor saem como antes ("INFO: ...", "AVISO: ...", "ERRO: ...",
+"DEBUG: ..."), mas passam pelo `logging`: o nivel vem de CALCULA_NIVEL_LOG
+(padrao INFO, ou seja, DEBUG desligado) e a formatacao so acontece se a
+mensagem for emitida.
+
+As metricas ficam em memoria; observar um valor e um incremento em dicionario
+(e uma busca binaria nos limites, no caso de histogramas). Os acumulados so sao
+calculados em `renderizar`, chamado pelo endpoint /metrics.
+"""
+import bisect
+import logging
+import os
+import threading
+from typing import Callable
+
+NIVEL_LOG_PADRAO = "INFO"
+LIMITES_LATENCIA_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+NOMES_NIVEIS = {logging.WARNING: "AVISO", logging.ERROR: "ERRO"}
+
+
+class FormatadorNiveis(logging.Formatter):
+    """Troca WARNING/ERROR por AVISO/ERRO so na saida do servidor, sem mexer nos nomes globais do `logging`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        nome_original = record.levelname
+        record.levelname = NOMES_NIVEIS.get(record.levelno, nome_original)
+        try:
+            return super().format(record)
+        finally:
+            # O mesmo registro pode seguir para outros handlers (uvicorn, pytest...).
+            record.levelname = nome_original
+
+
+def configurar_logging(nivel: str | None = None) -> logging.Logger:
+    """Configura o logger `serverside` uma unica vez e devolve ele."""
+    logger = logging.getLogger("serverside")
+    logger.setLevel((nivel or os.environ.get("CALCULA_NIVEL_LOG", NIVEL_LOG_PADRAO)).upper())
+    if not logger.handlers:
+        saida = logging.StreamHandler()
+        saida.setFormatter(FormatadorNiveis("%(levelname)s: %(message)s"))
+        logger.addHandler(saida)
+        logger.propagate = False
+    return logger
+
+
+def _rotulos_texto(nomes: tuple[str, ...], valores: tuple, extra: str = "") -> str:
+    partes = [f'{nome}="{str(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple[str, ...] = ()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self._valores: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores_rotulos, quantidade: float = 1) -> None:
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + quantidade
+
+    def valor(self, *valores_rotulos) -> float:
+        return self._valores.get(valores_rotulos, 0)
+
+    def amostras(self) -> list[str]:
+        with self._lock:
+            itens = sorted(self._valores.items())
+        return [f"{self.nome}{_rotulos_texto(self.rotulos, chave)} {valor}" for chave, valor in itens]
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple[str, ...] = (), limites: tuple[float, ...] = LIMITES_LATENCIA_SEGUNDOS):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self.limites = tuple(sorted(limites))
+        # Por serie: [contagem por faixa (a ultima e +Inf), soma, total]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *valores_rotulos) -> None:
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def amostras(self) -> list[str]:
+        with self._lock:
+            series = sorted((chave, ([*s[0]], s[1], s[2])) for chave, s in self._series.items())
+        linhas = []
+        for chave, (contagens, soma, total) in series:
+            acumulado = 0
+            for limite, contagem in zip((*self.limites, "+Inf"), contagens):
+                acumulado += contagem
+                le = f'le="{limite}"'
+                linhas.append(f"{self.nome}_bucket{_rotulos_texto(self.rotulos, chave, le)} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos_texto(self.rotulos, chave)} {soma}")
+            linhas.append(f"{self.nome}_count{_rotulos_texto(self.rotulos, chave)} {total}")
+        return linhas
+
+
+class Medidor:
+    """Valor lido na hora da coleta (ex.: tamanho de uma fila)."""
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, funcao: Callable[[], float]):
+        self.nome, self.ajuda, self.funcao = nome, ajuda, funcao
+        self.rotulos = ()
+
+    def amostras(self) -> list[str]:
+        try:
+            return [f"{self.nome} {float(self.funcao())}"]
+        except Exception:
+            return []
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas: dict[str, Contador | Histograma | Medidor] = {}
+
+    def _registrar(self, metrica):
+        if metrica.nome in self._metricas:
+            raise ValueError(f"Metrica '{metrica.nome}' ja registrada.")
+        self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: tuple[str, ...] = ()) -> Contador:
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome: str, ajuda: str, rotulos: tuple[str, ...] = (), limites: tuple[float, ...] = LIMITES_LATENCIA_SEGUNDOS) -> Histograma:
+        return self._registrar(Histograma(nome, ajuda, rotulos, limites))
+
+    def medidor(self, nome: str, ajuda: str, funcao: Callable[[], float]) -> Medidor:
+        return self._registrar(Medidor(nome, ajuda, funcao))
+
+    def renderizar(self) -> str:
+        linhas = []
+        for metrica in self._metricas.values():
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(metrica.amostras())
+        return "\n".join(linhas) + "\n"
@@ -0,0 +1,141 @@
+"""Modo multiprocesso: N workers uvicorn pre-forkados atras de um unico socket.
+
+    python -m serverside.servicos.multiprocesso iniciar --workers 4 --porta 8000
+    python -m serverside.servicos.multiprocesso mesclar-logs aprendizado_log.csv
+
+O processo pai importa o app, carrega o modelo de dificuldade e abre o socket
+antes do fork; os workers herdam o modelo por copy-on-write e aceitam conexoes
+no mesmo socket. Estado compartilhado:
+
+- sessoes: backend SQLite em modo WAL (CALCULA_SESSAO_BACKEND=sqlite, imposto
+  aqui; o backend em memoria nao e visto pelos outros workers);
+- seletor de estilos: arrays alfa/beta em memoria anonima compartilhada; so o
+  worker 0 grava o snapshot;
+- log CSV: cada worker grava em aprendizado_log.worker-<i>.csv e o pai junta os
+  shards no CSV principal ao encerrar (ou `mesclar-logs`, com os workers parados).
+  Com CALCULA_LOG_FORMATO=parquet cada arquivo ja tem nome unico.
+
+O pai reinicia workers que morrem e repassa SIGTERM/SIGINT para o
+encerramento gracioso. Usa os.fork, entao so funciona em POSIX.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+
+# Nome fixo: executado com -m, __name__ seria "__main__" e ficaria fora do logger "serverside".
+logger = logging.getLogger("serverside.servicos.multiprocesso")
+
+WORKERS_PADRAO = 2
+BACKLOG_SOCKET = 2048
+ESPERA_REINICIO_SEGUNDOS = 1.0
+
+
+def _abrir_socket(host: str, porta: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, porta))
+    sock.listen(BACKLOG_SOCKET)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _executar_worker(main, indice: int, sock: socket.socket, nivel_log: str) -> None:
+    import uvicorn
+    main.configurar_worker(indice)
+    servidor = uvicorn.Server(uvicorn.Config(main.app, log_level=nivel_log))
+    servidor.run(sockets=[sock])
+
+
+def _iniciar_worker(main, indice: int, sock: socket.socket, nivel_log: str) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # Grupo proprio: o Ctrl+C do terminal chega so ao pai, que encerra os workers com um unico SIGTERM.
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    codigo = 0
+    try:
+        _executar_worker(main, indice, sock, nivel_log)
+    except BaseException:
+        logger.exception("Worker %d encerrado por erro.", indice)
+        codigo = 1
+    finally:
+        os._exit(codigo)
+
+
+def executar(workers: int, host: str, porta: int, nivel_log: str = "info") -> None:
+    backend = os.environ.setdefault("CALCULA_SESSAO_BACKEND", "sqlite")
+    if backend != "sqlite":
+        raise SystemExit(f"ERRO: O modo multiprocesso precisa de CALCULA_SESSAO_BACKEND=sqlite (recebido '{backend}').")
+
+    from serverside.routes import main
+    from serverside.servicos.log_aprendizado import CSV_HEADERS, mesclar_shards
+
+    main.preparar_prefork()
+    sock = _abrir_socket(host, porta)
+    filhos = {_iniciar_worker(main, i, sock, nivel_log): i for i in range(workers)}
+    logger.info("%d workers atendendo em %s:%d (pid do processo pai: %d).", workers, host, porta, os.getpid())
+
+    encerrando = False
+
+    def parar(sinal, _quadro):
+        nonlocal encerrando
+        encerrando = True
+        for pid in list(filhos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, parar)
+    signal.signal(signal.SIGINT, parar)
+
+    while filhos:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        indice = filhos.pop(pid, None)
+        if indice is None or encerrando:
+            continue
+        logger.warning("Worker %d (pid %d) terminou com código %d. Reiniciando.", indice, pid, os.waitstatus_to_exitcode(status))
+        time.sleep(ESPERA_REINICIO_SEGUNDOS)
+        if not encerrando:
+            filhos[_iniciar_worker(main, indice, sock, nivel_log)] = indice
+
+    sock.close()
+    if main.LOG_FORMATO != "parquet":
+        linhas = mesclar_shards(main.CSV_FILE, CSV_HEADERS)
+        logger.info("%d linhas dos shards de log juntadas em '%s'.", linhas, main.CSV_FILE)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor com varios workers pre-forkados e estado compartilhado.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_iniciar = sub.add_parser("iniciar", help="Sobe N workers no mesmo socket.")
+    p_iniciar.add_argument("--workers", type=int, default=int(os.environ.get("CALCULA_WORKERS", WORKERS_PADRAO)))
+    p_iniciar.add_argument("--host", default="127.0.0.1")
+    p_iniciar.add_argument("--porta", type=int, default=8000)
+    p_iniciar.add_argument("--nivel-log-uvicorn", default="info")
+
+    p_mesclar = sub.add_parser("mesclar-logs", help="Junta os shards CSV por worker no log principal (workers parados).")
+    p_mesclar.add_argument("log", nargs="?", default="aprendizado_log.csv")
+
+    args = parser.parse_args(argv)
+    if args.comando == "iniciar":
+        if args.workers < 1:
+            parser.error("--workers deve ser pelo menos 1.")
+        executar(args.workers, args.host, args.porta, args.nivel_log_uvicorn)
+    else:
+        from serverside.servicos.log_aprendizado import CSV_HEADERS, mesclar_shards
+        linhas = mesclar_shards(args.log, CSV_HEADERS)
+        print(f"INFO: {linhas} linhas dos shards juntadas em '{args.log}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Perfis persistentes de alunos: agregados por operacao que sobrevivem entre sessoes.
+
+Cada perfil e um registro binario de tamanho fixo numa tabela SQLite (WAL),
+chave `id_aluno`:
+
+    versao (B) + por operacao, na ordem do catalogo:
+        respondidas (I), acertos (I),
+        janela (B: ultimos JANELA_RECENTE resultados, o mais recente no bit 0),
+        tamanho da janela (B)
+
+= 41 bytes para as quatro operacoes. Registros gravados com menos operacoes
+(catalogo antigo) sao completados com zeros na leitura.
+
+Um cache LRU em memoria atende o inicio das sessoes sem ir ao disco; numa
+falta de cache, `semente_features_async` le o SQLite numa thread. As
+respostas sao enfileiradas e gravadas em lote por uma thread
+(EscritorLogEmLotes); cada lote relê o registro e aplica os resultados na
+mesma transacao, entao workers diferentes nao apagam as respostas uns dos
+outros. Ate o lote ser gravado, as respostas ficam tambem em `_pendentes` e
+sao somadas a todo perfil lido do disco, entao o cache nunca fica atras da fila.
+"""
+import asyncio
+import logging
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from serverside.servicos.log_aprendizado import EscritorLogEmLotes
+from serverside.servicos.sessao import JANELA_RECENTE
+
+logger = logging.getLogger(__name__)
+
+VERSAO_REGISTRO = 1
+CAPACIDADE_CACHE = 50000
+INTERVALO_GRAVACAO_SEGUNDOS = 1.0
+_CABECALHO = struct.Struct("<B")
+_AGREGADO = struct.Struct("<IIBB")
+_MASCARA_JANELA = (1 << JANELA_RECENTE) - 1
+_MAX_CONTADOR = 2 ** 32 - 1
+
+
+def aplicar_resultado(agregado: list[int], acertou: bool) -> None:
+    """Soma uma resposta a [respondidas, acertos, janela, tamanho da janela]."""
+    resultado = 1 if acertou else 0
+    agregado[0] = min(agregado[0] + 1, _MAX_CONTADOR)
+    agregado[1] = min(agregado[1] + resultado, _MAX_CONTADOR)
+    agregado[2] = ((agregado[2] << 1) | resultado) & _MASCARA_JANELA
+    agregado[3] = min(agregado[3] + 1, JANELA_RECENTE)
+
+
+class _EscritorPerfis(EscritorLogEmLotes):
+    """Cada item da fila e (id_aluno, indice da operacao, acertou)."""
+
+    def __init__(self, registro: "RegistroPerfis", intervalo_flush: float):
+        super().__init__(registro.caminho, [], intervalo_flush=intervalo_flush)
+        self.registro = registro
+
+    def _escrever_lote(self, lote: list[tuple]) -> None:
+        por_aluno: dict[str, list[tuple[int, bool]]] = {}
+        for id_aluno, indice, acertou in lote:
+            por_aluno.setdefault(id_aluno, []).append((indice, acertou))
+        self.registro._aplicar_no_disco(por_aluno)
+
+
+class RegistroPerfis:
+    def __init__(self, caminho: str = "perfis_alunos.db", operacoes=(), capacidade_cache: int = CAPACIDADE_CACHE,
+                 intervalo_gravacao: float = INTERVALO_GRAVACAO_SEGUNDOS):
+        self.caminho = caminho
+        self.operacoes = tuple(operacoes)
+        self._indice_op = {op: i for i, op in enumerate(self.operacoes)}
+        self.capacidade_cache = capacidade_cache
+        self._cache: OrderedDict[str, list[list[int]]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializa leitura do disco + mescla com `_pendentes` contra a gravacao de um lote + limpeza de `_pendentes`.
+        self._lock_disco = threading.Lock()
+        self._pendentes: dict[str, list[tuple[int, bool]]] = {}
+        self._local = threading.local()
+        self.escritor = _EscritorPerfis(self, intervalo_gravacao)
+        self.contadores = {"acertos_cache": 0, "leituras_disco": 0}
+
+    def _conexao(self) -> sqlite3.Connection:
+        # Aberta no primeiro uso de cada thread: importar o app nao cria o arquivo.
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=10)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS perfis ("
+                "id_aluno TEXT PRIMARY KEY, dados BLOB NOT NULL, atualizado_em REAL NOT NULL)"
+            )
+            conexao.commit()
+            self._local.conexao = conexao
+        return conexao
+
+    def reabrir(self) -> None:
+        # Mesmo cuidado de BackendSQLite: conexoes nao atravessam um fork.
+        self._local = threading.local()
+
+    def _novo(self) -> list[list[int]]:
+        return [[0, 0, 0, 0] for _ in self.operacoes]
+
+    def empacotar(self, perfil: list[list[int]]) -> bytes:
+        return _CABECALHO.pack(VERSAO_REGISTRO) + b"".join(_AGREGADO.pack(*agregado) for agregado in perfil)
+
+    def desempacotar(self, dados: bytes) -> list[list[int]]:
+        (versao,) = _CABECALHO.unpack_from(dados)
+        corpo = dados[_CABECALHO.size:]
+        if versao != VERSAO_REGISTRO or len(corpo) % _AGREGADO.size:
+            raise ValueError(f"Registro de perfil inválido (versão {versao}, {len(dados)} bytes).")
+        perfil = [list(agregado) for agregado in _AGREGADO.iter_unpack(corpo)][:len(self.operacoes)]
+        perfil.extend([0, 0, 0, 0] for _ in range(len(self.operacoes) - len(perfil)))
+        return perfil
+
+    def _ler_do_disco(self, id_aluno: str) -> list[list[int]]:
+        linha = self._conexao().execute("SELECT dados FROM perfis WHERE id_aluno = ?", (id_aluno,)).fetchone()
+        if linha is None:
+            return self._novo()
+        try:
+            return self.desempacotar(linha[0])
+        except (ValueError, struct.error) as e:
+            logger.warning("Perfil do aluno '%s' ignorado: %s", id_aluno, e)
+            return self._novo()
+
+    def _guardar_no_cache(self, id_aluno: str, perfil: list[list[int]]) -> None:
+        self._cache[id_aluno] = perfil
+        self._cache.move_to_end(id_aluno)
+        while len(self._cache) > self.capacidade_cache:
+            self._cache.popitem(last=False)
+
+    def _do_cache(self, id_aluno: str) -> list[list[int]] | None:
+        with self._lock:
+            perfil = self._cache.get(id_aluno)
+            if perfil is not None:
+                self._cache.move_to_end(id_aluno)
+                self.contadores["acertos_cache"] += 1
+            return perfil
+
+    def obter(self, id_aluno: str) -> list[list[int]]:
+        """Agregados por operacao (na ordem de `operacoes`); aluno sem historico recebe um perfil zerado.
+
+        Numa falta de cache le o SQLite: nas rotas async, use `semente_features_async`.
+        """
+        perfil = self._do_cache(id_aluno)
+        if perfil is not None:
+            return perfil
+        with self._lock_disco:
+            perfil = self._ler_do_disco(id_aluno)
+            with self._lock:
+                self.contadores["leituras_disco"] += 1
+                existente = self._cache.get(id_aluno)
+                if existente is not None:
+                    return existente
+                # Mescla e entrada no cache sob o mesmo lock de `registrar`: nenhuma resposta fica de fora.
+                for indice, acertou in self._pendentes.get(id_aluno, ()):
+                    aplicar_resultado(perfil[indice], acertou)
+                self._guardar_no_cache(id_aluno, perfil)
+        return perfil
+
+    def _resumo(self, perfil: list[list[int]]) -> dict:
+        with self._lock:
+            return {
+                "respondidas": sum(agregado[0] for agregado in perfil),
+                "acertos": sum(agregado[1] for agregado in perfil),
+                "ops": {op: [agregado[0], bin(agregado[2]).count("1"), agregado[3]]
+                        for op, agregado in zip(self.operacoes, perfil) if agregado[0]},
+            }
+
+    def semente_features(self, id_aluno: str) -> dict:
+        """Resumo do perfil guardado na sessao para semear extrair_features_aluno (ver sessao.py)."""
+        return self._resumo(self.obter(id_aluno))
+
+    async def semente_features_async(self, id_aluno: str) -> dict:
+        """Como `semente_features`, mas uma falta de cache le o disco numa thread, fora do event loop."""
+        perfil = self._do_cache(id_aluno)
+        if perfil is None:
+            perfil = await asyncio.to_thread(self.obter, id_aluno)
+        return self._resumo(perfil)
+
+    def registrar(self, id_aluno: str, operacao: str, acertou: bool) -> None:
+        """Atualiza o perfil em cache na hora e enfileira a gravacao em disco."""
+        indice = self._indice_op.get(operacao)
+        if indice is None:
+            return
+        resultado = (indice, bool(acertou))
+        with self._lock:
+            perfil = self._cache.get(id_aluno)
+            if perfil is not None:
+                aplicar_resultado(perfil[indice], acertou)
+            # Pendente antes de enfileirar: o lote pode ser gravado (e limpar os pendentes) logo em seguida.
+            self._pendentes.setdefault(id_aluno, []).append(resultado)
+        if not self.escritor.registrar((id_aluno, *resultado)):
+            with self._lock:
+                self._remover_pendente(id_aluno, resultado)
+
+    def _remover_pendente(self, id_aluno: str, resultado: tuple[int, bool]) -> None:
+        pendentes = self._pendentes.get(id_aluno, [])
+        for i in range(len(pendentes) - 1, -1, -1):
+            if pendentes[i] == resultado:
+                del pendentes[i]
+                break
+        if not pendentes:
+            self._pendentes.pop(id_aluno, None)
+
+    def _limpar_pendentes(self, por_aluno: dict[str, list[tuple[int, bool]]]) -> dict[str, list[tuple[int, bool]]]:
+        """Tira dos pendentes um lote que saiu da fila; devolve o que ainda falta gravar por aluno. Chamar com `_lock`."""
+        restantes_por_aluno = {}
+        for id_aluno, resultados in por_aluno.items():
+            # A fila e FIFO: o lote e sempre o comeco da lista de pendentes do aluno.
+            restantes = self._pendentes.get(id_aluno, [])[len(resultados):]
+            if restantes:
+                self._pendentes[id_aluno] = restantes
+            else:
+                self._pendentes.pop(id_aluno, None)
+            restantes_por_aluno[id_aluno] = restantes
+        return restantes_por_aluno
+
+    def _aplicar_no_disco(self, por_aluno: dict[str, list[tuple[int, bool]]]) -> None:
+        conexao = self._conexao()
+        agora = time.time()
+        atualizados = {}
+        with self._lock_disco:
+            # IMMEDIATE: le e grava sob o mesmo lock de escrita, mesmo com varios processos.
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                for id_aluno, resultados in por_aluno.items():
+                    perfil = self._ler_do_disco(id_aluno)
+                    for indice, acertou in resultados:
+                        aplicar_resultado(perfil[indice], acertou)
+                    conexao.execute(
+                        "INSERT INTO perfis (id_aluno, dados, atualizado_em) VALUES (?, ?, ?) "
+                        "ON CONFLICT(id_aluno) DO UPDATE SET dados = excluded.dados, atualizado_em = excluded.atualizado_em",
+                        (id_aluno, self.empacotar(perfil), agora)
+                    )
+                    atualizados[id_aluno] = perfil
+                conexao.commit()
+            except BaseException:
+                conexao.rollback()
+                # O lote falhou e nao volta para a fila: sai dos pendentes para nao crescer sem fim.
+                with self._lock:
+                    self._limpar_pendentes(por_aluno)
+                raise
+            with self._lock:
+                for id_aluno, restantes in self._limpar_pendentes(por_aluno).items():
+                    # O disco tambem tem o que outros workers gravaram; o cache passa a refletir isso,
+                    # mais o que ainda esta na fila deste processo.
+                    if id_aluno in self._cache:
+                        perfil = atualizados[id_aluno]
+                        for indice, acertou in restantes:
+                            aplicar_resultado(perfil[indice], acertou)
+                        self._cache[id_aluno] = perfil
+
+    def fechar(self) -> None:
+        self.escritor.fechar()
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,142 @@
+"""Registro do modelo de dificuldade com carga em segundo plano e troca a quente.
+
+Versoes novas sao publicadas como arquivos em `diretorio`:
+    modelo_fator_dificuldade-<versao>.pkl
+    preprocessador_features-<versao>.pkl   (opcional, mesma versao)
+A maior versao (ordem natural: v2 < v10, 20250601 < 20250615) e a ativa. Sem
+arquivos versionados, usa o caminho fixo legado (versao "padrao-<mtime>"). Para
+publicar sem risco de leitura parcial, grave em um .tmp e renomeie.
+
+A primeira carga roda numa thread (`aquecer`, agendado na inicializacao do
+app); ate ela terminar, `obter` retorna None e as requisicoes usam o fator
+padrao 1.0 em vez de esperar pelo modelo.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+from serverside.servicos.inferencia import PreditorDificuldade
+
+logger = logging.getLogger(__name__)
+
+PREFIXO_MODELO = "modelo_fator_dificuldade-"
+PREFIXO_PREPROCESSADOR = "preprocessador_features-"
+INTERVALO_VERIFICACAO_SEGUNDOS = 30.0
+
+
+@dataclass(frozen=True)
+class ModeloCarregado:
+    versao: str
+    modelo: object
+    preprocessador: object | None
+    preditor: PreditorDificuldade
+
+
+def _chave_natural(texto: str) -> list:
+    return [int(parte) if parte.isdigit() else parte for parte in re.split(r"(\d+)", texto)]
+
+
+class RegistroModelos:
+    def __init__(self, caminho_modelo: str, caminho_preprocessador: str, diretorio: str = "modelos",
+                 intervalo_verificacao: float = INTERVALO_VERIFICACAO_SEGUNDOS):
+        self.caminho_modelo = caminho_modelo
+        self.caminho_preprocessador = caminho_preprocessador
+        self.diretorio = diretorio
+        self.intervalo_verificacao = intervalo_verificacao
+        self._atual: ModeloCarregado | None = None
+        self._carregado = False
+        self._lock = threading.Lock()
+        self._falhas: dict[str, float] = {}
+        self._tarefa_observador: asyncio.Task | None = None
+
+    def versao_disponivel(self) -> tuple[str, str, str | None] | None:
+        """(versao, caminho do modelo, caminho do preprocessador) mais recente no disco."""
+        if os.path.isdir(self.diretorio):
+            versoes = []
+            for nome in os.listdir(self.diretorio):
+                if nome.startswith(PREFIXO_MODELO) and nome.endswith(".pkl"):
+                    versoes.append(nome[len(PREFIXO_MODELO):-len(".pkl")])
+            if versoes:
+                versao = max(versoes, key=_chave_natural)
+                caminho_prep = os.path.join(self.diretorio, f"{PREFIXO_PREPROCESSADOR}{versao}.pkl")
+                return (versao, os.path.join(self.diretorio, f"{PREFIXO_MODELO}{versao}.pkl"),
+                        caminho_prep if os.path.exists(caminho_prep) else None)
+        if os.path.exists(self.caminho_modelo):
+            return (f"padrao-{int(os.path.getmtime(self.caminho_modelo))}", self.caminho_modelo,
+                    self.caminho_preprocessador if os.path.exists(self.caminho_preprocessador) else None)
+        return None
+
+    def _carregar(self, versao: str, caminho_modelo: str, caminho_prep: str | None) -> ModeloCarregado:
+        import joblib
+        modelo = joblib.load(caminho_modelo)
+        preprocessador = joblib.load(caminho_prep) if caminho_prep else None
+        preditor = PreditorDificuldade(modelo, preprocessador=preprocessador)
+        return ModeloCarregado(versao, modelo, preprocessador, preditor)
+
+    def atualizar(self) -> bool:
+        """Carrega a versao mais recente se ela for diferente da ativa. Retorna True se trocou."""
+        disponivel = self.versao_disponivel()
+        if disponivel is None:
+            if not self._carregado:
+                logger.warning("Arquivo do modelo de dificuldade '%s' não encontrado. Usando lógica de dificuldade padrão.", self.caminho_modelo)
+            self._carregado = True
+            return False
+        versao, caminho_modelo, caminho_prep = disponivel
+        if self._atual is not None and self._atual.versao == versao:
+            return False
+        mtime = os.path.getmtime(caminho_modelo)
+        if self._falhas.get(caminho_modelo) == mtime:
+            return False
+        with self._lock:
+            if self._atual is not None and self._atual.versao == versao:
+                return False
+            try:
+                novo = self._carregar(versao, caminho_modelo, caminho_prep)
+            except Exception as e:
+                self._falhas[caminho_modelo] = mtime
+                self._carregado = True
+                logger.error("Não foi possível carregar o modelo de dificuldade '%s': %s. Mantendo a versão atual.", caminho_modelo, e)
+                return False
+            # Troca atomica: requisicoes em andamento continuam com a referencia antiga.
+            self._atual = novo
+            self._carregado = True
+        logger.info("Modelo de dificuldade versão '%s' carregado de '%s' (inferência: %s).", versao, caminho_modelo, novo.preditor.caminho)
+        return True
+
+    def obter(self) -> ModeloCarregado | None:
+        """Modelo ativo, sem nunca carregar: ate `aquecer` terminar retorna None e o servidor usa o fator padrao."""
+        return self._atual
+
+    def carregar(self) -> ModeloCarregado | None:
+        """Primeira carga, bloqueante (thread do aquecimento, pre-fork, benchmarks). Requisicoes usam `obter`."""
+        if not self._carregado:
+            self.atualizar()
+        return self._atual
+
+    async def aquecer(self) -> None:
+        # Fora do event loop: o import do sklearn e o joblib.load levam segundos.
+        await asyncio.to_thread(self.carregar)
+
+    async def _observar(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo_verificacao)
+            try:
+                await asyncio.to_thread(self.atualizar)
+            except Exception as e:
+                logger.error("Falha ao verificar novas versões do modelo: %s", e)
+
+    def iniciar_observador(self) -> None:
+        if self._tarefa_observador is None and self.intervalo_verificacao > 0:
+            self._tarefa_observador = asyncio.get_running_loop().create_task(self._observar())
+
+    async def parar_observador(self) -> None:
+        if self._tarefa_observador is not None:
+            self._tarefa_observador.cancel()
+            try:
+                await self._tarefa_observador
+            except asyncio.CancelledError:
+                pass
+            self._tarefa_observador = None
@@ -0,0 +1,441 @@
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SESSAO_TTL_SEGUNDOS = 60 * 60 * 2
+SESSAO_MAX_EM_MEMORIA = 10000
+ID_SESSAO_PADRAO = "padrao"
+JANELA_RECENTE = 5
+HISTORICO_MAX_SESSAO = 20
+SESSAO_INTERVALO_EXPIRACAO_SEGUNDOS = 5 * 60
+ID_SESSAO_MAX = 64
+_ID_SESSAO_VALIDO = re.compile(rf"[A-Za-z0-9_.:-]{{1,{ID_SESSAO_MAX}}}")
+RESERVA_DURACAO_SEGUNDOS = 30.0
+RESERVA_ESPERA_MAX_SEGUNDOS = 5.0
+RESERVA_INTERVALO_SEGUNDOS = 0.01
+
+
+class SessaoOcupada(Exception):
+    """Outra requisicao (possivelmente em outro worker) segura a sessao ha mais que o tempo de espera."""
+
+
+def novo_estado_sessao() -> dict:
+    return {
+        "id_sessao": None,
+        "id_aluno": None,
+        "perfil_semente": None,
+        "operacao_atual": None,
+        "faixa_etaria_atual": None,
+        "pergunta_atual_texto": None,
+        "pergunta_atual_numeros": [],
+        "resposta_correta_pergunta": None,
+        "ultimo_exemplo_fornecido": None,
+        "tentativas_exemplo_atual": 0,
+        "estilos_exemplo_atual": [],
+        "log_interacao_atual": {},
+        "historico_respostas_sessao": [],
+        "agregados_op": {},
+        "perguntas_respondidas_total_sessao": 0,
+        "acertos_total_sessao": 0,
+        "ml_fator_dificuldade_aplicado": 1.0,
+        "ml_features_usadas": {},
+        "ml_versao_modelo": None,
+        "lista_atual": None
+    }
+
+
+def gerar_id_sessao() -> str:
+    return datetime.now().strftime("%Y%m%d%H%M%S%f")
+
+
+def id_sessao_valido(id_sessao) -> bool:
+    """O id vem do cliente e vira chave do backend: so letras, numeros e `_.:-`, ate ID_SESSAO_MAX caracteres."""
+    return isinstance(id_sessao, str) and _ID_SESSAO_VALIDO.fullmatch(id_sessao) is not None
+
+
+def novo_agregado_op() -> dict:
+    # "janela" e um buffer circular com os ultimos JANELA_RECENTE resultados (1/0);
+    # "pos" aponta a posicao mais antiga quando o buffer esta cheio.
+    return {"respondidas": 0, "acertos": 0, "janela": [], "pos": 0, "acertos_janela": 0}
+
+
+def registrar_resposta(estado: dict, op: str, acertou: bool, numeros_pergunta: list[int]) -> None:
+    agregado = estado.setdefault("agregados_op", {}).get(op)
+    if agregado is None:
+        agregado = estado["agregados_op"][op] = novo_agregado_op()
+    resultado = 1 if acertou else 0
+    agregado["respondidas"] += 1
+    agregado["acertos"] += resultado
+    janela = agregado["janela"]
+    if len(janela) < JANELA_RECENTE:
+        janela.append(resultado)
+    else:
+        agregado["acertos_janela"] -= janela[agregado["pos"]]
+        janela[agregado["pos"]] = resultado
+        agregado["pos"] = (agregado["pos"] + 1) % JANELA_RECENTE
+    agregado["acertos_janela"] += resultado
+
+    historico = estado.setdefault("historico_respostas_sessao", [])
+    historico.append({"numeros_pergunta": list(numeros_pergunta), "acertou": acertou, "op": op})
+    if len(historico) > HISTORICO_MAX_SESSAO:
+        del historico[0]
+
+    estado["perguntas_respondidas_total_sessao"] += 1
+    if acertou:
+        estado["acertos_total_sessao"] += 1
+
+
+def estatisticas_op(estado: dict, op: str) -> tuple[int, float]:
+    """(perguntas respondidas na operacao, taxa de acerto nas ultimas JANELA_RECENTE) em O(1)."""
+    agregado = estado.get("agregados_op", {}).get(op)
+    if not agregado or not agregado["janela"]:
+        return 0, 0.0
+    return agregado["respondidas"], agregado["acertos_janela"] / len(agregado["janela"])
+
+
+def calcular_features_aluno(estado_sessao_atual: dict) -> dict:
+    features = {
+        "taxa_acerto_geral_sessao": 0.0,
+        "taxa_acerto_recente_op_sessao": 0.0,
+        "perguntas_respondidas_op_sessao": 0,
+        "faixa_etaria_inicio_num": 0,
+    }
+
+    if estado_sessao_atual.get("perguntas_respondidas_total_sessao", 0) > 0:
+        features["taxa_acerto_geral_sessao"] = estado_sessao_atual.get("acertos_total_sessao", 0) / estado_sessao_atual["perguntas_respondidas_total_sessao"]
+
+    op_atual = estado_sessao_atual.get("operacao_atual")
+    respondidas_op, taxa_recente_op = estatisticas_op(estado_sessao_atual, op_atual)
+    features["perguntas_respondidas_op_sessao"] = respondidas_op
+    features["taxa_acerto_recente_op_sessao"] = taxa_recente_op
+
+    semente = estado_sessao_atual.get("perfil_semente")
+    if semente:
+        _semear_features(features, semente, op_atual, estado_sessao_atual.get("perguntas_respondidas_total_sessao", 0), respondidas_op)
+
+    faixa_str = estado_sessao_atual.get("faixa_etaria_atual", "0-0")
+    try:
+        features["faixa_etaria_inicio_num"] = int(faixa_str.split('-')[0])
+    except:
+        features["faixa_etaria_inicio_num"] = 0 
+    return features
+
+
+def _semear_features(features: dict, semente: dict, op_atual: str, respondidas_sessao: int, respondidas_op: int) -> None:
+    # Enquanto a sessao nao tem respostas proprias, os valores vem do perfil persistente do aluno (perfis.py).
+    if not respondidas_sessao and semente["respondidas"]:
+        features["taxa_acerto_geral_sessao"] = semente["acertos"] / semente["respondidas"]
+    op_semente = semente["ops"].get(op_atual)
+    if not respondidas_op and op_semente and op_semente[2]:
+        respondidas, acertos_janela, tamanho_janela = op_semente
+        # Limitado ao tamanho de historico de uma sessao, a escala em que o modelo foi treinado.
+        features["perguntas_respondidas_op_sessao"] = min(respondidas, HISTORICO_MAX_SESSAO)
+        features["taxa_acerto_recente_op_sessao"] = acertos_janela / tamanho_janela
+
+
+def extrair_features_aluno(estado_sessao_atual: dict) -> dict:
+    features = calcular_features_aluno(estado_sessao_atual)
+    logger.debug("Features extraídas para ML: %s", features)
+    return features
+
+
+def resetar_historico(estado: dict) -> None:
+    estado["historico_respostas_sessao"] = []
+    estado["agregados_op"] = {}
+    estado["perguntas_respondidas_total_sessao"] = 0
+    estado["acertos_total_sessao"] = 0
+
+
+class BackendSessao(ABC):
+    """Interface minima de armazenamento: obter/salvar/remover o estado de uma sessao."""
+
+    # True quando as operacoes fazem I/O e devem rodar fora do event loop.
+    bloqueante = False
+
+    @abstractmethod
+    def obter(self, id_sessao: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def salvar(self, id_sessao: str, estado: dict) -> None:
+        ...
+
+    @abstractmethod
+    def remover(self, id_sessao: str) -> None:
+        ...
+
+    def reabrir(self) -> None:
+        """Descarta recursos herdados de outro processo (chamado apos um fork)."""
+
+    def expirar(self) -> int:
+        """Remove as sessoes paradas ha mais que o TTL; retorna quantas saíram."""
+        return 0
+
+    def reservar(self, id_sessao: str, dono: str, duracao: float) -> bool:
+        """Reserva a sessao para `dono` entre processos. Backends de um processo so nao precisam."""
+        return True
+
+    def liberar(self, id_sessao: str, dono: str) -> None:
+        """Desfaz `reservar`."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class BackendMemoria(BackendSessao):
+    """Sessoes em um OrderedDict, com expiracao por TTL e descarte LRU acima de max_sessoes."""
+
+    def __init__(self, ttl_segundos: float = SESSAO_TTL_SEGUNDOS, max_sessoes: int = SESSAO_MAX_EM_MEMORIA):
+        self.ttl_segundos = ttl_segundos
+        self.max_sessoes = max_sessoes
+        self._sessoes: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, id_sessao: str) -> dict | None:
+        with self._lock:
+            item = self._sessoes.get(id_sessao)
+            if item is None:
+                return None
+            visto_em, estado = item
+            agora = time.monotonic()
+            if agora - visto_em > self.ttl_segundos:
+                del self._sessoes[id_sessao]
+                return None
+            self._sessoes[id_sessao] = (agora, estado)
+            self._sessoes.move_to_end(id_sessao)
+            return estado
+
+    def salvar(self, id_sessao: str, estado: dict) -> None:
+        with self._lock:
+            self._sessoes[id_sessao] = (time.monotonic(), estado)
+            self._sessoes.move_to_end(id_sessao)
+            self._descartar_excedentes()
+
+    def remover(self, id_sessao: str) -> None:
+        with self._lock:
+            self._sessoes.pop(id_sessao, None)
+
+    def expirar(self) -> int:
+        with self._lock:
+            antes = len(self._sessoes)
+            self._descartar_excedentes()
+            return antes - len(self._sessoes)
+
+    def _descartar_excedentes(self) -> None:
+        agora = time.monotonic()
+        while self._sessoes:
+            id_mais_antigo, (visto_em, _) = next(iter(self._sessoes.items()))
+            if len(self._sessoes) > self.max_sessoes or agora - visto_em > self.ttl_segundos:
+                del self._sessoes[id_mais_antigo]
+            else:
+                break
+
+    def __len__(self) -> int:
+        return len(self._sessoes)
+
+
+class BackendSQLite(BackendSessao):
+    """Sessoes serializadas em JSON numa tabela SQLite, compartilhavel entre processos.
+
+    A tabela `reservas_sessao` impede que dois workers facam ler -> alterar ->
+    gravar na mesma sessao ao mesmo tempo (ver ArmazenamentoSessoes.abrir).
+    """
+
+    bloqueante = True
+
+    def __init__(self, caminho: str = "sessoes.db", ttl_segundos: float = SESSAO_TTL_SEGUNDOS):
+        self.caminho = caminho
+        self.ttl_segundos = ttl_segundos
+        self._local = threading.local()
+        conexao = self._conexao()
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS sessoes ("
+            "id_sessao TEXT PRIMARY KEY, estado TEXT NOT NULL, atualizado_em REAL NOT NULL)"
+        )
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_atualizado_em ON sessoes (atualizado_em)")
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS reservas_sessao ("
+            "id_sessao TEXT PRIMARY KEY, dono TEXT NOT NULL, expira_em REAL NOT NULL)"
+        )
+        conexao.commit()
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=10)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def obter(self, id_sessao: str) -> dict | None:
+        linha = self._conexao().execute(
+            "SELECT estado, atualizado_em FROM sessoes WHERE id_sessao = ?", (id_sessao,)
+        ).fetchone()
+        if linha is None:
+            return None
+        if time.time() - linha[1] > self.ttl_segundos:
+            self.remover(id_sessao)
+            return None
+        return json.loads(linha[0])
+
+    def salvar(self, id_sessao: str, estado: dict) -> None:
+        conexao = self._conexao()
+        conexao.execute(
+            "INSERT INTO sessoes (id_sessao, estado, atualizado_em) VALUES (?, ?, ?) "
+            "ON CONFLICT(id_sessao) DO UPDATE SET estado = excluded.estado, atualizado_em = excluded.atualizado_em",
+            (id_sessao, json.dumps(estado, ensure_ascii=False), time.time())
+        )
+        conexao.commit()
+
+    def remover(self, id_sessao: str) -> None:
+        conexao = self._conexao()
+        conexao.execute("DELETE FROM sessoes WHERE id_sessao = ?", (id_sessao,))
+        conexao.commit()
+
+    def reabrir(self) -> None:
+        # A conexao do processo pai nao pode ser usada no filho; cada processo abre a sua.
+        self._local = threading.local()
+
+    def expirar(self) -> int:
+        conexao = self._conexao()
+        cursor = conexao.execute("DELETE FROM sessoes WHERE atualizado_em < ?", (time.time() - self.ttl_segundos,))
+        conexao.execute("DELETE FROM reservas_sessao WHERE expira_em < ?", (time.time(),))
+        conexao.commit()
+        return cursor.rowcount
+
+    def reservar(self, id_sessao: str, dono: str, duracao: float) -> bool:
+        # Um unico upsert condicional e atomico no SQLite: so pega a reserva livre ou vencida
+        # (a de um worker que morreu no meio da requisicao).
+        agora = time.time()
+        conexao = self._conexao()
+        cursor = conexao.execute(
+            "INSERT INTO reservas_sessao (id_sessao, dono, expira_em) VALUES (?, ?, ?) "
+            "ON CONFLICT(id_sessao) DO UPDATE SET dono = excluded.dono, expira_em = excluded.expira_em "
+            "WHERE reservas_sessao.expira_em < ?",
+            (id_sessao, dono, agora + duracao, agora)
+        )
+        conexao.commit()
+        return cursor.rowcount == 1
+
+    def liberar(self, id_sessao: str, dono: str) -> None:
+        conexao = self._conexao()
+        conexao.execute("DELETE FROM reservas_sessao WHERE id_sessao = ? AND dono = ?", (id_sessao, dono))
+        conexao.commit()
+
+    def __len__(self) -> int:
+        return self._conexao().execute("SELECT COUNT(*) FROM sessoes").fetchone()[0]
+
+
+class ArmazenamentoSessoes:
+    def __init__(self, backend: BackendSessao | None = None,
+                 intervalo_expiracao: float = SESSAO_INTERVALO_EXPIRACAO_SEGUNDOS):
+        self.backend = backend if backend is not None else BackendMemoria()
+        self.intervalo_expiracao = intervalo_expiracao
+        self._tarefa_expiracao: asyncio.Task | None = None
+        # id_sessao -> [asyncio.Lock, requisicoes usando o lock]
+        self._travas: dict[str, list] = {}
+
+    def obter_ou_criar(self, id_sessao: str) -> dict:
+        estado = self.backend.obter(id_sessao)
+        if estado is None:
+            estado = novo_estado_sessao()
+        return estado
+
+    def salvar(self, id_sessao: str, estado: dict) -> None:
+        self.backend.salvar(id_sessao, estado)
+
+    def remover(self, id_sessao: str) -> None:
+        self.backend.remover(id_sessao)
+
+    def reabrir(self) -> None:
+        self.backend.reabrir()
+
+    async def _executar(self, funcao, *args):
+        if self.backend.bloqueante:
+            return await asyncio.to_thread(funcao, *args)
+        return funcao(*args)
+
+    async def _reservar(self, id_sessao: str, dono: str) -> None:
+        limite = time.monotonic() + RESERVA_ESPERA_MAX_SEGUNDOS
+        while not await self._executar(self.backend.reservar, id_sessao, dono, RESERVA_DURACAO_SEGUNDOS):
+            if time.monotonic() > limite:
+                raise SessaoOcupada(id_sessao)
+            await asyncio.sleep(RESERVA_INTERVALO_SEGUNDOS)
+
+    @asynccontextmanager
+    async def abrir(self, id_sessao: str):
+        """Estado da sessao para uma requisicao, gravado na saida.
+
+        Requisicoes da mesma sessao sao serializadas (lock no processo e reserva
+        no backend, entre workers), entao nenhuma sobrescreve o que a outra
+        gravou. Levanta SessaoOcupada se a reserva nao vier a tempo.
+        """
+        trava = self._travas.get(id_sessao)
+        if trava is None:
+            trava = self._travas[id_sessao] = [asyncio.Lock(), 0]
+        trava[1] += 1
+        try:
+            async with trava[0]:
+                dono = uuid.uuid4().hex
+                await self._reservar(id_sessao, dono)
+                try:
+                    estado = await self._executar(self.obter_ou_criar, id_sessao)
+                    try:
+                        yield estado
+                    finally:
+                        await self._executar(self.salvar, id_sessao, estado)
+                finally:
+                    await self._executar(self.backend.liberar, id_sessao, dono)
+        finally:
+            trava[1] -= 1
+            if not trava[1]:
+                del self._travas[id_sessao]
+
+    def iniciar_expiracao(self) -> None:
+        # Sessoes que nunca mais sao lidas so saem do backend por aqui.
+        if self._tarefa_expiracao is None and self.intervalo_expiracao > 0:
+            self._tarefa_expiracao = asyncio.get_running_loop().create_task(self._expirar_periodicamente())
+
+    async def parar_expiracao(self) -> None:
+        if self._tarefa_expiracao is not None:
+            self._tarefa_expiracao.cancel()
+            try:
+                await self._tarefa_expiracao
+            except asyncio.CancelledError:
+                pass
+            self._tarefa_expiracao = None
+
+    async def _expirar_periodicamente(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo_expiracao)
+            try:
+                removidas = await asyncio.to_thread(self.backend.expirar)
+            except Exception:
+                logger.exception("Falha ao expirar sessões antigas.")
+                continue
+            if removidas:
+                logger.info("%d sessões expiradas removidas.", removidas)
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+
+def criar_backend(nome: str, caminho_sqlite: str = "sessoes.db") -> BackendSessao:
+    if nome == "memoria":
+        return BackendMemoria()
+    if nome == "sqlite":
+        return BackendSQLite(caminho_sqlite)
+    raise ValueError(f"Backend de sessão desconhecido: '{nome}'. Use 'memoria' ou 'sqlite'.")
@@ -0,0 +1,243 @@
+"""Treino offline do modelo de fator de dificuldade a partir do log de aprendizado.
+
+    python -m serverside.servicos.treino_dificuldade aprendizado_log.csv --saida modelos
+
+O log e lido em streaming. As features de cada pergunta vem das colunas ml_*
+gravadas pelo servidor no momento da predicao (incluindo a semente do perfil
+do aluno); linhas antigas, sem essas colunas, sao reconstruidas reproduzindo a
+sessao com as mesmas funcoes do servidor (`registrar_resposta` /
+`calcular_features_aluno`) e descartadas se a reproducao divergir do que foi
+logado.
+
+O alvo e uma aproximacao declarada, nao uma medida: o fator aplicado sobe
+PASSO_FATOR quando o aluno acerta e desce quando erra, limitado ao intervalo
+aceito pelo servidor. Ou seja, supoe que cada acerto indica que a pergunta
+podia ser ~10% mais dificil e cada erro, ~10% mais facil. Ele nao vem da taxa
+de acerto observada por nivel de dificuldade, e o modelo aprende essa regra,
+nao a dificuldade ideal de cada aluno.
+
+So perguntas respondidas entram no log: as geradas e abandonadas nao aparecem
+no treino nem na reproducao das sessoes. O relatorio (e o .schema.json) traz
+esses limites em "avisos", com as contagens de linhas ignoradas e divergentes.
+
+O ajuste e incremental (StandardScaler e SGDRegressor via partial_fit), entao
+a memoria depende do tamanho do bloco, nao do tamanho do log. Ao final a
+padronizacao e incorporada aos coeficientes, o que deixa o .pkl exportado
+compativel com o avaliador linear compilado de `inferencia`.
+"""
+import argparse
+import csv
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterator
+
+import numpy as np
+
+from serverside.servicos.inferencia import FEATURES_MODELO
+from serverside.servicos.log_aprendizado import CSV_HEADERS
+from serverside.servicos.registro_modelos import PREFIXO_MODELO
+from serverside.servicos.sessao import calcular_features_aluno, novo_estado_sessao, registrar_resposta, resetar_historico
+
+PASSO_FATOR = 0.1
+FATOR_MIN = 0.5
+FATOR_MAX = 1.5
+TAMANHO_CHUNK = 10000
+EPOCAS = 3
+MAX_SESSOES_REPLAY = 100000
+
+
+def fator_alvo(fator_aplicado: float, acertou: bool) -> float:
+    fator = fator_aplicado * (1 + PASSO_FATOR if acertou else 1 - PASSO_FATOR)
+    return max(FATOR_MIN, min(fator, FATOR_MAX))
+
+
+def _para_bool(valor: str) -> bool | None:
+    valor = (valor or "").strip().lower()
+    if valor in ("true", "1"):
+        return True
+    if valor in ("false", "0"):
+        return False
+    return None
+
+
+def ler_linhas_log(caminho_csv: str) -> Iterator[dict]:
+    # Mapeamento por posicao: linhas antigas do CSV tem menos colunas que o cabecalho atual.
+    with open(caminho_csv, newline="", encoding="utf-8-sig") as arquivo:
+        leitor = csv.reader(arquivo)
+        next(leitor, None)
+        for valores in leitor:
+            if valores:
+                yield dict(zip(CSV_HEADERS, valores))
+
+
+def _features_logadas(linha: dict, reproduzidas: dict) -> dict | None:
+    try:
+        return {
+            **reproduzidas,
+            "taxa_acerto_geral_sessao": float(linha["ml_taxa_acerto_geral"]),
+            "taxa_acerto_recente_op_sessao": float(linha["ml_taxa_acerto_recente"]),
+            "perguntas_respondidas_op_sessao": int(float(linha["ml_perguntas_na_op_atual"])),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def gerar_exemplos(linhas: Iterator[dict], contadores: dict | None = None) -> Iterator[tuple[list[float], float]]:
+    """Reproduz cada sessao na ordem do log e gera (features, alvo) por pergunta respondida."""
+    contadores = contadores if contadores is not None else {}
+    contadores.setdefault("linhas", 0)
+    contadores.setdefault("ignoradas", 0)
+    contadores.setdefault("divergencias_features", 0)
+    contadores.setdefault("features_do_log", 0)
+    sessoes: OrderedDict[str, dict] = OrderedDict()
+    for linha in linhas:
+        contadores["linhas"] += 1
+        acertou = _para_bool(linha.get("acertou_pergunta"))
+        op = linha.get("operacao_solicitada")
+        if acertou is None or not op:
+            contadores["ignoradas"] += 1
+            continue
+
+        id_sessao = linha.get("id_sessao") or ""
+        estado = sessoes.get(id_sessao)
+        if estado is None:
+            estado = sessoes[id_sessao] = novo_estado_sessao()
+            if len(sessoes) > MAX_SESSOES_REPLAY:
+                sessoes.popitem(last=False)
+        else:
+            sessoes.move_to_end(id_sessao)
+        if estado["operacao_atual"] != op or estado["faixa_etaria_atual"] != linha.get("faixa_etaria"):
+            resetar_historico(estado)
+            estado["operacao_atual"] = op
+            estado["faixa_etaria_atual"] = linha.get("faixa_etaria")
+
+        reproduzidas = calcular_features_aluno(estado)
+        features = _features_logadas(linha, reproduzidas)
+        if features is not None:
+            contadores["features_do_log"] += 1
+            if features["perguntas_respondidas_op_sessao"] != reproduzidas["perguntas_respondidas_op_sessao"]:
+                contadores["divergencias_features"] += 1
+        else:
+            features = reproduzidas
+            logado = linha.get("ml_perguntas_na_op_atual")
+            if logado and int(float(logado)) != reproduzidas["perguntas_respondidas_op_sessao"]:
+                # Sem as features completas no log, nao da para saber o que o servidor viu: fora do treino.
+                contadores["divergencias_features"] += 1
+                contadores["ignoradas"] += 1
+                registrar_resposta(estado, op, acertou, [])
+                continue
+
+        fator_aplicado = float(linha.get("ml_fator_dificuldade_aplicado") or 1.0)
+        yield [float(features[nome]) for nome in FEATURES_MODELO], fator_alvo(fator_aplicado, acertou)
+        registrar_resposta(estado, op, acertou, [])
+
+
+def em_blocos(exemplos: Iterator[tuple[list[float], float]], tamanho: int) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    X, y = [], []
+    for vetor, alvo in exemplos:
+        X.append(vetor)
+        y.append(alvo)
+        if len(X) >= tamanho:
+            yield np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)
+            X, y = [], []
+    if X:
+        yield np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)
+
+
+def treinar(caminho_csv: str, epocas: int = EPOCAS, tamanho_chunk: int = TAMANHO_CHUNK, semente: int = 0):
+    from sklearn.linear_model import SGDRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    contadores: dict = {}
+    escalonador = StandardScaler()
+    for X, _ in em_blocos(gerar_exemplos(ler_linhas_log(caminho_csv), contadores), tamanho_chunk):
+        escalonador.partial_fit(X)
+    if not hasattr(escalonador, "mean_"):
+        raise ValueError(f"Nenhuma pergunta respondida utilizavel em '{caminho_csv}'.")
+
+    modelo = SGDRegressor(random_state=semente, learning_rate="invscaling", eta0=0.01)
+    erro_quadratico, n_avaliados = 0.0, 0
+    for epoca in range(epocas):
+        ultima = epoca == epocas - 1
+        for X, y in em_blocos(gerar_exemplos(ler_linhas_log(caminho_csv)), tamanho_chunk):
+            X = escalonador.transform(X)
+            if ultima and hasattr(modelo, "coef_"):
+                # Validacao progressiva: cada bloco e avaliado antes de ser usado no ajuste.
+                erro_quadratico += float(np.sum((modelo.predict(X) - y) ** 2))
+                n_avaliados += len(y)
+            modelo.partial_fit(X, y)
+
+    # Incorpora a padronizacao: coef . (x - media) / escala + b  ==  (coef / escala) . x + b'
+    coef = modelo.coef_ / escalonador.scale_
+    modelo.intercept_ = modelo.intercept_ - np.sum(coef * escalonador.mean_, keepdims=True)
+    modelo.coef_ = coef
+
+    relatorio = {
+        "features": FEATURES_MODELO,
+        "alvo": {"descricao": "aproximacao: fator aplicado ajustado pelo acerto, nao a taxa de acerto observada por dificuldade",
+                 "passo": PASSO_FATOR, "min": FATOR_MIN, "max": FATOR_MAX},
+        "exemplos": int(escalonador.n_samples_seen_),
+        "linhas_lidas": contadores["linhas"],
+        "linhas_ignoradas": contadores["ignoradas"],
+        "divergencias_features": contadores["divergencias_features"],
+        "features_do_log": contadores["features_do_log"],
+        "epocas": epocas,
+        "mse_validacao_progressiva": erro_quadratico / n_avaliados if n_avaliados else None,
+        "media_features": escalonador.mean_.tolist(),
+        "escala_features": escalonador.scale_.tolist(),
+        "treinado_em": datetime.now().isoformat(timespec="seconds"),
+        "origem": os.path.abspath(caminho_csv),
+        "avisos": avisos_treino(contadores),
+    }
+    return modelo, relatorio
+
+
+def avisos_treino(contadores: dict) -> list[str]:
+    avisos = [
+        f"Alvo aproximado: fator aplicado x (1 +/- {PASSO_FATOR}) conforme o acerto, nao a taxa de acerto observada por dificuldade.",
+        "Perguntas geradas e nunca respondidas nao sao gravadas no log; o treino e a reproducao das sessoes so veem as respondidas.",
+    ]
+    if contadores.get("ignoradas"):
+        avisos.append(f"{contadores['ignoradas']} de {contadores['linhas']} linhas ignoradas (sem resposta valida ou com "
+                      f"features divergentes e sem as colunas ml_* completas).")
+    if contadores.get("divergencias_features"):
+        avisos.append(f"{contadores['divergencias_features']} perguntas em que a reproducao da sessao diverge do que o servidor "
+                      f"logou (respostas fora do log, como sessoes em outro worker ou perfis semeados).")
+    return avisos
+
+
+def exportar(modelo, relatorio: dict, diretorio: str, versao: str | None = None) -> tuple[str, str]:
+    import joblib
+
+    versao = versao or datetime.now().strftime("%Y%m%d%H%M%S")
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_modelo = os.path.join(diretorio, f"{PREFIXO_MODELO}{versao}.pkl")
+    caminho_schema = os.path.join(diretorio, f"{PREFIXO_MODELO}{versao}.schema.json")
+    with open(caminho_schema, "w", encoding="utf-8") as arquivo:
+        json.dump({**relatorio, "versao": versao}, arquivo, ensure_ascii=False, indent=2)
+    # O .pkl e renomeado por ultimo: e ele que faz o registro enxergar a versao nova.
+    joblib.dump(modelo, caminho_modelo + ".tmp")
+    os.replace(caminho_modelo + ".tmp", caminho_modelo)
+    return caminho_modelo, caminho_schema
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Treina o modelo de fator de dificuldade a partir do log CSV.")
+    parser.add_argument("log", help="Caminho do aprendizado_log.csv")
+    parser.add_argument("--saida", default="modelos", help="Diretorio de modelos versionados.")
+    parser.add_argument("--versao", help="Versao do modelo (padrao: data e hora atuais).")
+    parser.add_argument("--epocas", type=int, default=EPOCAS)
+    parser.add_argument("--tamanho-chunk", type=int, default=TAMANHO_CHUNK)
+    args = parser.parse_args(argv)
+
+    modelo, relatorio = treinar(args.log, args.epocas, args.tamanho_chunk)
+    caminho_modelo, caminho_schema = exportar(modelo, relatorio, args.saida, args.versao)
+    for aviso in relatorio["avisos"]:
+        print(f"AVISO: {aviso}")
+    print(f"INFO: Modelo treinado com {relatorio['exemplos']} perguntas salvo em '{caminho_modelo}' (schema: '{caminho_schema}').")
+
+
+if __name__ == "__main__":
+    main()
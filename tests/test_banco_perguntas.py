@@ -0,0 +1,21 @@
+"""Banco de perguntas vetorizado contra o gerador original (versao curta de comparar_banco_perguntas).
+
+    python -m pytest tests/test_banco_perguntas.py
+"""
+import pytest
+
+from serverside.benchmarks.comparar_banco_perguntas import comparar
+
+AMOSTRAS = 3000
+ALFA = 1e-4
+FAIXAS = ["3-5", "9-12", "16-18", "23-25"]
+FATORES = [0.5, 1.0, 1.5]
+
+
+@pytest.mark.parametrize("operacao", ["soma", "subtracao", "multiplicacao", "divisao"])
+def test_distribuicoes_iguais_ao_gerador_original(operacao):
+    resultados = comparar(AMOSTRAS, ALFA, semente=0, operacoes=[operacao], faixas=FAIXAS, fatores=FATORES)
+
+    assert len(resultados) == len(FAIXAS) * len(FATORES)
+    reprovados = [(r["faixa_etaria"], r["fator"], r["ks"], r["invariantes"]) for r in resultados if not r["aprovado"]]
+    assert reprovados == []
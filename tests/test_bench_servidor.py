@@ -0,0 +1,33 @@
+"""O teste de carga nao pode gravar o feedback falso no estado real do servidor.
+
+    python -m pytest tests/test_bench_servidor.py
+"""
+import os
+
+import pytest
+
+from serverside.benchmarks import bench_servidor
+
+
+def test_carga_nao_altera_arquivos_reais(tmp_path, monkeypatch):
+    # Os caminhos do servidor sao relativos ao diretorio atual.
+    monkeypatch.chdir(tmp_path)
+    from serverside.routes import main
+    if main.seletor_estilos is None:
+        pytest.skip("Seletor de estilos desativado (CALCULA_SELETOR_ESTILOS).")
+    # O benchmark troca estes atributos do app; o monkeypatch devolve os originais no fim do teste.
+    for nome in ("escritor_log", "perfis_alunos", "sessoes"):
+        monkeypatch.setattr(main, nome, getattr(main, nome))
+    caminho_real = main.SELETOR_SNAPSHOT_PATH
+    monkeypatch.setattr(main.seletor_estilos, "caminho_snapshot", caminho_real)
+    assert main.seletor_estilos.salvar()
+    with open(caminho_real, "rb") as arquivo:
+        antes = arquivo.read()
+
+    resultado = bench_servidor.carga(concorrencia=4, sessoes=3, semente=1)
+
+    assert resultado["requisicoes"] > 0
+    with open(caminho_real, "rb") as arquivo:
+        assert arquivo.read() == antes
+    assert not os.path.exists(main.PERFIS_PATH)
+    assert not os.path.exists(main.CSV_FILE)
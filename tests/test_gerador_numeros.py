@@ -0,0 +1,25 @@
+"""Versao rapida de serverside/benchmarks/verificar_gerador_numeros.py (a grade completa continua na CLI).
+
+    python -m pytest tests/test_gerador_numeros.py
+"""
+import pytest
+
+from serverside.benchmarks.verificar_gerador_numeros import (
+    FAIXAS, GERADORES, OPERACOES, executar, grade_fatores, verificar_limite_fator,
+)
+
+AMOSTRAS = 60
+PASSO = 0.25
+
+
+@pytest.mark.parametrize("gerador", GERADORES)
+def test_invariantes_do_gerador(gerador):
+    resultados = executar((gerador,), AMOSTRAS, PASSO, semente=0, processos=1)
+
+    assert len(resultados) == len(OPERACOES) * len(FAIXAS) * len(grade_fatores(PASSO))
+    reprovados = [(r["operacao"], r["faixa_etaria"], r["fator"], r["falhas"]) for r in resultados if r["falhas"]]
+    assert reprovados == []
+
+
+def test_limite_do_fator_previsto():
+    assert verificar_limite_fator() == []
@@ -0,0 +1,90 @@
+"""Paridade entre PreditorDificuldade e `modelo.predict` para os estimadores suportados.
+
+    python -m pytest tests/test_inferencia.py
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+from serverside.servicos.inferencia import FEATURES_MODELO, PreditorDificuldade, compilar_modelo, gerar_amostras_features
+
+TOLERANCIA = 1e-9
+
+MODELOS = {
+    "linear": lambda: LinearRegression(),
+    "arvore": lambda: DecisionTreeRegressor(max_depth=6, random_state=0),
+    "floresta": lambda: RandomForestRegressor(n_estimators=20, max_depth=6, random_state=0),
+    "gbr": lambda: GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0),
+}
+
+
+def _dados(n: int, semente: int):
+    amostras = gerar_amostras_features(n, semente)
+    X = np.array([[f[nome] for nome in FEATURES_MODELO] for f in amostras], dtype=np.float64)
+    # Alvo nao linear para as arvores terem varios niveis.
+    y = 0.5 + 0.8 * X[:, 0] + 0.3 * (X[:, 1] > 0.5) + 0.01 * np.minimum(X[:, 2], 20) - 0.02 * X[:, 3]
+    return amostras, X, y
+
+
+def _conferir(preditor, amostras, X, esperado):
+    for features, valor in zip(amostras, esperado):
+        assert preditor.prever(features) == pytest.approx(float(valor), abs=TOLERANCIA)
+    np.testing.assert_allclose(preditor.prever_lote(X), esperado, rtol=0, atol=TOLERANCIA)
+
+
+@pytest.mark.parametrize("nome", sorted(MODELOS))
+@pytest.mark.parametrize("com_nomes", [False, True], ids=["numpy", "dataframe"])
+def test_compilado_igual_a_predict(nome, com_nomes):
+    _, X_treino, y_treino = _dados(500, semente=1)
+    modelo = MODELOS[nome]()
+    modelo.fit(pd.DataFrame(X_treino, columns=FEATURES_MODELO) if com_nomes else X_treino, y_treino)
+
+    preditor = PreditorDificuldade(modelo)
+    assert preditor.caminho == "compilado"
+
+    amostras, X, _ = _dados(300, semente=2)
+    esperado = modelo.predict(pd.DataFrame(X, columns=FEATURES_MODELO) if com_nomes else X)
+    _conferir(preditor, amostras, X, esperado)
+
+
+@pytest.mark.parametrize("nome", sorted(MODELOS))
+@pytest.mark.parametrize("com_nomes", [False, True], ids=["numpy", "dataframe"])
+def test_com_preprocessador_usa_predict(nome, com_nomes):
+    _, X_treino, y_treino = _dados(500, semente=3)
+    entrada = pd.DataFrame(X_treino, columns=FEATURES_MODELO) if com_nomes else X_treino
+    preprocessador = StandardScaler().fit(entrada)
+    modelo = MODELOS[nome]().fit(preprocessador.transform(entrada), y_treino)
+
+    preditor = PreditorDificuldade(modelo, preprocessador)
+    assert preditor.avaliador is None
+    assert preditor.caminho == ("pandas" if com_nomes else "numpy")
+
+    amostras, X, _ = _dados(300, semente=4)
+    esperado = modelo.predict(preprocessador.transform(pd.DataFrame(X, columns=FEATURES_MODELO) if com_nomes else X))
+    _conferir(preditor, amostras, X, esperado)
+
+
+def test_modelo_nao_suportado_usa_predict():
+    _, X_treino, y_treino = _dados(200, semente=5)
+    modelo = KNeighborsRegressor(n_neighbors=3).fit(X_treino, y_treino)
+    assert compilar_modelo(modelo) is None
+
+    preditor = PreditorDificuldade(modelo)
+    assert preditor.caminho == "numpy"
+    amostras, X, _ = _dados(100, semente=6)
+    _conferir(preditor, amostras, X, modelo.predict(X))
+
+
+def test_verificar_paridade_detecta_divergencia():
+    _, X_treino, y_treino = _dados(200, semente=7)
+    modelo = LinearRegression().fit(X_treino, y_treino)
+    preditor = PreditorDificuldade(modelo)
+    assert preditor.verificar_paridade()
+
+    preditor.avaliador.intercepto += 1e-6
+    assert not preditor.verificar_paridade()
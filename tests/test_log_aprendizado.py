@@ -0,0 +1,60 @@
+"""Log CSV gravado por uma versao anterior, com outro cabecalho.
+
+    python -m pytest tests/test_log_aprendizado.py
+"""
+import csv
+import glob
+
+from serverside.servicos.log_aprendizado import CSV_HEADERS, EscritorLogCSV, mesclar_shards, caminho_shard
+
+
+def _ler(caminho: str) -> list[dict]:
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        return list(csv.DictReader(arquivo))
+
+
+def _gravar(caminho: str, cabecalho: list[str], linhas: list[list[str]]) -> None:
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as arquivo:
+        escritor = csv.writer(arquivo, lineterminator="\n")
+        escritor.writerow(cabecalho)
+        escritor.writerows(linhas)
+
+
+def test_colunas_novas_reescrevem_o_cabecalho(tmp_path):
+    caminho = str(tmp_path / "aprendizado_log.csv")
+    antigo = CSV_HEADERS[:-2]
+    _gravar(caminho, antigo, [[f"v{i}" for i in range(len(antigo))]])
+
+    escritor = EscritorLogCSV(caminho, CSV_HEADERS)
+    escritor.registrar({"timestamp": "t2", "ml_versao_modelo": "v7", "ml_taxa_acerto_geral": 0.5})
+    escritor.fechar()
+
+    linhas = _ler(caminho)
+    assert list(linhas[0]) == CSV_HEADERS
+    assert linhas[0]["timestamp"] == "v0" and linhas[0]["ml_versao_modelo"] == ""
+    assert linhas[1]["timestamp"] == "t2" and linhas[1]["ml_versao_modelo"] == "v7"
+    assert linhas[1]["ml_taxa_acerto_geral"] == "0.5"
+
+
+def test_cabecalho_diferente_e_rotacionado(tmp_path):
+    caminho = str(tmp_path / "aprendizado_log.csv")
+    _gravar(caminho, ["data", "sessao"], [["d", "s"]])
+
+    escritor = EscritorLogCSV(caminho, CSV_HEADERS)
+    escritor.registrar({"timestamp": "t1"})
+    escritor.fechar()
+
+    assert [list(l) for l in _ler(caminho)] == [CSV_HEADERS]
+    antigos = glob.glob(str(tmp_path / "aprendizado_log.cabecalho-antigo-*.csv"))
+    assert len(antigos) == 1 and _ler(antigos[0]) == [{"data": "d", "sessao": "s"}]
+
+
+def test_mesclar_shards_em_log_antigo(tmp_path):
+    caminho = str(tmp_path / "aprendizado_log.csv")
+    _gravar(caminho, CSV_HEADERS[:-1], [["t0"] + [""] * (len(CSV_HEADERS) - 2)])
+    _gravar(caminho_shard(caminho, 0), CSV_HEADERS, [["t1"] + [""] * (len(CSV_HEADERS) - 2) + ["0.75"]])
+
+    assert mesclar_shards(caminho, CSV_HEADERS) == 1
+    linhas = _ler(caminho)
+    assert [l["timestamp"] for l in linhas] == ["t0", "t1"]
+    assert linhas[1]["ml_taxa_acerto_geral"] == "0.75"
@@ -0,0 +1,65 @@
+"""Cache dos perfis de alunos contra as respostas que ainda estao na fila de gravacao.
+
+    python -m pytest tests/test_perfis.py
+"""
+import asyncio
+
+from serverside.servicos.perfis import RegistroPerfis
+
+OPERACOES = ("soma", "subtracao", "multiplicacao", "divisao")
+
+
+def _registro(tmp_path, **opcoes) -> RegistroPerfis:
+    # Intervalo longo: nada e gravado ate `fechar`, a nao ser que o teste force.
+    return RegistroPerfis(str(tmp_path / "perfis.db"), OPERACOES, intervalo_gravacao=60, **opcoes)
+
+
+def test_falta_de_cache_inclui_respostas_na_fila(tmp_path):
+    registro = _registro(tmp_path)
+    registro.registrar("ana", "soma", True)
+    registro.registrar("ana", "soma", False)
+
+    assert registro.obter("ana")[0][:2] == [2, 1]
+    registro.registrar("ana", "soma", True)
+    assert registro.obter("ana")[0][:2] == [3, 2]
+
+    registro.fechar()
+    assert not registro._pendentes
+    assert registro.obter("ana")[0][:2] == [3, 2]
+    assert RegistroPerfis(registro.caminho, OPERACOES).obter("ana")[0][:2] == [3, 2]
+
+
+def test_gravacao_do_lote_nao_conta_duas_vezes(tmp_path):
+    registro = _registro(tmp_path)
+    registro.obter("bia")
+    for acertou in (True, True, False):
+        registro.registrar("bia", "divisao", acertou)
+    lote = registro.escritor._drenar(2)
+    registro.escritor._gravar_lote(lote)
+
+    # Uma resposta gravada a mais no disco, uma ainda na fila: o cache tem as tres.
+    assert registro.obter("bia")[3][:2] == [3, 2]
+    registro.fechar()
+    assert RegistroPerfis(registro.caminho, OPERACOES).obter("bia")[3][:2] == [3, 2]
+
+
+def test_semente_async_le_o_disco_e_cacheia(tmp_path):
+    registro = _registro(tmp_path)
+    registro.registrar("caio", "multiplicacao", True)
+    registro.fechar()
+
+    outro = RegistroPerfis(registro.caminho, OPERACOES)
+    semente = asyncio.run(outro.semente_features_async("caio"))
+    assert semente == {"respondidas": 1, "acertos": 1, "ops": {"multiplicacao": [1, 1, 1]}}
+    assert outro.contadores["leituras_disco"] == 1
+    asyncio.run(outro.semente_features_async("caio"))
+    assert outro.contadores == {"acertos_cache": 1, "leituras_disco": 1}
+
+
+def test_fila_cheia_nao_deixa_pendente(tmp_path):
+    registro = _registro(tmp_path)
+    registro.escritor._fila.maxsize = 1
+    registro.escritor._thread = object()  # sem flush: a segunda resposta e descartada
+    registro.registrar("duda", "soma", True)
+    registro.registrar("duda", "soma", False)
+    assert registro._pendentes == {"duda": [(0, True)]}
@@ -0,0 +1,41 @@
+"""Carga do modelo de dificuldade fora do caminho das requisicoes.
+
+    python -m pytest tests/test_registro_modelos.py
+"""
+import asyncio
+import threading
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from serverside.servicos.registro_modelos import PREFIXO_MODELO, RegistroModelos
+
+
+def _registro(tmp_path) -> RegistroModelos:
+    rng = np.random.default_rng(0)
+    X = rng.random((50, 4))
+    modelo = LinearRegression().fit(X, X @ [0.1, 0.2, 0.01, 0.02] + 1.0)
+    joblib.dump(modelo, tmp_path / f"{PREFIXO_MODELO}v1.pkl")
+    return RegistroModelos(str(tmp_path / "legado.pkl"), str(tmp_path / "prep.pkl"), str(tmp_path), intervalo_verificacao=0)
+
+
+def test_obter_nao_carrega_nem_espera(tmp_path):
+    registro = _registro(tmp_path)
+    # Simula o aquecimento segurando o lock no meio da carga: obter() nao pode bloquear.
+    with registro._lock:
+        resultado = {}
+        consulta = threading.Thread(target=lambda: resultado.setdefault("modelo", registro.obter()))
+        consulta.start()
+        consulta.join(timeout=2)
+        assert not consulta.is_alive()
+    assert resultado["modelo"] is None
+    assert registro.obter() is None
+
+
+def test_aquecer_carrega_em_segundo_plano(tmp_path):
+    registro = _registro(tmp_path)
+    asyncio.run(registro.aquecer())
+    carregado = registro.obter()
+    assert carregado is not None and carregado.versao == "v1"
+    assert carregado.preditor.caminho == "compilado"
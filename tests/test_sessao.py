@@ -0,0 +1,159 @@
+"""Agregados O(1) da sessao comparados com a varredura do historico completo, e armazenamento das sessoes.
+
+    python -m pytest tests/test_sessao.py
+"""
+import asyncio
+import random
+
+import pytest
+
+from serverside.servicos import sessao
+from serverside.servicos.sessao import (
+    HISTORICO_MAX_SESSAO, JANELA_RECENTE, ArmazenamentoSessoes, BackendMemoria, BackendSessao, BackendSQLite, SessaoOcupada,
+    calcular_features_aluno, estatisticas_op, id_sessao_valido, novo_estado_sessao, registrar_resposta, resetar_historico,
+)
+
+OPERACOES = ["adicao", "subtracao", "multiplicacao", "divisao"]
+FAIXAS = ["6-8", "9-12"]
+
+
+def _features_por_varredura(respostas: list[dict], op_atual: str, faixa: str) -> dict:
+    """Implementacao original: percorre todas as respostas desde o ultimo reset."""
+    features = {
+        "taxa_acerto_geral_sessao": 0.0,
+        "taxa_acerto_recente_op_sessao": 0.0,
+        "perguntas_respondidas_op_sessao": 0,
+        "faixa_etaria_inicio_num": int(faixa.split("-")[0]),
+    }
+    if respostas:
+        features["taxa_acerto_geral_sessao"] = sum(1 for r in respostas if r["acertou"]) / len(respostas)
+    respostas_op = [r for r in respostas if r["op"] == op_atual]
+    features["perguntas_respondidas_op_sessao"] = len(respostas_op)
+    ultimas = respostas_op[-JANELA_RECENTE:]
+    if ultimas:
+        features["taxa_acerto_recente_op_sessao"] = sum(1 for r in ultimas if r["acertou"]) / len(ultimas)
+    return features
+
+
+@pytest.mark.parametrize("semente", range(20))
+def test_agregados_iguais_a_varredura(semente):
+    rng = random.Random(semente)
+    estado = novo_estado_sessao()
+    respostas: list[dict] = []
+    for passo in range(400):
+        if estado["operacao_atual"] is None or rng.random() < 0.03:
+            # Troca de contexto, como em _preparar_sessao.
+            op, faixa = rng.choice(OPERACOES), rng.choice(FAIXAS)
+            if op != estado["operacao_atual"] or faixa != estado["faixa_etaria_atual"]:
+                resetar_historico(estado)
+                respostas = []
+            estado["operacao_atual"], estado["faixa_etaria_atual"] = op, faixa
+
+        # Respostas de outra operacao sem reset (lista de exercicios) tambem entram nos agregados.
+        op_resposta = estado["operacao_atual"] if rng.random() < 0.8 else rng.choice(OPERACOES)
+        acertou = rng.random() < rng.choice([0.2, 0.5, 0.9])
+        numeros = [rng.randint(0, 99), rng.randint(0, 99)]
+        registrar_resposta(estado, op_resposta, acertou, numeros)
+        respostas.append({"numeros_pergunta": numeros, "acertou": acertou, "op": op_resposta})
+
+        esperado = _features_por_varredura(respostas, estado["operacao_atual"], estado["faixa_etaria_atual"])
+        assert calcular_features_aluno(estado) == pytest.approx(esperado), f"passo {passo}"
+        for op in OPERACOES:
+            respostas_op = [r for r in respostas if r["op"] == op]
+            ultimas = respostas_op[-JANELA_RECENTE:]
+            taxa = sum(1 for r in ultimas if r["acertou"]) / len(ultimas) if ultimas else 0.0
+            assert estatisticas_op(estado, op) == (len(respostas_op), pytest.approx(taxa))
+
+        assert estado["historico_respostas_sessao"] == respostas[-HISTORICO_MAX_SESSAO:]
+        assert estado["perguntas_respondidas_total_sessao"] == len(respostas)
+
+
+def test_historico_limitado_nao_limita_contagem_da_operacao():
+    estado = novo_estado_sessao()
+    estado["operacao_atual"], estado["faixa_etaria_atual"] = "adicao", "6-8"
+    total = HISTORICO_MAX_SESSAO * 3 + 1
+    for i in range(total):
+        registrar_resposta(estado, "adicao", i % 3 == 0, [i])
+
+    assert len(estado["historico_respostas_sessao"]) == HISTORICO_MAX_SESSAO
+    assert estado["historico_respostas_sessao"][0]["numeros_pergunta"] == [total - HISTORICO_MAX_SESSAO]
+    respondidas, taxa = estatisticas_op(estado, "adicao")
+    assert respondidas == total
+    ultimos = range(total - JANELA_RECENTE, total)
+    assert taxa == pytest.approx(sum(1 for i in ultimos if i % 3 == 0) / JANELA_RECENTE)
+
+
+def test_estado_vazio_e_reset():
+    estado = novo_estado_sessao()
+    assert estatisticas_op(estado, "adicao") == (0, 0.0)
+    registrar_resposta(estado, "adicao", True, [1, 2])
+    resetar_historico(estado)
+    estado["operacao_atual"], estado["faixa_etaria_atual"] = "adicao", "9-12"
+    assert estatisticas_op(estado, "adicao") == (0, 0.0)
+    assert calcular_features_aluno(estado) == _features_por_varredura([], "adicao", "9-12")
+
+
+def test_backend_incompleto_falha_ao_criar():
+    class SoObter(BackendSessao):
+        def obter(self, id_sessao):
+            return None
+
+    with pytest.raises(TypeError):
+        SoObter()
+
+
+@pytest.mark.parametrize("id_sessao", ["padrao", "1718000000000abc123", "bench-3", "a" * sessao.ID_SESSAO_MAX])
+def test_id_sessao_valido(id_sessao):
+    assert id_sessao_valido(id_sessao)
+
+
+@pytest.mark.parametrize("id_sessao", ["", "a" * (sessao.ID_SESSAO_MAX + 1), "com espaco", "x'; DROP TABLE sessoes;--", "á", None])
+def test_id_sessao_invalido(id_sessao):
+    assert not id_sessao_valido(id_sessao)
+
+
+async def _incrementar(armazenamento: ArmazenamentoSessoes, vezes: int) -> None:
+    for _ in range(vezes):
+        async with armazenamento.abrir("s1") as estado:
+            valor = estado.get("contador", 0)
+            await asyncio.sleep(0)
+            estado["contador"] = valor + 1
+
+
+def test_sqlite_sem_atualizacoes_perdidas_entre_workers(tmp_path):
+    caminho = str(tmp_path / "sessoes.db")
+    # Dois armazenamentos no mesmo arquivo fazem o papel de dois workers.
+    workers = [ArmazenamentoSessoes(BackendSQLite(caminho)) for _ in range(2)]
+
+    async def rodar():
+        await asyncio.gather(*(_incrementar(w, 15) for w in workers for _ in range(3)))
+
+    asyncio.run(rodar())
+    assert workers[0].obter_ou_criar("s1")["contador"] == 2 * 3 * 15
+    assert not workers[0]._travas
+
+
+def test_memoria_serializa_requisicoes_da_mesma_sessao():
+    armazenamento = ArmazenamentoSessoes(BackendMemoria())
+
+    async def rodar():
+        await asyncio.gather(*(_incrementar(armazenamento, 20) for _ in range(4)))
+
+    asyncio.run(rodar())
+    assert armazenamento.obter_ou_criar("s1")["contador"] == 80
+
+
+def test_reserva_de_outro_worker_recusa_a_requisicao(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessao, "RESERVA_ESPERA_MAX_SEGUNDOS", 0.05)
+    backend = BackendSQLite(str(tmp_path / "sessoes.db"))
+    assert backend.reservar("s1", "outro-worker", 60)
+    armazenamento = ArmazenamentoSessoes(backend)
+
+    async def rodar():
+        async with armazenamento.abrir("s1"):
+            pass
+
+    with pytest.raises(SessaoOcupada):
+        asyncio.run(rodar())
+    backend.liberar("s1", "outro-worker")
+    asyncio.run(rodar())